@@ -2,11 +2,15 @@
  * Mochi Blog Search Logic
  * -----------------------
  * Handles fetching the search index, filtering results, and updating the UI.
+ * The index is sharded (see scripts/build-search-index.py); only the shards
+ * needed for the current query are downloaded.
  */
 
 class BlogSearch {
     constructor() {
-        this.index = [];
+        this.manifest = null;
+        this.shards = new Map();
+        this.searchRequestId = 0;
         this.isLoaded = false;
         this.searchOverlay = null;
         this.searchInput = null;
@@ -72,20 +76,97 @@ class BlogSearch {
         this.searchClose = overlay.querySelector('.search-close');
     }
 
+    get basePath() {
+        // Path depends on if we are in /articles/ or root
+        return window.location.pathname.includes('/articles/') ? '../' : '';
+    }
+
     async loadIndex() {
+        // Only the small manifest is fetched up front; shards are fetched per query
         try {
-            // Path depends on if we are in /articles/ or root
-            const basePath = window.location.pathname.includes('/articles/') ? '../' : '';
-            const response = await fetch(`${basePath}search-index.json`);
+            const response = await fetch(`${this.basePath}search-index/manifest.json`, { cache: 'no-cache' });
             if (!response.ok) throw new Error('Search index not found');
-            this.index = await response.json();
+            this.manifest = await response.json();
+            this.shards = new Map();
             this.isLoaded = true;
-            console.log('Search index loaded');
+            console.log(`Search manifest loaded (${this.manifest.docs} articles)`);
         } catch (error) {
             console.error('Failed to load search index:', error);
         }
     }
 
+    fetchShard(name) {
+        // Shard URLs carry their content hash, so the browser can cache them
+        if (!this.shards.has(name)) {
+            const version = this.manifest.files[name] || '';
+            const promise = fetch(`${this.basePath}search-index/${name}?v=${version}`)
+                .then(response => {
+                    if (!response.ok) throw new Error(`Shard ${name} not found`);
+                    return response.json();
+                })
+                .catch(error => {
+                    this.shards.delete(name);
+                    throw error;
+                });
+            this.shards.set(name, promise);
+        }
+        return this.shards.get(name);
+    }
+
+    /**
+     * Must match tokenize() in scripts/build-search-index.py:
+     * ASCII words as-is (matched as prefixes), other scripts (Japanese etc.) as
+     * character bigrams. A single character is looked up as a unigram, which the
+     * index stores for every character so it matches anywhere inside a word.
+     */
+    tokenize(text) {
+        const runs = text.normalize('NFKC').toLowerCase().match(/[a-z0-9]+|(?:(?![\x00-\x7f])[\p{L}\p{N}])+/gu) || [];
+        return runs.map(run => {
+            const chars = Array.from(run);
+            if (/^[a-z0-9]+$/.test(run)) return { prefix: run, bigrams: [] };
+            if (chars.length === 1) return { prefix: null, bigrams: [run] };
+            const bigrams = [];
+            for (let i = 0; i < chars.length - 1; i++) bigrams.push(chars[i] + chars[i + 1]);
+            return { prefix: null, bigrams };
+        });
+    }
+
+    async lookup(term, prefix) {
+        // Returns the Set of doc ids for a term (or for every term starting with it)
+        const shardName = `t-${term.codePointAt(0) % this.manifest.termShards}.json`;
+        const shard = await this.fetchShard(shardName);
+        if (!prefix) return new Set(shard[term] || []);
+        const ids = new Set();
+        for (const [key, postings] of Object.entries(shard)) {
+            if (key.startsWith(term)) postings.forEach(id => ids.add(id));
+        }
+        return ids;
+    }
+
+    async findDocs(query) {
+        const lookups = [];
+        for (const token of this.tokenize(query)) {
+            if (token.prefix) lookups.push(this.lookup(token.prefix, true));
+            token.bigrams.forEach(bigram => lookups.push(this.lookup(bigram, false)));
+        }
+        if (lookups.length === 0) return [];
+
+        // Every term must match (AND)
+        const sets = await Promise.all(lookups);
+        sets.sort((a, b) => a.size - b.size);
+        const ids = [...sets[0]].filter(id => sets.every(set => set.has(id)));
+
+        const size = this.manifest.docShardSize;
+        const docShards = {};
+        await Promise.all([...new Set(ids.map(id => Math.floor(id / size)))].map(async n => {
+            docShards[n] = await this.fetchShard(`d-${n}.json`);
+        }));
+        return ids
+            .map(id => docShards[Math.floor(id / size)][id % size])
+            .filter(doc => doc)
+            .map(([title, url, excerpt, tags]) => ({ title, url, excerpt, tags }));
+    }
+
     setupEventListeners() {
         // Find existing toggle buttons
         document.addEventListener('click', (e) => {
@@ -133,7 +214,7 @@ class BlogSearch {
         this.resultsContainer.innerHTML = '<div class="search-placeholder">何かお探しですか？</div>';
     }
 
-    performSearch(query) {
+    async performSearch(query) {
         if (!query.trim()) {
             this.resultsContainer.innerHTML = '<div class="search-placeholder">何かお探しですか？</div>';
             return;
@@ -144,10 +225,16 @@ class BlogSearch {
             return;
         }
 
-        const terms = query.toLowerCase().split(/\s+/).filter(t => t);
-        const results = this.index.filter(item => {
-            return terms.every(term => item.searchContent.includes(term));
-        });
+        const requestId = ++this.searchRequestId;
+        let results;
+        try {
+            results = await this.findDocs(query);
+        } catch (error) {
+            console.error('Search failed:', error);
+            results = [];
+        }
+        // Ignore responses for queries the user has already typed past
+        if (requestId !== this.searchRequestId) return;
 
         this.renderResults(results);
     }
@@ -159,7 +246,7 @@ class BlogSearch {
         }
 
         // Adjust paths for articles if we are already in the articles folder
-        const linkPrefix = window.location.pathname.includes('/articles/') ? '../' : '';
+        const linkPrefix = this.basePath;
 
         const html = results.map(item => `
             <a href="${linkPrefix}${item.url}" class="search-result-item">
@@ -0,0 +1,686 @@
+"""
+blog/content の Markdown を共通テンプレートで blog/articles の HTML にする（差分ビルド）
+
+    python blog/scripts/build-articles.py              # 変更のあったページだけ生成
+    python blog/scripts/build-articles.py --dry-run    # 生成されるページと理由だけ表示
+    python blog/scripts/build-articles.py --adopt      # 手書きの同名HTMLを Markdown 由来に置き換える
+    python blog/scripts/build-articles.py --bench 2000 # 合成した 2000 記事でビルド時間を計測
+
+各ページの依存（元の Markdown・レイアウトと include したパーシャル・series-config.json のうち
+そのページのシリーズ・related.json のうちそのページの関連記事）のハッシュを記録し、変わったページだけを並列に生成し直す。
+1記事の編集ではそのページだけ、テンプレートの編集ではそのテンプレートを使う全ページが再生成される。
+
+テンプレートの書式:
+    {{ name }}                        値の埋め込み（値は生成側でエスケープ済み。series_nav はシリーズナビゲーション、
+                                      related は関連記事）
+    {% include "partials/x.html" %}   パーシャルの読み込み（依存に含まれる）
+    {% if name %}...{% endif %}       値が空でなければ出力（入れ子は不可）
+"""
+import os
+import re
+import sys
+import json
+import html
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import series_nav
+import related_articles
+
+BLOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ROOT_DIR = os.path.abspath(os.path.join(BLOG_DIR, '..'))
+CONTENT_DIR = os.path.join(BLOG_DIR, 'content')
+TEMPLATES_DIR = os.path.join(BLOG_DIR, 'templates')
+ARTICLES_DIR = os.path.join(BLOG_DIR, 'articles')
+SERIES_CONFIG = os.path.join(BLOG_DIR, 'series-config.json')
+RELATED_FILE = related_articles.RELATED_FILE
+STATE_FILE = os.path.join(ROOT_DIR, 'scripts', 'marketing', 'data', 'ssg_state.json')
+
+# 出力の形式を変えたら上げる（全ページが再生成される）
+GENERATOR_VERSION = 2
+GENERATOR_MARKER = '<meta name="generator" content="mochi-ssg">'
+DEFAULT_LAYOUT = 'article'
+# 見た目を変えるタグ（style.css の .tag-burn など）
+TAG_CLASSES = {'Burn': 'tag-burn'}
+# 日本語の読了時間の目安（1分あたりの文字数）
+CHARS_PER_MINUTE = 500
+# これより少ないページ数ならプロセスを起動せずに生成する
+PARALLEL_THRESHOLD = 16
+
+
+# --- Front matter ---
+
+def _parse_scalar(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        return value[1:-1]
+    if value.startswith('[') and value.endswith(']'):
+        return [_parse_scalar(v) for v in value[1:-1].split(',') if v.strip()]
+    if value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    return value
+
+
+def parse_front_matter(text):
+    """
+    先頭の --- で囲まれた YAML（key: value、[a, b]、「  - 項目」のリストのみ）を読む。
+    戻り値は (メタデータ, 本文)
+    """
+    text = text.lstrip('﻿')
+    if not text.startswith('---'):
+        return {}, text
+    lines = text.split('\n')
+    meta, key = {}, None
+    for index in range(1, len(lines)):
+        line = lines[index].rstrip('\r')
+        if line.strip() == '---':
+            return meta, '\n'.join(lines[index + 1:])
+        item = re.match(r'^\s+-\s+(.*)$', line)
+        if item and key:
+            if not isinstance(meta.get(key), list):
+                meta[key] = []
+            meta[key].append(_parse_scalar(item.group(1)))
+            continue
+        pair = re.match(r'^([A-Za-z_][\w-]*)\s*:\s*(.*)$', line)
+        if pair:
+            key = pair.group(1)
+            meta[key] = _parse_scalar(pair.group(2)) if pair.group(2).strip() else []
+    # 閉じの --- が無ければ front matter ではない
+    return {}, text
+
+
+# --- Markdown ---
+
+_INLINE_CODE = re.compile(r'(`+)(.+?)\1')
+_IMAGE = re.compile(r'!\[([^\]]*)\]\(([^)\s]+)(?:\s+"([^"]*)")?\)')
+_LINK = re.compile(r'\[([^\]]+)\]\(([^)\s]+)(?:\s+"([^"]*)")?\)')
+_BOLD = re.compile(r'\*\*(.+?)\*\*|__(.+?)__')
+_ITALIC = re.compile(r'(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?!\*)|(?<![_\w])_(?!\s)(.+?)(?<!\s)_(?![_\w])')
+_STRIKE = re.compile(r'~~(.+?)~~')
+_AUTOLINK = re.compile(r'<(https?://[^>\s]+)>')
+
+
+def render_inline(text):
+    """インライン要素（コード・画像・リンク・強調・打ち消し）を HTML にする"""
+    placeholders = []
+
+    def hold(fragment):
+        placeholders.append(fragment)
+        return f'\u0000{len(placeholders) - 1}\u0000'
+
+    # コード内は変換しない
+    text = _INLINE_CODE.sub(lambda m: hold(f'<code>{html.escape(m.group(2).strip(), quote=False)}</code>'), text)
+    text = _AUTOLINK.sub(lambda m: hold(f'<a href="{html.escape(m.group(1))}">{html.escape(m.group(1))}</a>'), text)
+    text = _IMAGE.sub(lambda m: hold(
+        f'<img src="{html.escape(m.group(2))}" alt="{html.escape(m.group(1))}"'
+        + (f' title="{html.escape(m.group(3))}"' if m.group(3) else '') + '>'
+    ), text)
+
+    def link(m):
+        title = f' title="{html.escape(m.group(3))}"' if m.group(3) else ''
+        rel = ' target="_blank" rel="noopener"' if re.match(r'https?://', m.group(2)) else ''
+        return hold(f'<a href="{html.escape(m.group(2))}"{title}{rel}>') + m.group(1) + hold('</a>')
+
+    text = _LINK.sub(link, text)
+    # インラインの HTML タグはそのまま通す
+    text = re.sub(r'</?[A-Za-z][^<>]*>', lambda m: hold(m.group(0)), text)
+    text = html.escape(text, quote=False)
+    text = _BOLD.sub(lambda m: f'<strong>{m.group(1) or m.group(2)}</strong>', text)
+    text = _ITALIC.sub(lambda m: f'<em>{m.group(1) or m.group(2)}</em>', text)
+    text = _STRIKE.sub(r'<del>\1</del>', text)
+    while '\u0000' in text:
+        text = re.sub(r'\u0000(\d+)\u0000', lambda m: placeholders[int(m.group(1))], text)
+    return text
+
+
+_LIST_ITEM = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+_TABLE_SEPARATOR = re.compile(r'^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$')
+_HR = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+
+
+def _split_row(line):
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|'):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split('|')]
+
+
+def _render_table(lines):
+    header = _split_row(lines[0])
+    aligns = []
+    for cell in _split_row(lines[1]):
+        if cell.startswith(':') and cell.endswith(':'):
+            aligns.append('center')
+        elif cell.endswith(':'):
+            aligns.append('right')
+        elif cell.startswith(':'):
+            aligns.append('left')
+        else:
+            aligns.append(None)
+
+    def cells(row, tag):
+        out = []
+        for i, cell in enumerate(row):
+            align = aligns[i] if i < len(aligns) else None
+            style = f' style="text-align: {align}"' if align else ''
+            out.append(f'<{tag}{style}>{render_inline(cell)}</{tag}>')
+        return ''.join(out)
+
+    body = ''.join(f'<tr>{cells(_split_row(line), "td")}</tr>\n' for line in lines[2:])
+    return f'<table>\n<thead>\n<tr>{cells(header, "th")}</tr>\n</thead>\n<tbody>\n{body}</tbody>\n</table>'
+
+
+def _render_list(lines):
+    """同じインデントの項目を1つのリストにし、深いインデントは入れ子のリストにする"""
+    first = _LIST_ITEM.match(lines[0])
+    indent = len(first.group(1).expandtabs(4))
+    tag = 'ol' if first.group(2)[0].isdigit() else 'ul'
+    items, current = [], None
+    for line in lines:
+        m = _LIST_ITEM.match(line)
+        if m and len(m.group(1).expandtabs(4)) <= indent:
+            current = [m.group(3)]
+            items.append(current)
+        elif current is not None:
+            current.append(line)
+
+    out = []
+    for item in items:
+        text, nested = [item[0]], []
+        for line in item[1:]:
+            if nested or _LIST_ITEM.match(line):
+                nested.append(line)
+            elif line.strip():
+                text.append(line.strip())
+        inner = render_inline('\n'.join(text))
+        if nested:
+            inner += '\n' + _render_list(nested)
+        out.append(f'<li>{inner}</li>')
+    start = ''
+    if tag == 'ol':
+        number = int(re.match(r'\d+', first.group(2)).group(0))
+        start = f' start="{number}"' if number != 1 else ''
+    return f'<{tag}{start}>\n' + '\n'.join(out) + f'\n</{tag}>'
+
+
+def render_markdown(text):
+    """ブログで使っている範囲の Markdown（GFM の表・フェンス付きコード・注記ブロックを含む）を HTML にする"""
+    lines = text.replace('\r\n', '\n').split('\n')
+    blocks = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if not stripped:
+            i += 1
+            continue
+
+        fence = re.match(r'^\s*(```+|~~~+)\s*([\w+-]*)', line)
+        if fence:
+            marker, lang = fence.group(1), fence.group(2)
+            code = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith(marker):
+                code.append(lines[i])
+                i += 1
+            i += 1
+            cls = f' class="language-{lang}"' if lang else ''
+            blocks.append(f'<pre><code{cls}>{html.escape(chr(10).join(code), quote=False)}</code></pre>')
+            continue
+
+        heading = re.match(r'^(#{1,6})\s+(.*?)\s*#*\s*$', line)
+        if heading:
+            level = len(heading.group(1))
+            blocks.append(f'<h{level}>{render_inline(heading.group(2))}</h{level}>')
+            i += 1
+            continue
+
+        if _HR.match(line):
+            blocks.append('<hr>')
+            i += 1
+            continue
+
+        if '|' in line and i + 1 < len(lines) and _TABLE_SEPARATOR.match(lines[i + 1]):
+            table = [line, lines[i + 1]]
+            i += 2
+            while i < len(lines) and '|' in lines[i] and lines[i].strip():
+                table.append(lines[i])
+                i += 1
+            blocks.append(_render_table(table))
+            continue
+
+        if stripped.startswith('>'):
+            quoted = []
+            while i < len(lines) and lines[i].strip().startswith('>'):
+                quoted.append(re.sub(r'^\s*>\s?', '', lines[i]))
+                i += 1
+            # GitHub の注記（> [!NOTE] タイトル）
+            alert = re.match(r'^\[!(\w+)\]\s*(.*)$', quoted[0].strip()) if quoted else None
+            if alert:
+                kind = alert.group(1).lower()
+                title = render_inline(alert.group(2)) if alert.group(2) else alert.group(1).upper()
+                inner = render_markdown('\n'.join(quoted[1:]))
+                blocks.append(f'<blockquote class="callout callout-{kind}">\n'
+                              f'<p class="callout-title"><strong>{title}</strong></p>\n{inner}\n</blockquote>')
+            else:
+                blocks.append(f'<blockquote>\n{render_markdown(chr(10).join(quoted))}\n</blockquote>')
+            continue
+
+        if _LIST_ITEM.match(line):
+            items = []
+            while i < len(lines):
+                current = lines[i]
+                if not current.strip():
+                    # 空行の後も項目か字下げが続けば同じリスト
+                    nxt = lines[i + 1] if i + 1 < len(lines) else ''
+                    if _LIST_ITEM.match(nxt) or (nxt.startswith((' ', '\t')) and nxt.strip()):
+                        i += 1
+                        continue
+                    break
+                if not (_LIST_ITEM.match(current) or current.startswith((' ', '\t'))):
+                    break
+                items.append(current)
+                i += 1
+            blocks.append(_render_list(items))
+            continue
+
+        if re.match(r'^<(/?)(div|section|table|details|figure|iframe|p|ul|ol|blockquote|pre|script|style|!--)', stripped):
+            raw = []
+            while i < len(lines) and lines[i].strip():
+                raw.append(lines[i])
+                i += 1
+            blocks.append('\n'.join(raw))
+            continue
+
+        paragraph = []
+        while i < len(lines) and lines[i].strip():
+            current = lines[i]
+            if paragraph and (re.match(r'^(#{1,6})\s', current) or _LIST_ITEM.match(current)
+                              or current.strip().startswith(('>', '```', '~~~')) or _HR.match(current)):
+                break
+            paragraph.append(current.strip())
+            i += 1
+        # 行末のスペース2つ（またはバックスラッシュ）は改行
+        joined = '\n'.join(paragraph)
+        rendered = render_inline(re.sub(r'(  |\\)\n', '\u0001', joined)).replace('\u0001', '<br>\n')
+        blocks.append(f'<p>{rendered}</p>')
+
+    return '\n\n'.join(blocks)
+
+
+def plain_text(html_text):
+    return re.sub(r'\s+', ' ', html.unescape(re.sub(r'<[^>]+>', ' ', html_text))).strip()
+
+
+# --- テンプレート ---
+
+_INCLUDE = re.compile(r'\{%\s*include\s+"([^"]+)"\s*%\}')
+_IF = re.compile(r'\{%\s*if\s+(\w+)\s*%\}(.*?)\{%\s*endif\s*%\}', re.S)
+_VAR = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+
+def load_template(templates_dir, name, deps=None, _stack=()):
+    """
+    include を展開したテンプレートを返す。deps（dict）に読み込んだファイルと内容ハッシュを追加する。
+    include の循環はエラー
+    """
+    if name in _stack:
+        raise ValueError(f"テンプレートの include が循環しています: {' -> '.join(_stack + (name,))}")
+    path = os.path.join(templates_dir, name)
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if deps is not None:
+        deps[f"templates/{name}"] = sha256(text)
+    return _INCLUDE.sub(
+        lambda m: load_template(templates_dir, m.group(1), deps, _stack + (name,)).rstrip('\n'), text
+    )
+
+
+def render_template(template, context):
+    text = _IF.sub(lambda m: m.group(2) if context.get(m.group(1)) else '', template)
+    return _VAR.sub(lambda m: str(context.get(m.group(1), '')), text)
+
+
+# --- サイト ---
+
+def sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def slug_for(file_name, meta):
+    """2026-01-24_Quartz_Troubleshooting.md → quartz-troubleshooting（front matter の slug を優先）"""
+    if meta.get('slug'):
+        return str(meta['slug'])
+    stem = os.path.splitext(file_name)[0]
+    stem = re.sub(r'^\d{4}-\d{2}-\d{2}[_-]', '', stem)
+    return re.sub(r'[^a-z0-9]+', '-', stem.lower()).strip('-')
+
+
+def load_series(path):
+    """slug → (シリーズ, 位置)。ナビゲーションは前後の記事にも依存するのでシリーズ全体を渡す"""
+    try:
+        return series_nav.index_series(series_nav.load_config(path))
+    except (OSError, ValueError):
+        return {}
+
+
+def load_related(path, slug):
+    """[(slug, タイトル)]。related.json が無い・壊れている場合は空"""
+    try:
+        return related_articles.related_entries(slug, path)
+    except (OSError, ValueError):
+        return []
+
+
+def render_page(source_path, slug, template, series, related=()):
+    """1ページ分の HTML を作る（ワーカープロセスで実行）"""
+    with open(source_path, 'r', encoding='utf-8') as f:
+        meta, body = parse_front_matter(f.read())
+    title = str(meta.get('title') or slug)
+    # 本文先頭の H1 はタイトルと重複するので除く（テンプレートが出す）
+    body = re.sub(r'^\s*#\s+[^\n]*\n', '', body, count=1)
+    content = render_markdown(body)
+    text = plain_text(content)
+
+    tags = meta.get('tags') or []
+    if isinstance(tags, str):
+        tags = [t.strip() for t in tags.split(',') if t.strip()]
+    tags = sorted(tags, key=lambda t: t not in TAG_CLASSES)
+    tags_html = '\n'.join(
+        f'                <span class="tag{" " + TAG_CLASSES[t] if t in TAG_CLASSES else ""}">{html.escape(str(t))}</span>'
+        for t in tags
+    )
+    description = str(meta.get('description') or text[:120])
+    context = {
+        'title': html.escape(title),
+        'date': html.escape(str(meta.get('date', ''))),
+        'description': html.escape(description),
+        'reading_minutes': max(1, round(len(text) / CHARS_PER_MINUTE)),
+        'tags_html': tags_html,
+        # <pre> の中身が変わるので字下げはしない
+        'content': content,
+        'slug': slug,
+    }
+    if series:
+        entry, position = series
+        context.update({
+            'series_title': html.escape(entry.get('title', '')),
+            'series_position': position + 1,
+            'series_total': len(entry.get('articles', [])),
+            # postprocess-html.py の series-nav と同じブロック（後処理で差分が出ない）
+            'series_nav': series_nav.format_block(entry, position),
+        })
+    # postprocess-html.py の related と同じブロック
+    context['related'] = related_articles.format_block(list(related))
+    return render_template(template, context)
+
+
+def write_atomic(path, text):
+    """同じディレクトリの一時ファイルに書いてから rename する"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def build_one(task):
+    """ワーカー: (slug, 元ファイル, 出力先, テンプレート, シリーズ情報, 関連記事, dry_run) → 結果 dict"""
+    slug, source_path, output_path, template, series, related, dry_run = task
+    try:
+        page = render_page(source_path, slug, template, series, related)
+        digest = sha256(page)
+        changed = True
+        if os.path.exists(output_path):
+            with open(output_path, 'r', encoding='utf-8', newline='') as f:
+                changed = sha256(f.read()) != digest
+        if changed and not dry_run:
+            write_atomic(output_path, page)
+        return {"slug": slug, "hash": digest, "written": changed, "error": None}
+    except Exception as e:
+        return {"slug": slug, "hash": None, "written": False, "error": str(e)}
+
+
+class SiteGenerator:
+    """
+    Markdown → HTML の差分ビルド。
+    依存グラフ（ページ → 元ファイル・テンプレート・パーシャル・シリーズ設定・関連記事）と各依存のハッシュを状態ファイルに保存する
+    """
+
+    def __init__(self, content_dir=CONTENT_DIR, templates_dir=TEMPLATES_DIR, out_dir=ARTICLES_DIR,
+                 series_config=SERIES_CONFIG, state_file=STATE_FILE, related_file=RELATED_FILE):
+        self.content_dir = content_dir
+        self.templates_dir = templates_dir
+        self.out_dir = out_dir
+        self.series_config = series_config
+        self.state_file = state_file
+        self.related_file = related_file
+
+    def load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {"version": GENERATOR_VERSION, "sources": {}, "pages": {}}
+        if state.get("version") != GENERATOR_VERSION:
+            return {"version": GENERATOR_VERSION, "sources": {}, "pages": {}}
+        return state
+
+    def save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        with open(self.state_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(self.state_file + '.tmp', self.state_file)
+
+    def _source_hash(self, path, state):
+        """mtime とサイズが前回と同じなら読まずに前回のハッシュを使う"""
+        st = os.stat(path)
+        entry = state["sources"].get(path)
+        if entry and entry["signature"] == [st.st_mtime_ns, st.st_size]:
+            return entry["hash"], entry["meta"]
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        meta, _ = parse_front_matter(text)
+        meta = {"slug": slug_for(os.path.basename(path), meta), "layout": str(meta.get("layout") or DEFAULT_LAYOUT)}
+        state["sources"][path] = {"signature": [st.st_mtime_ns, st.st_size], "hash": sha256(text), "meta": meta}
+        return state["sources"][path]["hash"], meta
+
+    def plan(self, state, force=False, adopt=False, only=None):
+        """
+        ページごとの依存を集めて、生成が必要なページと理由を返す。
+        戻り値は (タスクのリスト, 理由 dict, 新しいページ状態, スキップした手書きページ)
+        """
+        sources = sorted(
+            os.path.join(self.content_dir, f) for f in os.listdir(self.content_dir) if f.endswith('.md')
+        )
+        series = load_series(self.series_config)
+        templates = {}
+        tasks, reasons, pages, hand_written = [], {}, {}, []
+        seen_sources = set()
+
+        for source in sources:
+            seen_sources.add(source)
+            source_hash, meta = self._source_hash(source, state)
+            slug, layout = meta["slug"], meta["layout"]
+            if only and slug not in only:
+                if slug in state["pages"]:
+                    pages[slug] = state["pages"][slug]
+                continue
+            if layout not in templates:
+                deps = {}
+                templates[layout] = (load_template(self.templates_dir, f"{layout}.html", deps), deps)
+            template, template_deps = templates[layout]
+
+            page_series = series.get(slug)
+            page_related = load_related(self.related_file, slug)
+            deps = {"source": source_hash, **template_deps,
+                    "series-config.json#" + slug: sha256(json.dumps(page_series, sort_keys=True)),
+                    "related.json#" + slug: sha256(json.dumps(page_related))}
+            output = os.path.join(self.out_dir, f"{slug}.html")
+            previous = state["pages"].get(slug)
+
+            reason = None
+            if force:
+                reason = "force"
+            elif previous is None:
+                reason = "new"
+            elif previous["deps"] != deps:
+                changed = sorted(k for k in set(deps) | set(previous["deps"]) if deps.get(k) != previous["deps"].get(k))
+                reason = "changed: " + ", ".join(changed)
+            elif not os.path.exists(output):
+                reason = "output missing"
+            else:
+                st = os.stat(output)
+                if previous["output"][:2] != [st.st_mtime_ns, st.st_size]:
+                    reason = "output modified"
+
+            if reason and previous is None and os.path.exists(output) and not adopt:
+                # 生成物ではない手書きのHTMLは上書きしない
+                with open(output, 'r', encoding='utf-8') as f:
+                    if GENERATOR_MARKER not in f.read():
+                        hand_written.append(slug)
+                        continue
+
+            pages[slug] = {"source": os.path.relpath(source, self.content_dir), "deps": deps,
+                           "output": previous["output"] if previous else None}
+            if reason:
+                reasons[slug] = reason
+                tasks.append((slug, source, output, template, page_series, page_related))
+
+        # 削除された Markdown の状態は消す（出力された HTML は残す）
+        state["sources"] = {k: v for k, v in state["sources"].items() if k in seen_sources}
+        return tasks, reasons, pages, hand_written
+
+    def build(self, force=False, adopt=False, dry_run=False, workers=None, only=None, quiet=False):
+        started = time.perf_counter()
+        state = self.load_state()
+        tasks, reasons, pages, hand_written = self.plan(state, force=force, adopt=adopt, only=only)
+        planned = time.perf_counter()
+
+        results = []
+        jobs = [task + (dry_run,) for task in tasks]
+        if jobs:
+            os.makedirs(self.out_dir, exist_ok=True)
+            workers = workers or os.cpu_count() or 1
+            if workers > 1 and len(jobs) >= PARALLEL_THRESHOLD:
+                chunksize = max(1, len(jobs) // (workers * 4))
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(build_one, jobs, chunksize=chunksize))
+            else:
+                results = [build_one(job) for job in jobs]
+
+        errors = []
+        for task, result in zip(tasks, results):
+            slug, output = task[0], task[2]
+            if result["error"]:
+                errors.append(result)
+                pages.pop(slug, None)
+                continue
+            if not dry_run:
+                st = os.stat(output)
+                pages[slug]["output"] = [st.st_mtime_ns, st.st_size, result["hash"]]
+            if not quiet:
+                mark = "✅" if result["written"] else "＝"
+                print(f"{mark} {slug}.html ({reasons[slug]})")
+
+        if not dry_run:
+            state["pages"] = {**{k: v for k, v in state["pages"].items() if only and k not in pages}, **pages}
+            self.save_state(state)
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            "pages": len(pages) + len(hand_written),
+            "rendered": len(results) - len(errors),
+            "written": sum(1 for r in results if r["written"]),
+            "skipped": len(pages) - len(results) + len(errors),
+            "hand_written": hand_written,
+            "errors": errors,
+            "plan_seconds": planned - started,
+            "seconds": elapsed,
+        }
+        if not quiet:
+            for error in errors:
+                print(f"❌ {error['slug']}: {error['error']}")
+            if hand_written:
+                print(f"⏭️  手書きのHTMLがあるため未生成（--adopt で置き換え）: {', '.join(hand_written)}")
+            print(f"\nページ: {summary['pages']}件 / 生成: {summary['rendered']}件"
+                  f"（書き込み {summary['written']}件） / 変更なし: {summary['skipped']}件 / エラー: {len(errors)}件")
+            print(f"⏱️  {elapsed:.3f}秒（依存の確認 {summary['plan_seconds']:.3f}秒）")
+        return summary
+
+
+# --- 計測 ---
+
+def run_benchmark(count, workers=None):
+    """合成した count 記事で、全体・変更なし・1記事の編集・テンプレートの編集のビルド時間を測る"""
+    workdir = tempfile.mkdtemp(prefix='mochi-ssg-bench-')
+    try:
+        content_dir = os.path.join(workdir, 'content')
+        os.makedirs(content_dir)
+        shutil.copytree(TEMPLATES_DIR, os.path.join(workdir, 'templates'))
+        with open(os.path.join(CONTENT_DIR, sorted(os.listdir(CONTENT_DIR))[0]), 'r', encoding='utf-8') as f:
+            _, sample = parse_front_matter(f.read())
+        for i in range(count):
+            with open(os.path.join(content_dir, f'post-{i:05d}.md'), 'w', encoding='utf-8') as f:
+                f.write(f'---\ntitle: "合成記事 {i}"\ndate: 2026-01-01\ntags: [Bench, Burn]\n---\n\n{sample}')
+        generator = SiteGenerator(content_dir, os.path.join(workdir, 'templates'), os.path.join(workdir, 'articles'),
+                                  SERIES_CONFIG, os.path.join(workdir, 'state.json'))
+
+        def timed(label, prepare=None):
+            if prepare:
+                prepare()
+            summary = generator.build(workers=workers, quiet=True)
+            print(f"{label:<16} {summary['seconds']:8.3f}秒  生成 {summary['rendered']:>6}件")
+            return summary
+
+        def edit_post():
+            with open(os.path.join(content_dir, 'post-00000.md'), 'a', encoding='utf-8') as f:
+                f.write('\n追記しました。\n')
+
+        def edit_template():
+            path = os.path.join(workdir, 'templates', 'partials', 'site-footer.html')
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write('<!-- edited -->\n')
+
+        print(f"合成記事 {count} 件 / ワーカー {workers or os.cpu_count()}")
+        timed("全体ビルド")
+        timed("変更なし")
+        timed("1記事の編集", edit_post)
+        timed("テンプレート編集", edit_template)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='blog/content の Markdown を blog/articles の HTML に差分ビルドする')
+    parser.add_argument('--force', action='store_true', help='依存に関わらず全ページを生成し直す')
+    parser.add_argument('--adopt', action='store_true', help='同名の手書きHTMLを Markdown から生成したもので置き換える')
+    parser.add_argument('--dry-run', action='store_true', help='書き込まずに生成対象と理由だけ表示する')
+    parser.add_argument('--only', nargs='+', metavar='SLUG', help='指定したページだけ生成する')
+    parser.add_argument('--workers', type=int, default=None, help='並列プロセス数（既定: CPU数）')
+    parser.add_argument('--bench', type=int, metavar='N', help='合成した N 記事でビルド時間を計測する')
+    args = parser.parse_args()
+
+    if args.bench:
+        run_benchmark(args.bench, workers=args.workers)
+        sys.exit(0)
+    try:
+        summary = SiteGenerator().build(force=args.force, adopt=args.adopt, dry_run=args.dry_run,
+                                        workers=args.workers, only=args.only)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    sys.exit(1 if summary["errors"] else 0)
@@ -0,0 +1,251 @@
+"""
+検索インデックス（分割済み転置インデックス）を作成する
+
+    python blog/scripts/build-search-index.py            # 変更された記事だけ再解析
+    python blog/scripts/build-search-index.py --rebuild  # 全記事を作り直す
+
+出力先: blog/search-index/
+  manifest.json  シャード数・各ファイルのハッシュ（search.js が最初に読む唯一のファイル）
+  t-<n>.json     転置インデックス {語: [記事ID, ...]}。語の先頭文字のコードポイント % シャード数 で分割
+  d-<n>.json     記事情報 [[タイトル, URL, 抜粋, タグ], ...]。記事ID // DOC_SHARD_SIZE で分割
+
+語は英数字なら単語単位、日本語などは文字 bigram と unigram（1文字の検索語が語の途中にあっても見つかるように）。
+search.js は検索語に必要なシャードだけを取得するため、記事が増えても1回の検索で読む量はほぼ一定。
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import unicodedata
+
+BLOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ROOT_DIR = os.path.abspath(os.path.join(BLOG_DIR, '..'))
+sys.path.append(os.path.join(ROOT_DIR, 'scripts', 'marketing'))
+
+from utils import get_article_data
+
+ARTICLES_DIR = os.path.join(BLOG_DIR, 'articles')
+OUTPUT_DIR = os.path.join(BLOG_DIR, 'search-index')
+# 記事ごとの抽出結果（次回のビルドで未変更の記事を再利用する）
+STATE_FILE = os.path.join(ROOT_DIR, 'scripts', 'marketing', 'data', 'search_index_state.json')
+
+FORMAT_VERSION = 2
+TERMS_PER_SHARD = 1000
+DOC_SHARD_SIZE = 100
+EXCERPT_LENGTH = 150
+
+# search.js の tokenize() と同じ規則にすること
+WORD_RE = re.compile(r'[a-z0-9]+|(?:(?![\x00-\x7f])[^\W_])+')
+TAG_RE = re.compile(r'<span class="tag">(.*?)</span>')
+
+
+def normalize(text):
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def tokenize(text):
+    """
+    インデックスする語の集合を返す。
+    日本語などは bigram に加えて1文字ずつも登録する（「術」で「技術」を引けるように。
+    bigram は先頭の文字でシャードが決まるので、2文字目にある文字は前方一致では探せない）
+    """
+    terms = set()
+    for run in WORD_RE.findall(normalize(text)):
+        if run.isascii():
+            terms.add(run)
+        else:
+            terms.update(run)
+            terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def shard_of(term, shard_count):
+    return ord(term[0]) % shard_count
+
+
+def extract_doc(file_path):
+    """1記事分の表示用データと語の集合を作る"""
+    title, body = get_article_data(file_path)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        tags = [tag.strip() for tag in TAG_RE.findall(f.read())]
+    body = re.sub(r'\s+', ' ', body or '').strip()
+    excerpt = body[:EXCERPT_LENGTH] + ('...' if len(body) > EXCERPT_LENGTH else '')
+    return {
+        "title": title,
+        "excerpt": excerpt,
+        "tags": tags,
+        "terms": sorted(tokenize(" ".join([title or '', " ".join(tags), body])))
+    }
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {"version": FORMAT_VERSION, "next_id": 0, "docs": {}}
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  状態ファイルを読めないため全件作り直します: {e}")
+        return {"version": FORMAT_VERSION, "next_id": 0, "docs": {}}
+    if state.get("version") != FORMAT_VERSION:
+        return {"version": FORMAT_VERSION, "next_id": 0, "docs": {}}
+    return state
+
+
+def write_atomic(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def dump(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+
+
+def short_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:10]
+
+
+def update_docs(state, rebuild=False):
+    """記事を走査して state['docs'] を更新する。戻り値は (再解析した件数, 再利用した件数, 削除した件数)"""
+    if rebuild:
+        state.update({"next_id": 0, "docs": {}})
+    docs = state["docs"]
+    files = sorted(
+        f for f in os.listdir(ARTICLES_DIR) if f.endswith('.html') and not f.endswith('.backup')
+    )
+    extracted = reused = 0
+    for name in files:
+        file_path = os.path.join(ARTICLES_DIR, name)
+        st = os.stat(file_path)
+        signature = f"{st.st_mtime_ns}:{st.st_size}"
+        url = f"articles/{name}"
+        doc = docs.get(url)
+        if doc and doc["signature"] == signature:
+            reused += 1
+            continue
+        try:
+            data = extract_doc(file_path)
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+            continue
+        # 記事IDは一度振ったら変えない（変更の無いシャードを書き換えないため）
+        data["id"] = doc["id"] if doc else state["next_id"]
+        if not doc:
+            state["next_id"] += 1
+        data["signature"] = signature
+        docs[url] = data
+        extracted += 1
+        print(f"Indexed: {name}")
+
+    removed = [url for url in docs if url.split('/', 1)[1] not in files]
+    for url in removed:
+        print(f"Removed: {url}")
+        del docs[url]
+    return extracted, reused, len(removed)
+
+
+def build_shards(state):
+    """state から出力ファイルの内容 {ファイル名: JSON文字列} と manifest を作る"""
+    docs = state["docs"]
+    postings = {}
+    for url, doc in docs.items():
+        for term in doc["terms"]:
+            postings.setdefault(term, []).append(doc["id"])
+
+    # 語数に応じてシャード数を2の累乗で増やす
+    shard_count = 1
+    while len(postings) / shard_count > TERMS_PER_SHARD:
+        shard_count *= 2
+
+    term_shards = [{} for _ in range(shard_count)]
+    for term, ids in postings.items():
+        term_shards[shard_of(term, shard_count)][term] = sorted(ids)
+
+    doc_shard_count = (state["next_id"] + DOC_SHARD_SIZE - 1) // DOC_SHARD_SIZE
+    doc_shards = [[None] * DOC_SHARD_SIZE for _ in range(doc_shard_count)]
+    for url, doc in docs.items():
+        doc_shards[doc["id"] // DOC_SHARD_SIZE][doc["id"] % DOC_SHARD_SIZE] = [
+            doc["title"], url, doc["excerpt"], doc["tags"]
+        ]
+
+    files = {}
+    for i, shard in enumerate(term_shards):
+        files[f"t-{i}.json"] = dump(shard)
+    for i, shard in enumerate(doc_shards):
+        # 末尾の空き（削除済み・未使用の ID）は省く
+        while shard and shard[-1] is None:
+            shard.pop()
+        files[f"d-{i}.json"] = dump(shard)
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "termShards": shard_count,
+        "docShardSize": DOC_SHARD_SIZE,
+        "docs": len(docs),
+        "terms": len(postings),
+        "files": {name: short_hash(text) for name, text in files.items()}
+    }
+    return files, manifest
+
+
+def write_index(files, manifest):
+    """内容が変わったファイルだけ書き込み、不要になったシャードを削除する。戻り値は書き込んだ件数"""
+    written = 0
+    for name, text in files.items():
+        path = os.path.join(OUTPUT_DIR, name)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                if f.read() == text:
+                    continue
+        write_atomic(path, text)
+        written += 1
+
+    for name in os.listdir(OUTPUT_DIR):
+        if re.fullmatch(r'[td]-\d+\.json', name) and name not in files:
+            os.remove(os.path.join(OUTPUT_DIR, name))
+
+    write_atomic(os.path.join(OUTPUT_DIR, 'manifest.json'), dump(manifest))
+    return written
+
+
+def build_search_index(rebuild=False):
+    started = time.perf_counter()
+    if not os.path.exists(ARTICLES_DIR):
+        print(f"Error: Articles directory not found at {ARTICLES_DIR}")
+        return None
+
+    state = load_state()
+    extracted, reused, removed = update_docs(state, rebuild=rebuild)
+    files, manifest = build_shards(state)
+    written = write_index(files, manifest)
+    write_atomic(STATE_FILE, json.dumps(state, ensure_ascii=False))
+    elapsed = time.perf_counter() - started
+
+    sizes = {name: len(text.encode('utf-8')) for name, text in files.items()}
+    term_sizes = [size for name, size in sizes.items() if name.startswith('t-')]
+    doc_sizes = [size for name, size in sizes.items() if name.startswith('d-')] or [0]
+    manifest_size = len(dump(manifest).encode('utf-8'))
+
+    print("\n" + "=" * 50)
+    print(f"📚 記事: {manifest['docs']}件（再解析 {extracted} / 再利用 {reused} / 削除 {removed}）")
+    print(f"🔤 語: {manifest['terms']}件 / 語シャード {len(term_sizes)}個 / 記事シャード {len(doc_sizes)}個")
+    print(f"💾 インデックス合計: {(sum(sizes.values()) + manifest_size) / 1024:.1f} KB"
+          f"（manifest {manifest_size / 1024:.1f} KB, 最大語シャード {max(term_sizes) / 1024:.1f} KB,"
+          f" 最大記事シャード {max(doc_sizes) / 1024:.1f} KB）")
+    print(f"✏️  書き込み: {written}ファイル（変更なし {len(files) - written}）")
+    print(f"⏱️  ビルド時間: {elapsed:.2f}秒")
+    print("=" * 50)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='ブログ記事の分割検索インデックスを作成する')
+    parser.add_argument('--rebuild', action='store_true', help='記事IDを振り直して全件作り直す')
+    args = parser.parse_args()
+    build_search_index(rebuild=args.rebuild)
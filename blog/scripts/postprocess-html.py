@@ -0,0 +1,293 @@
+"""
+記事HTMLの後処理（スクリプトタグの挿入など）を1ファイル1回の読み書きでまとめて行う
+
+    python blog/scripts/postprocess-html.py             # 全インジェクタを適用
+    python blog/scripts/postprocess-html.py --dry-run   # 書き込まずに差分だけ表示
+    python blog/scripts/postprocess-html.py --only search --workers 4
+
+inject-search.py / inject-series-nav.js の置き換え。
+シリーズナビゲーションは series-config.json から計算した HTML をそのまま埋め込む（series_nav.py）。
+関連記事は related_articles.py が書いた related.json から埋め込む。
+インジェクタを追加するときは Injector を継承したクラスを作り、INJECTORS に登録する。
+"""
+import os
+import sys
+import json
+import time
+import difflib
+import hashlib
+import argparse
+import tempfile
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import series_nav
+import related_articles
+
+BLOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ROOT_DIR = os.path.abspath(os.path.join(BLOG_DIR, '..'))
+ARTICLES_DIR = os.path.join(BLOG_DIR, 'articles')
+# 前回処理したファイルのハッシュ（変更の無いファイルは読み込みも変換もしない）
+STATE_FILE = os.path.join(ROOT_DIR, 'scripts', 'marketing', 'data', 'postprocess_state.json')
+
+
+class Injector(ABC):
+    """
+    1つの変換。apply() は変更不要ならそのままの文字列を返すこと（冪等）。
+    apply() を実装し忘れたインジェクタはインスタンス化の時点でエラーになる（プロセスプールで実行する前）
+    """
+    name = None
+    version = 1
+
+    @abstractmethod
+    def apply(self, content, file_path):
+        """content を変換した文字列を返す"""
+
+    def fingerprint(self):
+        """出力に影響する設定の識別子（変わったら全ファイルを処理し直す）"""
+        return str(self.version)
+
+
+class ScriptTagInjector(Injector):
+    """</body> の直前に <script> タグを挿入する（marker を含むファイルはスキップ）"""
+
+    def __init__(self, name, marker, tag, version=1):
+        self.name = name
+        self.marker = marker
+        self.tag = tag
+        self.version = version
+
+    def apply(self, content, file_path):
+        if self.marker in content:
+            return content
+        index = content.lower().rfind('</body>')
+        if index == -1:
+            raise ValueError('</body> タグが見つかりません')
+        # </body> 直前の空白は </body> 側に残す
+        start = len(content[:index].rstrip())
+        return content[:start] + '\n' + self.tag.rstrip('\n') + content[start:index] + content[index:]
+
+
+class SeriesNavInjector(Injector):
+    """
+    シリーズの前後・一覧のナビゲーションを記事に埋め込む（series-config.json の取得を不要にする）。
+    設定が変わればブロックを差し替え、シリーズから外れた記事からは取り除く
+    """
+    name = 'series-nav'
+    version = 2
+
+    def __init__(self, config_path=series_nav.SERIES_CONFIG):
+        self.config_path = config_path
+
+    def apply(self, content, file_path):
+        slug = os.path.splitext(os.path.basename(file_path))[0]
+        return series_nav.embed_navigation(content, slug, self.config_path)
+
+    def fingerprint(self):
+        return f"{self.version}:{series_nav.config_fingerprint(self.config_path)}"
+
+
+class RelatedInjector(Injector):
+    """
+    関連記事（related_articles.py が計算した related.json）を記事に埋め込む。
+    related.json が変わればブロックを差し替え、関連記事が無くなった記事からは取り除く
+    """
+    name = 'related'
+
+    def __init__(self, path=related_articles.RELATED_FILE):
+        self.path = path
+
+    def apply(self, content, file_path):
+        slug = os.path.splitext(os.path.basename(file_path))[0]
+        return related_articles.embed_related(content, slug, self.path)
+
+    def fingerprint(self):
+        return f"{self.version}:{related_articles.related_fingerprint(self.path)}"
+
+
+INJECTORS = [
+    SeriesNavInjector(),
+    RelatedInjector(),
+    ScriptTagInjector(
+        'search', 'js/search.js',
+        '  <!-- Search Capability -->\n  <script src="../js/search.js"></script>\n'
+    ),
+]
+
+
+def get_injectors(names=None):
+    if not names:
+        return list(INJECTORS)
+    by_name = {injector.name: injector for injector in INJECTORS}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f"不明なインジェクタ: {', '.join(unknown)}（利用可能: {', '.join(by_name)}）")
+    return [by_name[name] for name in names]
+
+
+def pipeline_signature(injectors):
+    """インジェクタ構成が変わったら全ファイルを処理し直すための識別子"""
+    return ",".join(f"{injector.name}@{injector.fingerprint()}" for injector in injectors)
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def write_atomic(path, text):
+    """同じディレクトリの一時ファイルに書いてから rename する（途中で落ちても壊れない）"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def process_file(file_path, injector_names, dry_run=False, known_hash=None):
+    """
+    1ファイルを読み込み、全インジェクタを順に適用して1回だけ書き込む（ワーカープロセスで実行）。
+    戻り値は dict(file, status, applied, hash, diff, error)
+    """
+    name = os.path.basename(file_path)
+    result = {"file": name, "status": "unchanged", "applied": [], "hash": None, "diff": None, "error": None}
+    try:
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            original = f.read()
+        result["hash"] = sha256(original)
+        if known_hash and result["hash"] == known_hash:
+            return result
+
+        content = original
+        for injector in get_injectors(injector_names):
+            updated = injector.apply(content, file_path)
+            if updated != content:
+                result["applied"].append(injector.name)
+                content = updated
+
+        if content == original:
+            return result
+
+        result["status"] = "changed"
+        if dry_run:
+            result["diff"] = "".join(difflib.unified_diff(
+                original.splitlines(keepends=True), content.splitlines(keepends=True),
+                fromfile=f"a/{name}", tofile=f"b/{name}"
+            ))
+        else:
+            write_atomic(file_path, content)
+            result["hash"] = sha256(content)
+    except Exception as e:
+        result.update(status="error", error=str(e))
+    return result
+
+
+def load_state(signature):
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # インジェクタ構成が変わっていれば前回の結果は使わない
+    if state.get("pipeline") != signature:
+        return {}
+    return state.get("files", {})
+
+
+def save_state(signature, files):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    with open(STATE_FILE + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({"pipeline": signature, "files": files}, f, ensure_ascii=False)
+    os.replace(STATE_FILE + '.tmp', STATE_FILE)
+
+
+def postprocess(articles_dir=ARTICLES_DIR, injector_names=None, dry_run=False, workers=None, force=False):
+    started = time.perf_counter()
+    injectors = get_injectors(injector_names)
+    names = [injector.name for injector in injectors]
+    signature = pipeline_signature(injectors)
+
+    print('=' * 60)
+    print(f"HTML 後処理: {', '.join(names)}" + ("（dry-run）" if dry_run else ""))
+    print('=' * 60)
+
+    if not os.path.exists(articles_dir):
+        print(f"\n❌ エラー: {articles_dir} が見つかりません")
+        return None
+    # 設定に誤りがあれば壊れたナビゲーションを埋め込まない
+    if 'series-nav' in names and not series_nav.check(articles_dir=articles_dir):
+        print("\n❌ series-config.json を修正してから実行してください")
+        return None
+
+    files = sorted(
+        os.path.join(articles_dir, f) for f in os.listdir(articles_dir)
+        if f.endswith('.html') and not f.endswith('.backup')
+    )
+    state = {} if force else load_state(signature)
+
+    # mtime とサイズが前回の処理後と同じファイルは開かずにスキップ
+    targets, skipped = [], []
+    for file_path in files:
+        st = os.stat(file_path)
+        entry = state.get(os.path.abspath(file_path))
+        if entry and entry["signature"] == [st.st_mtime_ns, st.st_size]:
+            skipped.append(file_path)
+        else:
+            targets.append((file_path, entry["hash"] if entry else None))
+
+    results = []
+    if targets:
+        workers = workers or min(len(targets), os.cpu_count() or 1)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(process_file, path, names, dry_run, known) for path, known in targets]
+                results = [future.result() for future in futures]
+        else:
+            results = [process_file(path, names, dry_run, known) for path, known in targets]
+
+    new_state = {os.path.abspath(path): state[os.path.abspath(path)] for path in skipped}
+    for (file_path, _), result in zip(targets, results):
+        if result["status"] == "changed":
+            print(f"✅ {result['file']}: {', '.join(result['applied'])}")
+            if result["diff"]:
+                print(result["diff"])
+        elif result["status"] == "error":
+            print(f"❌ {result['file']}: {result['error']}")
+        # 書き込んでいない（dry-run / エラー）ファイルは次回も処理対象にする
+        if result["status"] == "unchanged" or (result["status"] == "changed" and not dry_run):
+            st = os.stat(file_path)
+            new_state[os.path.abspath(file_path)] = {"signature": [st.st_mtime_ns, st.st_size], "hash": result["hash"]}
+
+    if not dry_run:
+        save_state(signature, new_state)
+
+    changed = [r for r in results if r["status"] == "changed"]
+    errors = [r for r in results if r["status"] == "error"]
+    print('\n' + '=' * 60)
+    print(f"対象: {len(files)}件 / {'変更予定' if dry_run else '変更'}: {len(changed)}件 / "
+          f"変更なし: {len(results) - len(changed) - len(errors)}件 / 未変更スキップ: {len(skipped)}件 / "
+          f"エラー: {len(errors)}件")
+    print(f"⏱️  {time.perf_counter() - started:.2f}秒")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='記事HTMLにスクリプトタグ等をまとめて挿入する')
+    parser.add_argument('--dry-run', action='store_true', help='書き込まずに差分を表示する')
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='適用するインジェクタを限定する')
+    parser.add_argument('--workers', type=int, default=None, help='並列プロセス数（既定: CPU数）')
+    parser.add_argument('--force', action='store_true', help='前回の処理結果を無視して全ファイルを読み直す')
+    parser.add_argument('--dir', default=ARTICLES_DIR, help='対象ディレクトリ')
+    args = parser.parse_args()
+    try:
+        results = postprocess(args.dir, args.only, dry_run=args.dry_run, workers=args.workers, force=args.force)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if results is None or any(r["status"] == "error" for r in results):
+        sys.exit(1)
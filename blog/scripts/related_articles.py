@@ -0,0 +1,531 @@
+"""
+関連記事（シリーズをまたいだ「あわせて読みたい」）をビルド時に計算する
+
+    python blog/scripts/related_articles.py             # blog/related.json を更新（変更された記事だけ再解析）
+    python blog/scripts/related_articles.py --rebuild   # 特徴量を作り直す
+    python blog/scripts/related_articles.py --bench 2000
+
+記事のタイトル・タグ・本文（utils.get_article_data）を文字 n-gram の TF-IDF ベクトルにし、
+全記事どうしのコサイン類似度を疎行列の積でまとめて計算して、各記事の上位 TOP_K 件を related.json に書く。
+記事ごとの n-gram の出現数は data/related_features.db に保存し、内容の変わった記事だけ数え直す。
+IDF は記事全体で決まるので類似度は毎回全件で計算する（行列1回分なので数千記事でも数秒）。
+
+ページへの埋め込みは postprocess-html.py（related インジェクタ）と build-articles.py が行う。
+NumPy / SciPy が無い環境では同じ計算を転置インデックスで行う（結果は同じ。記事が多いと遅い）。
+"""
+import os
+import re
+import sys
+import json
+import html
+import math
+import time
+import heapq
+import random
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+BLOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ROOT_DIR = os.path.abspath(os.path.join(BLOG_DIR, '..'))
+ARTICLES_DIR = os.path.join(BLOG_DIR, 'articles')
+RELATED_FILE = os.path.join(BLOG_DIR, 'related.json')
+FEATURES_DB = os.path.join(ROOT_DIR, 'scripts', 'marketing', 'data', 'related_features.db')
+
+# n-gram の作り方を変えたら上げる（特徴量が作り直される）
+FEATURE_VERSION = 1
+NGRAM_SIZES = (2, 3)
+TOP_K = 5
+# これより似ていない記事は関連記事に出さない
+MIN_SCORE = 0.05
+# 1記事にしか無い n-gram は類似度に効かない。半分以上の記事にある n-gram は「です」「する」のような語なので除く
+MIN_DF = 2
+MAX_DF_RATIO = 0.5
+# 1記事のベクトルに残す n-gram の数（TF-IDF の大きい順）。記事の特徴を表すには十分で、行列の積が軽くなる
+MAX_TERMS = 256
+# 類似度行列を一度に作る行数（記事数 × この行数の密行列になる）
+BLOCK_ROWS = 512
+
+BLOCK_START = '<!-- related:start -->'
+BLOCK_END = '<!-- related:end -->'
+
+TAG_RE = re.compile(r'<span class="tag[^"]*">(.*?)</span>')
+TITLE_RE = re.compile(r'<title>(.*?)</title>', re.S)
+# <title> の末尾のサイト名
+SITE_SUFFIX_RE = re.compile(r'\s*[|｜]\s*[^|｜]*$')
+
+
+# --- 特徴量 ---
+
+def normalize(text):
+    """全角・半角や大文字小文字を揃え、空白・記号を除く（日本語は分かち書きしないので文字単位で扱う）"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return re.sub(r'[\W_]+', '', text)
+
+
+def ngram_counts(text):
+    """文字 n-gram（NGRAM_SIZES）の出現数"""
+    text = normalize(text)
+    counts = Counter()
+    for n in NGRAM_SIZES:
+        counts.update(map(''.join, zip(*(text[i:] for i in range(n)))))
+    return counts
+
+
+def read_article(file_path):
+    """(タイトル, 特徴量を作る文字列)。本文は記事キャッシュ経由で取り出す"""
+    from utils import get_article_data
+    title, body = get_article_data(file_path)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        raw = f.read()
+    tags = [html.unescape(tag.strip()) for tag in TAG_RE.findall(raw)]
+    if title == os.path.basename(file_path):
+        # h1.article-title の無い記事は <title> からサイト名を除いたもの
+        match = TITLE_RE.search(raw)
+        if match:
+            title = SITE_SUFFIX_RE.sub('', html.unescape(match.group(1)).strip()) or title
+    return title, " ".join([title or '', " ".join(tags), body or ''])
+
+
+class FeatureStore:
+    """
+    記事ごとの n-gram 出現数（SQLite）。n-gram は通し番号にして、記事には番号と出現数の配列だけを持たせる。
+    未変更の記事は配列を読むだけなので、記事の再解析は変更された分だけで済む
+    """
+
+    def __init__(self, db_path=FEATURES_DB):
+        self.db_path = db_path
+        self._conn = None
+        self._vocabulary = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path)
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS grams (id INTEGER PRIMARY KEY, gram TEXT NOT NULL UNIQUE);
+                CREATE TABLE IF NOT EXISTS docs (
+                    slug TEXT PRIMARY KEY,
+                    signature TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    title TEXT,
+                    ids BLOB NOT NULL,
+                    counts BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """)
+            row = conn.execute("SELECT value FROM meta WHERE key = 'feature_version'").fetchone()
+            if not row or row[0] != str(FEATURE_VERSION):
+                self._reset(conn)
+            self._conn = conn
+        return self._conn
+
+    def _reset(self, conn):
+        with conn:
+            conn.execute("DELETE FROM docs")
+            conn.execute("DELETE FROM grams")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('feature_version', ?)", (str(FEATURE_VERSION),))
+
+    def clear(self):
+        self._reset(self._connect())
+        self._vocabulary = None
+
+    def signatures(self):
+        """slug → (signature, text_hash)"""
+        return {slug: (signature, text_hash) for slug, signature, text_hash in
+                self._connect().execute("SELECT slug, signature, text_hash FROM docs")}
+
+    def _ids(self, grams):
+        """n-gram の番号（新しい n-gram には番号を振る）"""
+        conn = self._connect()
+        if self._vocabulary is None:
+            self._vocabulary = dict(conn.execute("SELECT gram, id FROM grams"))
+        vocabulary = self._vocabulary
+        new = [gram for gram in grams if gram not in vocabulary]
+        if new:
+            next_id = (conn.execute("SELECT MAX(id) FROM grams").fetchone()[0] or -1) + 1
+            rows = list(zip(range(next_id, next_id + len(new)), new))
+            conn.executemany("INSERT INTO grams (id, gram) VALUES (?, ?)", rows)
+            vocabulary.update((gram, gram_id) for gram_id, gram in rows)
+        return [vocabulary[gram] for gram in grams]
+
+    def put(self, slug, signature, text_hash, title, counts):
+        """記事の特徴量を保存する（commit() までは確定しない）"""
+        pairs = sorted(zip(self._ids(list(counts)), counts.values()))
+        self._connect().execute(
+            "INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?, ?)",
+            (slug, signature, text_hash, title,
+             array('I', (i for i, _ in pairs)).tobytes(), array('I', (c for _, c in pairs)).tobytes())
+        )
+
+    def touch(self, slug, signature):
+        """内容が同じまま mtime だけ変わった記事（後処理で書き直された場合など）"""
+        self._connect().execute("UPDATE docs SET signature = ? WHERE slug = ?", (signature, slug))
+
+    def remove(self, slugs):
+        self._connect().executemany("DELETE FROM docs WHERE slug = ?", [(slug,) for slug in slugs])
+
+    def commit(self):
+        self._connect().commit()
+
+    def load(self):
+        """[(slug, タイトル, n-gram 番号の配列, 出現数の配列)]（slug 順）"""
+        docs = []
+        for slug, title, ids_blob, counts_blob in self._connect().execute(
+                "SELECT slug, title, ids, counts FROM docs ORDER BY slug"):
+            ids, counts = array('I'), array('I')
+            ids.frombytes(ids_blob)
+            counts.frombytes(counts_blob)
+            docs.append((slug, title, ids, counts))
+        return docs
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def update_features(store, articles_dir=ARTICLES_DIR):
+    """記事を走査して特徴量を更新する。戻り値は (再解析した件数, 再利用した件数, 削除した件数)"""
+    files = sorted(f for f in os.listdir(articles_dir) if f.endswith('.html') and not f.endswith('.backup'))
+    known = store.signatures()
+    extracted = reused = 0
+    for name in files:
+        slug = name[:-len('.html')]
+        file_path = os.path.join(articles_dir, name)
+        st = os.stat(file_path)
+        signature = f"{st.st_mtime_ns}:{st.st_size}"
+        previous = known.get(slug)
+        if previous and previous[0] == signature:
+            reused += 1
+            continue
+        try:
+            title, text = read_article(file_path)
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+            continue
+        text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        if previous and previous[1] == text_hash:
+            store.touch(slug, signature)
+            reused += 1
+            continue
+        store.put(slug, signature, text_hash, title, ngram_counts(text))
+        extracted += 1
+    removed = [slug for slug in known if f"{slug}.html" not in files]
+    store.remove(removed)
+    store.commit()
+    return extracted, reused, len(removed)
+
+
+# --- 類似度 ---
+
+def _max_df(n):
+    return max(MIN_DF, int(n * MAX_DF_RATIO))
+
+
+def _neighbours_numpy(docs, k, min_score):
+    """TF-IDF の疎行列 X を作り、X @ X.T を BLOCK_ROWS 行ずつ計算して上位 k 件を取る"""
+    n = len(docs)
+    lengths = np.fromiter((len(doc[2]) for doc in docs), dtype=np.int64, count=n)
+    if not lengths.sum():
+        return [[] for _ in docs]
+    cols = np.concatenate([np.frombuffer(doc[2], dtype=np.uint32) for doc in docs]).astype(np.int64)
+    counts = np.concatenate([np.frombuffer(doc[3], dtype=np.uint32) for doc in docs]).astype(np.float64)
+    rows = np.repeat(np.arange(n), lengths)
+
+    df = np.bincount(cols)
+    idf = np.log((1 + n) / (1 + df)) + 1
+    keep = (df >= MIN_DF) & (df <= _max_df(n))
+    weights = (1 + np.log(counts)) * idf[cols]
+    # 記事ごとに重みの大きい MAX_TERMS 個だけ残す（同じ重みなら番号の小さい順。Python 版と同じ選び方）
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    selected = []
+    for row in range(n):
+        index = np.flatnonzero(keep[cols[offsets[row]:offsets[row + 1]]]) + offsets[row]
+        if len(index) > MAX_TERMS:
+            index = index[np.lexsort((cols[index], -weights[index]))[:MAX_TERMS]]
+        selected.append(index)
+    selected = np.concatenate(selected)
+    matrix = sparse.csr_matrix((weights[selected], (rows[selected], cols[selected])), shape=(n, len(df)))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+    transposed = matrix.T.tocsr()
+
+    neighbours = []
+    for start in range(0, n, BLOCK_ROWS):
+        scores = (matrix[start:start + BLOCK_ROWS] @ transposed).toarray()
+        block = scores.shape[0]
+        scores[np.arange(block), np.arange(start, start + block)] = -1
+        take = min(k, n - 1)
+        if take <= 0:
+            neighbours.extend([] for _ in range(block))
+            continue
+        top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+        for row in range(block):
+            pairs = sorted(((-scores[row, j], j) for j in top[row]))
+            neighbours.append([(int(j), float(-s)) for s, j in pairs if -s >= min_score])
+    return neighbours
+
+
+def _neighbours_python(docs, k, min_score):
+    """NumPy が無いときの同じ計算（転置インデックスで内積を足し合わせる）"""
+    n = len(docs)
+    df = Counter()
+    for doc in docs:
+        df.update(doc[2])
+    max_df = _max_df(n)
+
+    postings = defaultdict(list)
+    vectors = []
+    for index, (_, _, ids, counts) in enumerate(docs):
+        vector = {}
+        for gram_id, count in zip(ids, counts):
+            frequency = df[gram_id]
+            if MIN_DF <= frequency <= max_df:
+                vector[gram_id] = (1 + math.log(count)) * (math.log((1 + n) / (1 + frequency)) + 1)
+        if len(vector) > MAX_TERMS:
+            vector = dict(heapq.nlargest(MAX_TERMS, vector.items(), key=lambda item: (item[1], -item[0])))
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1
+        vector = {gram_id: w / norm for gram_id, w in vector.items()}
+        for gram_id, w in vector.items():
+            postings[gram_id].append((index, w))
+        vectors.append(vector)
+
+    neighbours = []
+    for index, vector in enumerate(vectors):
+        scores = defaultdict(float)
+        for gram_id, w in vector.items():
+            for other, w_other in postings[gram_id]:
+                scores[other] += w * w_other
+        scores.pop(index, None)
+        top = heapq.nlargest(k, ((s, -other) for other, s in scores.items() if s >= min_score))
+        neighbours.append([(-other, s) for s, other in top])
+    return neighbours
+
+
+def compute_neighbours(docs, k=TOP_K, min_score=MIN_SCORE):
+    """各記事の [(記事の位置, 類似度)]（類似度の高い順）"""
+    if not docs:
+        return []
+    if np is not None:
+        return _neighbours_numpy(docs, k, min_score)
+    return _neighbours_python(docs, k, min_score)
+
+
+def build_data(docs, k=TOP_K):
+    """related.json の内容"""
+    neighbours = compute_neighbours(docs, k)
+    return {
+        "version": FEATURE_VERSION,
+        "titles": {slug: title for slug, title, _, _ in docs},
+        "related": {
+            docs[index][0]: [[docs[j][0], round(score, 3)] for j, score in found]
+            for index, found in enumerate(neighbours) if found
+        },
+    }
+
+
+def dump(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+
+
+def write_atomic(path, text):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def build_related(articles_dir=ARTICLES_DIR, output=RELATED_FILE, db_path=FEATURES_DB, rebuild=False, quiet=False):
+    """特徴量を更新して related.json を書く（内容が変わらなければ書き込まない）。戻り値は集計の dict"""
+    started = time.perf_counter()
+    if not os.path.exists(articles_dir):
+        print(f"Error: Articles directory not found at {articles_dir}")
+        return None
+    # 記事キャッシュ（utils）を使う
+    sys.path.append(os.path.join(ROOT_DIR, 'scripts', 'marketing'))
+
+    store = FeatureStore(db_path)
+    try:
+        if rebuild:
+            store.clear()
+        extracted, reused, removed = update_features(store, articles_dir)
+        extracted_at = time.perf_counter()
+        docs = store.load()
+    finally:
+        store.close()
+    text = dump(build_data(docs))
+    computed_at = time.perf_counter()
+
+    written = False
+    previous = None
+    if os.path.exists(output):
+        with open(output, 'r', encoding='utf-8') as f:
+            previous = f.read()
+    if previous != text:
+        write_atomic(output, text)
+        written = True
+
+    summary = {
+        "docs": len(docs), "extracted": extracted, "reused": reused, "removed": removed, "written": written,
+        "extract_seconds": extracted_at - started, "similarity_seconds": computed_at - extracted_at,
+        "seconds": time.perf_counter() - started,
+    }
+    if not quiet:
+        print("=" * 50)
+        print(f"📚 記事: {summary['docs']}件（再解析 {extracted} / 再利用 {reused} / 削除 {removed}）")
+        print(f"🧮 類似度: {'NumPy/SciPy' if np is not None else 'Python'}"
+              f"（特徴量 {summary['extract_seconds']:.2f}秒 / 類似度 {summary['similarity_seconds']:.2f}秒）")
+        print(f"✏️  {os.path.basename(output)}: {'更新しました' if written else '変更なし'}（{len(text.encode('utf-8')) / 1024:.1f} KB）")
+        print(f"⏱️  {summary['seconds']:.2f}秒")
+        print("=" * 50)
+    return summary
+
+
+# --- 埋め込み ---
+
+_related_cache = {}
+
+
+def load_related(path=RELATED_FILE):
+    """related.json を読む（同じプロセスでは mtime が変わるまで再読み込みしない）。無ければ None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    cached = _related_cache.get(path)
+    if cached and cached[0] == (st.st_mtime_ns, st.st_size):
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    data = json.loads(text)
+    data['_hash'] = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    _related_cache[path] = ((st.st_mtime_ns, st.st_size), data)
+    return data
+
+
+def related_fingerprint(path=RELATED_FILE):
+    """related.json の内容ハッシュ（変わったら全記事のブロックを作り直す）"""
+    try:
+        data = load_related(path)
+    except ValueError:
+        return 'invalid'
+    return data['_hash'][:12] if data else 'missing'
+
+
+def related_entries(slug, path=RELATED_FILE):
+    """[(slug, タイトル)]。関連記事が無ければ空"""
+    data = load_related(path)
+    if not data:
+        return []
+    titles = data.get('titles', {})
+    return [(other, titles.get(other) or other) for other, _ in data.get('related', {}).get(slug, [])]
+
+
+def format_block(entries):
+    """目印付きのブロック（build-articles.py のテンプレートもこの形で埋め込む）。関連記事が無ければ空文字"""
+    if not entries:
+        return ''
+    e = html.escape
+    items = '\n'.join(
+        f'            <li class="related-item"><a href="{e(slug)}.html" class="related-link">{e(title)}</a></li>'
+        for slug, title in entries
+    )
+    return (f'        {BLOCK_START}\n'
+            f'        <aside class="related-articles" aria-label="関連記事">\n'
+            f'          <h3 class="related-heading">🔗 あわせて読みたい</h3>\n'
+            f'          <ul class="related-list">\n{items}\n          </ul>\n'
+            f'        </aside>\n'
+            f'        {BLOCK_END}\n')
+
+
+def related_block(slug, path=RELATED_FILE):
+    return format_block(related_entries(slug, path))
+
+
+_BLOCK_PATTERN = re.compile(r'[ \t]*' + re.escape(BLOCK_START) + r'.*?' + re.escape(BLOCK_END) + r'[ \t]*\n?', re.S)
+
+
+def embed_related(content, slug, path=RELATED_FILE):
+    """
+    記事HTMLに関連記事を埋め込む（既存のブロックは差し替え、関連記事が無くなった記事からは削除）。
+    位置は .article-content の末尾（シリーズナビゲーションの後）。変更不要なら同じ文字列を返す
+    """
+    block = related_block(slug, path)
+    if _BLOCK_PATTERN.search(content):
+        return _BLOCK_PATTERN.sub(lambda m: block, content, count=1)
+    if not block:
+        return content
+    start = content.find('class="article-content"')
+    end = content.find('</article>', start) if start != -1 else -1
+    if end == -1:
+        # 独自レイアウトの記事（.article-content が無い）には入れない
+        return content
+    line_start = content.rfind('\n', 0, end) + 1
+    if content[line_start:end].strip():
+        line_start = end
+    return content[:line_start] + block + content[line_start:]
+
+
+# --- 計測 ---
+
+def run_benchmark(count, changed=5, seed=0):
+    """実記事の文を混ぜた count 記事で、全件の計算と数記事だけ変えたときの再計算を測る"""
+    sys.path.append(os.path.join(ROOT_DIR, 'scripts', 'marketing'))
+    sentences = []
+    for name in sorted(os.listdir(ARTICLES_DIR)):
+        if name.endswith('.html'):
+            _, text = read_article(os.path.join(ARTICLES_DIR, name))
+            sentences.extend(s for s in re.split(r'[。\n]', text) if len(s) > 10)
+    rng = random.Random(seed)
+    texts = ["。".join(rng.choices(sentences, k=rng.randint(20, 60))) for _ in range(count)]
+
+    workdir = tempfile.mkdtemp(prefix='mochi-related-bench-')
+    store = FeatureStore(os.path.join(workdir, 'features.db'))
+    try:
+        def timed(label, func):
+            started = time.perf_counter()
+            result = func()
+            print(f"{label:<20} {time.perf_counter() - started:8.3f}秒")
+            return result
+
+        def featurize(indexes):
+            for i in indexes:
+                store.put(f"post-{i:05d}", str(i), str(i), f"合成記事 {i}", ngram_counts(texts[i]))
+            store.commit()
+
+        print(f"合成記事 {count} 件 / 類似度: {'NumPy/SciPy' if np is not None else 'Python'}")
+        timed("特徴量（全件）", lambda: featurize(range(count)))
+        docs = timed("特徴量の読み込み", store.load)
+        timed("類似度（全件）", lambda: build_data(docs))
+        edited = rng.sample(range(count), min(changed, count))
+        for i in edited:
+            texts[i] += "。" + rng.choice(sentences)
+        timed(f"差分（{len(edited)}記事の変更）", lambda: (featurize(edited), build_data(store.load())))
+    finally:
+        store.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='記事の関連記事を計算して related.json に書く')
+    parser.add_argument('--rebuild', action='store_true', help='保存済みの特徴量を使わずに全件作り直す')
+    parser.add_argument('--dir', default=ARTICLES_DIR, help='記事のディレクトリ')
+    parser.add_argument('--bench', type=int, metavar='N', help='合成した N 記事で計算時間を計測する')
+    args = parser.parse_args()
+    if args.bench:
+        run_benchmark(args.bench)
+        sys.exit(0)
+    sys.exit(0 if build_related(args.dir, rebuild=args.rebuild) else 1)
@@ -0,0 +1,249 @@
+"""
+シリーズナビゲーション（前後の記事・全記事一覧）をビルド時に生成する
+
+series-config.json を1回だけ読み、記事ごとの前後・位置を計算して HTML ブロックにする。
+postprocess-html.py（series-nav インジェクタ）と build-articles.py が使う。
+記事ページは series-config.json を取得しない（js/series-navigation.js は不要になった）。
+
+    python blog/scripts/series_nav.py   # series-config.json の検証だけ行う
+"""
+import os
+import re
+import sys
+import json
+import html
+import hashlib
+from datetime import date
+
+BLOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ARTICLES_DIR = os.path.join(BLOG_DIR, 'articles')
+SERIES_CONFIG = os.path.join(BLOG_DIR, 'series-config.json')
+
+# 埋め込んだブロックの目印（設定が変わったらこの間を差し替える）
+BLOCK_START = '<!-- series-nav:start -->'
+BLOCK_END = '<!-- series-nav:end -->'
+# 全記事の一覧を出すシリーズの記事数（js/series-navigation.js と同じ）
+LIST_MIN_ARTICLES = 3
+
+_config_cache = {}
+
+
+def load_config(path=SERIES_CONFIG):
+    """series-config.json を読む（同じプロセスでは mtime が変わるまで再読み込みしない）"""
+    st = os.stat(path)
+    cached = _config_cache.get(path)
+    if cached and cached[0] == (st.st_mtime_ns, st.st_size):
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    config = json.loads(text)
+    config['_hash'] = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    _config_cache[path] = ((st.st_mtime_ns, st.st_size), config)
+    return config
+
+
+def config_fingerprint(path=SERIES_CONFIG):
+    """設定の内容ハッシュ（変わったら全記事のブロックを作り直す）"""
+    try:
+        return load_config(path)['_hash'][:12]
+    except (OSError, ValueError):
+        return 'missing'
+
+
+def index_series(config):
+    """slug → (シリーズ, 0始まりの位置)"""
+    index = {}
+    for series in config.get('series', []):
+        for position, article in enumerate(series.get('articles', [])):
+            if article.get('slug') and article['slug'] not in index:
+                index[article['slug']] = (series, position)
+    return index
+
+
+def find_series(slug, path=SERIES_CONFIG):
+    return index_series(load_config(path)).get(slug)
+
+
+def article_href(article):
+    """記事ページからの相対リンク（記事は同じ articles/ にある）"""
+    return f"{article['slug']}.html"
+
+
+def render_navigation(series, position):
+    """js/series-navigation.js が実行時に作っていたものと同じマークアップ"""
+    articles = series['articles']
+    total = len(articles)
+    e = html.escape
+    prev_article = articles[position - 1] if position > 0 else None
+    next_article = articles[position + 1] if position < total - 1 else None
+
+    if prev_article:
+        prev_html = (f'<a href="{e(article_href(prev_article))}" class="series-link series-prev">\n'
+                     f'              <span class="series-link-label">← 前の記事</span>\n'
+                     f'              <span class="series-link-title">{e(prev_article.get("title", ""))}</span>\n'
+                     f'            </a>')
+    else:
+        prev_html = ('<div class="series-link series-prev disabled">\n'
+                     '              <span class="series-link-label">← 前の記事</span>\n'
+                     '              <span class="series-link-title">これが最初の記事です</span>\n'
+                     '            </div>')
+    if next_article:
+        next_html = (f'<a href="{e(article_href(next_article))}" class="series-link series-next">\n'
+                     f'              <span class="series-link-label">次の記事 →</span>\n'
+                     f'              <span class="series-link-title">{e(next_article.get("title", ""))}</span>\n'
+                     f'            </a>')
+    else:
+        next_html = ('<div class="series-link series-next disabled">\n'
+                     '              <span class="series-link-label">次の記事 →</span>\n'
+                     '              <span class="series-link-title">続きをお楽しみに！</span>\n'
+                     '            </div>')
+
+    list_html = ''
+    if total >= LIST_MIN_ARTICLES:
+        items = []
+        for i, article in enumerate(articles):
+            icon = '📍' if i == position else ('✅' if i < position else '📄')
+            title = e(article.get('title', ''))
+            if i == position:
+                items.append(f'            <li class="series-list-item current"><span class="series-list-link current">'
+                             f'<span class="series-list-icon">{icon}</span><span class="series-list-title">{title}</span>'
+                             f'<span class="series-list-badge">現在の記事</span></span></li>')
+            else:
+                items.append(f'            <li class="series-list-item"><a href="{e(article_href(article))}" class="series-list-link">'
+                             f'<span class="series-list-icon">{icon}</span><span class="series-list-title">{title}</span></a></li>')
+        list_html = ('\n          <details class="series-list-container">\n'
+                     '            <summary class="series-list-toggle">このシリーズの全記事を見る</summary>\n'
+                     '            <ol class="series-list">\n' + '\n'.join(items) + '\n            </ol>\n'
+                     '          </details>')
+
+    return (f'        <nav class="series-navigation" aria-label="シリーズナビゲーション">\n'
+            f'          <div class="series-info">\n'
+            f'            <span class="series-badge">📚 シリーズ</span>\n'
+            f'            <h3 class="series-title">{e(series.get("title", ""))}</h3>\n'
+            f'            <p class="series-progress">Part {position + 1} / {total}</p>\n'
+            f'          </div>\n'
+            f'          <div class="series-links">\n'
+            f'            {prev_html}\n'
+            f'            {next_html}\n'
+            f'          </div>{list_html}\n'
+            f'        </nav>')
+
+
+def format_block(series, position):
+    """目印付きのブロック（build-articles.py のテンプレートもこの形で埋め込む）"""
+    return f'        {BLOCK_START}\n{render_navigation(series, position)}\n        {BLOCK_END}\n'
+
+
+def navigation_block(slug, path=SERIES_CONFIG):
+    """記事に埋め込むブロック。シリーズに属さない記事は空文字"""
+    found = find_series(slug, path)
+    return format_block(*found) if found else ''
+
+
+_BLOCK_PATTERN = re.compile(r'[ \t]*' + re.escape(BLOCK_START) + r'.*?' + re.escape(BLOCK_END) + r'[ \t]*\n?', re.S)
+_LEGACY_SCRIPT = re.compile(r'[ \t]*(<!-- Series Navigation -->[ \t]*\n)?[ \t]*<script src="\.\./js/series-navigation\.js"></script>[ \t]*\n?')
+
+
+def embed_navigation(content, slug, path=SERIES_CONFIG):
+    """
+    記事HTMLにナビゲーションを埋め込む（既存のブロックは差し替え、シリーズから外れた記事からは削除）。
+    旧方式の series-navigation.js の読み込みは取り除く。変更不要なら同じ文字列を返す
+    """
+    block = navigation_block(slug, path)
+    updated = _LEGACY_SCRIPT.sub('', content)
+    if _BLOCK_PATTERN.search(updated):
+        return _BLOCK_PATTERN.sub(lambda m: block, updated, count=1)
+    if not block:
+        return updated
+    # js 版と同じく .article-content の末尾（</article> の直前）に入れる
+    start = updated.find('class="article-content"')
+    end = updated.find('</article>', start) if start != -1 else -1
+    if end == -1:
+        raise ValueError('.article-content の </article> が見つかりません')
+    line_start = updated.rfind('\n', 0, end) + 1
+    if updated[line_start:end].strip():
+        line_start = end
+    return updated[:line_start] + block + updated[line_start:]
+
+
+def validate_config(config, articles_dir=ARTICLES_DIR):
+    """
+    series-config.json の検証。戻り値は (エラーのリスト, 警告のリスト)
+    - slug の欠落・重複（複数シリーズへの所属を含む）
+    - 記事ファイルが存在しない slug / url が articles/<slug>.html でない・存在しない
+    - date の形式と、シリーズ内で日付が古い順になっているか
+    """
+    errors, warnings = [], []
+    seen_series, seen_slugs = set(), {}
+    for s_index, series in enumerate(config.get('series', [])):
+        name = series.get('id') or f"series[{s_index}]"
+        if not series.get('id'):
+            errors.append(f"{name}: id がありません")
+        elif series['id'] in seen_series:
+            errors.append(f"{name}: id が重複しています")
+        seen_series.add(series.get('id'))
+        if not series.get('title'):
+            warnings.append(f"{name}: title がありません")
+        articles = series.get('articles', [])
+        if not articles:
+            warnings.append(f"{name}: 記事がありません")
+
+        previous_date = None
+        for a_index, article in enumerate(articles):
+            label = f"{name}[{a_index}]"
+            slug = article.get('slug')
+            if not slug:
+                errors.append(f"{label}: slug がありません")
+                continue
+            label = f"{name}/{slug}"
+            if slug in seen_slugs:
+                errors.append(f"{label}: slug が {seen_slugs[slug]} にも登録されています")
+            seen_slugs[slug] = name
+            if not os.path.exists(os.path.join(articles_dir, f"{slug}.html")):
+                errors.append(f"{label}: 記事 articles/{slug}.html がありません")
+            url = article.get('url')
+            if url and url != f"articles/{slug}.html":
+                target = os.path.join(os.path.dirname(articles_dir), url)
+                if not os.path.exists(target):
+                    errors.append(f"{label}: url {url} の先がありません")
+                else:
+                    warnings.append(f"{label}: url {url} が slug と一致しません")
+            if not article.get('title'):
+                warnings.append(f"{label}: title がありません")
+
+            raw_date = article.get('date')
+            if not raw_date:
+                warnings.append(f"{label}: date がありません")
+                continue
+            try:
+                current = date.fromisoformat(raw_date)
+            except (TypeError, ValueError):
+                errors.append(f"{label}: date {raw_date!r} が YYYY-MM-DD ではありません")
+                continue
+            if previous_date and current < previous_date:
+                errors.append(f"{label}: date {raw_date} が前の記事（{previous_date}）より古くなっています")
+            previous_date = current
+    return errors, warnings
+
+
+def check(path=SERIES_CONFIG, articles_dir=ARTICLES_DIR, quiet=False):
+    """検証して結果を表示する。エラーがあれば False"""
+    try:
+        config = load_config(path)
+    except (OSError, ValueError) as e:
+        print(f"❌ {os.path.basename(path)} を読み込めません: {e}")
+        return False
+    errors, warnings = validate_config(config, articles_dir)
+    for message in errors:
+        print(f"❌ series-config: {message}")
+    for message in warnings:
+        if not quiet:
+            print(f"⚠️  series-config: {message}")
+    return not errors
+
+
+if __name__ == "__main__":
+    ok = check()
+    if ok:
+        print("✅ series-config.json に問題はありません")
+    sys.exit(0 if ok else 1)
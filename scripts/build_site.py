@@ -0,0 +1,326 @@
+"""
+公開用の静的ファイルをビルドする（GitHub Pages のデプロイ / Flask UI の静的ファイル）
+
+    python scripts/build_site.py                 # _site/ と ui/static/dist/ を作る
+    python scripts/build_site.py --target site   # _site/ だけ
+    python scripts/build_site.py --target flask  # scripts/marketing/ui/static/dist/ だけ
+
+- HTML / CSS / JS / JSON を最小化
+- CSS / JS / 画像はファイル名に内容ハッシュを付けたコピーを作り（style.3f2a9c1b.css）、
+  HTML と CSS の参照を書き換える。ハッシュ付きのファイルは内容が変わらないので長期キャッシュできる
+  （JS から文字列で参照されている場合に備えて元の名前のファイルも残す）
+- テキスト系のファイルには .gz / .br（brotli パッケージがある場合）を並べて出力
+- 前回のビルドから出力内容が変わらないファイルは書き込み・圧縮を行わない
+"""
+import os
+import re
+import json
+import gzip
+import time
+import shutil
+import hashlib
+import argparse
+import posixpath
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SITE_ITEMS = ['index.html', 'css', 'assets', 'blog', 'community', 'products', 'store', 'history',
+              '.nojekyll', '_config.yml']
+SITE_OUT = os.path.join(ROOT_DIR, '_site')
+FLASK_STATIC = os.path.join(ROOT_DIR, 'scripts', 'marketing', 'ui', 'static')
+FLASK_OUT = os.path.join(FLASK_STATIC, 'dist')
+# Flask UI が読むハッシュ付きファイル名の対応表
+ASSET_MANIFEST = 'asset-manifest.json'
+
+HASHED_EXTENSIONS = {'.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.woff', '.woff2'}
+COMPRESS_EXTENSIONS = {'.html', '.css', '.js', '.json', '.svg', '.xml', '.txt', '.md'}
+COMPRESS_MIN_BYTES = 512
+SKIP_NAMES = {'.git', '__pycache__', 'node_modules'}
+SKIP_SUFFIXES = ('.backup', '.tmp', '.gz', '.br', '.state.json')
+
+REF_RE = re.compile(r'''(\b(?:href|src)\s*=\s*)(["'])([^"']+)\2''', re.IGNORECASE)
+CSS_URL_RE = re.compile(r'''url\(\s*(["']?)([^"')]+)\1\s*\)''')
+PROTECTED_HTML_RE = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+
+
+# --- 最小化（外部ライブラリを使わない安全側の処理） ---
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r'\s*:\s*(?=[^{}]*;)', ':', css)
+    css = css.replace(';}', '}')
+    return css.strip()
+
+
+def minify_js(js):
+    """行頭のインデント・空行・行単位のコメントだけを落とす（文字列や正規表現リテラルを壊さない範囲）"""
+    lines = []
+    in_block_comment = False
+    for line in js.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('/*') and not stripped.startswith('/*!') and not in_block_comment:
+            in_block_comment = True
+            stripped = stripped[2:]
+        if in_block_comment:
+            if '*/' not in stripped:
+                continue
+            in_block_comment = False
+            stripped = stripped.split('*/', 1)[1].strip()
+        if not stripped or stripped.startswith('//'):
+            continue
+        lines.append(stripped)
+    return '\n'.join(lines) + '\n'
+
+
+def minify_html(html):
+    """コメントと余分な空白を除く（pre / textarea / script / style の中身はそのまま）"""
+    parts = PROTECTED_HTML_RE.split(html)
+    result = []
+    # split の結果は [本文, 保護ブロック, タグ名, 本文, ...]
+    for i in range(0, len(parts), 3):
+        text = re.sub(r'<!--(?!\[if).*?-->', '', parts[i], flags=re.DOTALL)
+        text = re.sub(r'[ \t]*\n\s*', '\n', text)
+        text = re.sub(r'[ \t]{2,}', ' ', text)
+        result.append(text)
+        if i + 1 < len(parts):
+            result.append(parts[i + 1])
+    return ''.join(result).strip() + '\n'
+
+
+def minify_json(text):
+    return json.dumps(json.loads(text), ensure_ascii=False, separators=(',', ':'))
+
+
+# --- 参照の書き換え ---
+
+def is_local_ref(ref):
+    return not re.match(r'^(?:[a-z][a-z0-9+.-]*:|//|#|/|\{\{)', ref, re.IGNORECASE)
+
+
+def rewrite_ref(ref, base_dir, asset_map):
+    """相対参照 ref（base_dir 基準）がハッシュ付きファイルを指していれば書き換える"""
+    if not is_local_ref(ref):
+        return ref
+    path, _, fragment = ref.partition('#')
+    path = path.split('?', 1)[0]
+    target = posixpath.normpath(posixpath.join(base_dir, path))
+    hashed = asset_map.get(target)
+    if not hashed:
+        return ref
+    new_ref = posixpath.relpath(hashed, base_dir or '.')
+    return new_ref + ('#' + fragment if fragment else '')
+
+
+def rewrite_html_refs(html, base_dir, asset_map):
+    return REF_RE.sub(
+        lambda m: m.group(1) + m.group(2) + rewrite_ref(m.group(3), base_dir, asset_map) + m.group(2), html
+    )
+
+
+def rewrite_css_refs(css, base_dir, asset_map):
+    return CSS_URL_RE.sub(
+        lambda m: f"url({m.group(1)}{rewrite_ref(m.group(2), base_dir, asset_map)}{m.group(1)})", css
+    )
+
+
+# --- ビルド本体 ---
+
+def hashed_name(rel_path, data):
+    root, ext = posixpath.splitext(rel_path)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:8]}{ext}"
+
+
+def collect_sources(src_root, items=None, exclude=()):
+    """ビルド対象の相対パス（'/' 区切り）一覧。exclude のディレクトリ（出力先など）は除く"""
+    exclude = {os.path.abspath(path) for path in exclude}
+    sources = []
+    for item in items or ['.']:
+        path = os.path.join(src_root, item)
+        if os.path.isfile(path):
+            sources.append(item)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(
+                d for d in dirnames
+                if d not in SKIP_NAMES and os.path.abspath(os.path.join(dirpath, d)) not in exclude
+            )
+            for filename in sorted(filenames):
+                if filename.endswith(SKIP_SUFFIXES):
+                    continue
+                rel = os.path.relpath(os.path.join(dirpath, filename), src_root)
+                sources.append(rel.replace(os.sep, '/'))
+    return sources
+
+
+class SiteBuilder:
+    """
+    src_root 以下の sources を out_dir に出力する。
+    処理順は 画像など → CSS（画像の参照を書き換え）→ JS → HTML（全ての参照を書き換え）。
+    """
+
+    def __init__(self, src_root, out_dir, items=None, minify=True):
+        self.src_root = src_root
+        self.out_dir = out_dir
+        self.items = items
+        self.minify = minify
+        self.state_file = out_dir.rstrip(os.sep) + '.state.json'
+        self.asset_map = {}
+        self.outputs = {}
+        self.counters = {"written": 0, "skipped": 0, "compressed": 0, "bytes_in": 0, "bytes_out": 0, "bytes_gz": 0}
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        tmp_path = self.state_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.outputs, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.state_file)
+
+    def transform(self, rel_path, data):
+        """ソースの内容から出力内容を作る"""
+        ext = posixpath.splitext(rel_path)[1].lower()
+        base_dir = posixpath.dirname(rel_path)
+        if ext not in ('.html', '.css', '.js', '.json'):
+            return data
+        text = data.decode('utf-8')
+        try:
+            if ext == '.html':
+                text = rewrite_html_refs(minify_html(text) if self.minify else text, base_dir, self.asset_map)
+            elif ext == '.css':
+                text = rewrite_css_refs(minify_css(text) if self.minify else text, base_dir, self.asset_map)
+            elif ext == '.js' and self.minify:
+                text = minify_js(text)
+            elif ext == '.json' and self.minify:
+                text = minify_json(text)
+        except ValueError as e:
+            print(f"⚠️  {rel_path}: 最小化に失敗したため元の内容を使います ({e})")
+            return data
+        return text.encode('utf-8')
+
+    def emit(self, out_rel, data, previous):
+        """out_rel に data を書く（前回と同じ内容ならスキップ）。.gz / .br も出力する"""
+        digest = hashlib.sha256(data).hexdigest()
+        out_path = os.path.join(self.out_dir, out_rel)
+        ext = posixpath.splitext(out_rel)[1].lower()
+        variants = [out_path]
+        if ext in COMPRESS_EXTENSIONS and len(data) >= COMPRESS_MIN_BYTES:
+            variants.append(out_path + '.gz')
+            if brotli is not None:
+                variants.append(out_path + '.br')
+
+        self.outputs[out_rel] = digest
+        if previous.get(out_rel) == digest and all(os.path.exists(p) for p in variants):
+            self.counters["skipped"] += 1
+            return
+
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        _write_atomic(out_path, data)
+        for variant in variants[1:]:
+            if variant.endswith('.gz'):
+                # mtime=0 で同じ入力から同じ .gz を作る
+                _write_atomic(variant, gzip.compress(data, compresslevel=9, mtime=0))
+            else:
+                _write_atomic(variant, brotli.compress(data, quality=11))
+            self.counters["compressed"] += 1
+        for stale in (out_path + '.gz', out_path + '.br'):
+            if stale not in variants and os.path.exists(stale):
+                os.remove(stale)
+        self.counters["written"] += 1
+
+    def build(self):
+        started = time.perf_counter()
+        previous = self._load_state()
+        sources = collect_sources(self.src_root, self.items, exclude=[self.out_dir])
+
+        def order(rel_path):
+            ext = posixpath.splitext(rel_path)[1].lower()
+            return {'.css': 1, '.js': 2, '.html': 3}.get(ext, 0)
+
+        for rel_path in sorted(sources, key=order):
+            with open(os.path.join(self.src_root, rel_path), 'rb') as f:
+                data = f.read()
+            self.counters["bytes_in"] += len(data)
+            output = self.transform(rel_path, data)
+            self.counters["bytes_out"] += len(output)
+            self.emit(rel_path, output, previous)
+            gz_path = os.path.join(self.out_dir, rel_path + '.gz')
+            self.counters["bytes_gz"] += os.path.getsize(gz_path) if os.path.exists(gz_path) else len(output)
+            if posixpath.splitext(rel_path)[1].lower() in HASHED_EXTENSIONS:
+                hashed = hashed_name(rel_path, output)
+                self.asset_map[rel_path] = hashed
+                self.emit(hashed, output, previous)
+
+        # 今回出力しなかったファイル（削除・改名されたソースの古いハッシュ版など）を消す
+        for out_rel in set(previous) - set(self.outputs):
+            for path in (out_rel, out_rel + '.gz', out_rel + '.br'):
+                path = os.path.join(self.out_dir, path)
+                if os.path.exists(path):
+                    os.remove(path)
+
+        manifest = json.dumps(self.asset_map, ensure_ascii=False, indent=1, sort_keys=True).encode('utf-8')
+        _write_atomic(os.path.join(self.out_dir, ASSET_MANIFEST), manifest)
+        self._save_state()
+
+        c = self.counters
+        print(f"📦 {os.path.relpath(self.out_dir, ROOT_DIR)}: {len(sources)}ファイル "
+              f"（ハッシュ付き {len(self.asset_map)}件）")
+        print(f"   書き込み {c['written']} / 変更なし {c['skipped']} / 圧縮ファイル {c['compressed']}")
+        print(f"   サイズ {c['bytes_in'] / 1024:.1f} KB → 最小化 {c['bytes_out'] / 1024:.1f} KB"
+              f" → gzip {c['bytes_gz'] / 1024:.1f} KB / {time.perf_counter() - started:.2f}秒")
+        return self.asset_map
+
+
+def _write_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_site(out_dir=SITE_OUT, minify=True):
+    """GitHub Pages 用（.github/workflows/static.yml から呼ばれる）"""
+    items = [item for item in SITE_ITEMS if os.path.exists(os.path.join(ROOT_DIR, item))]
+    for item in SITE_ITEMS:
+        if item not in items:
+            print(f"Skipping {item} (not found)")
+    return SiteBuilder(ROOT_DIR, out_dir, items=items, minify=minify).build()
+
+
+def build_flask_static(out_dir=FLASK_OUT, minify=True):
+    """Flask UI 用（ui/app.py が asset-manifest.json を読んでハッシュ付きの URL を出す）"""
+    return SiteBuilder(FLASK_STATIC, out_dir, minify=minify).build()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='静的ファイルの最小化・圧縮・フィンガープリント')
+    parser.add_argument('--target', choices=['all', 'site', 'flask'], default='all')
+    parser.add_argument('--out', default=SITE_OUT, help='サイトの出力先（既定: _site）')
+    parser.add_argument('--no-minify', action='store_true', help='最小化しない（ハッシュ付けと圧縮のみ）')
+    parser.add_argument('--clean', action='store_true', help='出力先を削除してから全件ビルドする')
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("⚠️  brotli が無いため .br は出力しません（pip install brotli）")
+
+    targets = []
+    if args.target in ('all', 'site'):
+        targets.append((build_site, os.path.abspath(args.out)))
+    if args.target in ('all', 'flask'):
+        targets.append((build_flask_static, FLASK_OUT))
+    for build, out_dir in targets:
+        if args.clean:
+            shutil.rmtree(out_dir, ignore_errors=True)
+            if os.path.exists(out_dir + '.state.json'):
+                os.remove(out_dir + '.state.json')
+        build(out_dir, minify=not args.no_minify)
@@ -0,0 +1,50 @@
+import os
+import hashlib
+
+from utils import get_article_data, get_analysis_store
+from metrics import phase
+
+
+def content_hash(title, body):
+    """抽出済みのタイトル・本文から記事内容のハッシュを作る"""
+    h = hashlib.sha256()
+    h.update((title or '').encode('utf-8'))
+    h.update(b'\0')
+    h.update((body or '').encode('utf-8'))
+    return h.hexdigest()
+
+
+def classify_articles(html_files, prompt_version, store=None):
+    """
+    記事を new / changed / up-to-date に分類する。
+    解析の版（内容のハッシュ・プロンプトのバージョン）は解析結果ストアの各行に記録されている。
+
+    版の記録導入前から解析済みの記事（解析結果はあるが版が無いもの）は
+    現在の内容で解析済みとみなして版を記録する。やり直す場合は --force を使う。
+    """
+    store = store or get_analysis_store()
+    with phase("analysis_store"):
+        versions = store.versions()
+    adopted = {}
+    result = {"new": [], "changed": [], "up-to-date": []}
+
+    for file_path in html_files:
+        rel_path = os.path.basename(file_path)
+        if rel_path not in versions:
+            result["new"].append(file_path)
+            continue
+        title, body = get_article_data(file_path)
+        digest = content_hash(title, body)
+        recorded_hash, recorded_version = versions[rel_path]
+        if recorded_hash is None:
+            adopted[rel_path] = digest
+            result["up-to-date"].append(file_path)
+        elif recorded_hash != digest or recorded_version != prompt_version:
+            result["changed"].append(file_path)
+        else:
+            result["up-to-date"].append(file_path)
+
+    if adopted:
+        with phase("analysis_store"):
+            store.adopt_versions(adopted, prompt_version)
+    return result
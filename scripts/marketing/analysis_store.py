@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class AnalysisStore:
+    """
+    記事ごとの解析結果（3パターン）を SQLite (WAL) に保存するストア。
+
+    - 1記事単位の upsert / 参照ができ、全件を読み書きしない
+    - Flask アプリとバッチが同時に書き込んでも更新が失われない
+    - 解析に使った記事内容のハッシュとプロンプトのバージョンをパターンと同じ行に持つ（同じトランザクションで更新）
+    - パターンの追加・更新・削除ごとに変更番号を振る（トリガーで書き込みと同じトランザクション内で採番するので、
+      コミット順に増える。記事一覧はこの番号を追いかけて差分だけ反映する）
+    - 初回接続時に旧 analysis_data.json / analysis_manifest.json を取り込む（元ファイルは .migrated にリネーム）
+    """
+
+    def __init__(self, db_path, legacy_json=None, legacy_manifest=None):
+        self.db_path = db_path
+        self.legacy_json = legacy_json
+        self.legacy_manifest = legacy_manifest
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._init_lock:
+                if not self._initialized:
+                    self._init_schema(conn)
+                    self._initialized = True
+        return conn
+
+    def _init_schema(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis (
+                path TEXT PRIMARY KEY,
+                patterns TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                content_hash TEXT,
+                prompt_version INTEGER,
+                analyzed_at REAL
+            )
+        """)
+        # 解析の版の列が無い古いデータベースには列を足す
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(analysis)")}
+        for column, type_ in (("content_hash", "TEXT"), ("prompt_version", "INTEGER"), ("analyzed_at", "REAL")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE analysis ADD COLUMN {column} {type_}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_updated ON analysis(updated_at)")
+        # 記事ごとの最後の変更番号（削除も残す）。時刻は書き込み開始時に取るのでコミット順と食い違うことがある。
+        # 古い番号は消してから振り直す（INSERT OR IGNORE で書き込まれた場合も番号が進むように OR REPLACE は使わない）
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS analysis_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL UNIQUE
+            );
+            CREATE TRIGGER IF NOT EXISTS analysis_changes_insert AFTER INSERT ON analysis BEGIN
+                DELETE FROM analysis_changes WHERE path = new.path;
+                INSERT INTO analysis_changes (path) VALUES (new.path);
+            END;
+            CREATE TRIGGER IF NOT EXISTS analysis_changes_update AFTER UPDATE OF patterns ON analysis BEGIN
+                DELETE FROM analysis_changes WHERE path = new.path;
+                INSERT INTO analysis_changes (path) VALUES (new.path);
+            END;
+            CREATE TRIGGER IF NOT EXISTS analysis_changes_delete AFTER DELETE ON analysis BEGIN
+                DELETE FROM analysis_changes WHERE path = old.path;
+                INSERT INTO analysis_changes (path) VALUES (old.path);
+            END;
+        """)
+        # 変更番号の導入前からある行にも番号を振る
+        if conn.execute("SELECT 1 FROM analysis_changes LIMIT 1").fetchone() is None:
+            conn.execute("INSERT INTO analysis_changes (path) SELECT path FROM analysis ORDER BY updated_at")
+        conn.commit()
+        self._migrate_legacy_json(conn)
+        self._migrate_legacy_manifest(conn)
+
+    def _migrate_legacy_json(self, conn):
+        if not self.legacy_json or not os.path.exists(self.legacy_json):
+            return
+        try:
+            with open(self.legacy_json, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Failed to read {self.legacy_json} for migration: {e}")
+            return
+
+        # 既にストア側にある記事は上書きしない
+        now = time.time()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO analysis (path, patterns, updated_at) VALUES (?, ?, ?)",
+                [(path, json.dumps(patterns, ensure_ascii=False), now) for path, patterns in legacy.items()]
+            )
+        os.replace(self.legacy_json, self.legacy_json + '.migrated')
+        print(f"Migrated {len(legacy)} entries from {os.path.basename(self.legacy_json)}")
+
+    def _migrate_legacy_manifest(self, conn):
+        if not self.legacy_manifest or not os.path.exists(self.legacy_manifest):
+            return
+        try:
+            with open(self.legacy_manifest, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Failed to read {self.legacy_manifest} for migration: {e}")
+            return
+
+        # 版が記録済みの記事は上書きしない（解析結果の無い記事の版は捨てる）
+        with conn:
+            conn.executemany(
+                "UPDATE analysis SET content_hash = ?, prompt_version = ? WHERE path = ? AND content_hash IS NULL",
+                [(entry.get("hash"), entry.get("prompt_version"), path) for path, entry in legacy.items()]
+            )
+        os.replace(self.legacy_manifest, self.legacy_manifest + '.migrated')
+        print(f"Migrated {len(legacy)} entries from {os.path.basename(self.legacy_manifest)}")
+
+    def get(self, path):
+        """1記事分の解析結果を返す（無ければ None）"""
+        row = self._connect().execute("SELECT patterns FROM analysis WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert(self, data, content_hashes=None, prompt_version=None):
+        """
+        {記事: パターン} を1トランザクションで登録・更新する。
+        content_hashes（{記事: 内容のハッシュ}）を渡すと解析の版も同じトランザクションで記録する
+        （渡さなければ記録済みの版はそのまま）
+        """
+        now = time.time()
+        content_hashes = content_hashes or {}
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO analysis (path, patterns, updated_at, content_hash, prompt_version, analyzed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET patterns = excluded.patterns, updated_at = excluded.updated_at, "
+                "content_hash = COALESCE(excluded.content_hash, analysis.content_hash), "
+                "prompt_version = COALESCE(excluded.prompt_version, analysis.prompt_version), "
+                "analyzed_at = COALESCE(excluded.analyzed_at, analysis.analyzed_at)",
+                [
+                    (path, json.dumps(patterns, ensure_ascii=False), now, content_hashes.get(path),
+                     prompt_version if path in content_hashes else None, now if path in content_hashes else None)
+                    for path, patterns in data.items()
+                ]
+            )
+
+    def versions(self):
+        """解析済みの記事の {記事: (内容のハッシュ, プロンプトのバージョン)}（版が未記録なら (None, None)）"""
+        rows = self._connect().execute("SELECT path, content_hash, prompt_version FROM analysis").fetchall()
+        return {path: (digest, version) for path, digest, version in rows}
+
+    def adopt_versions(self, content_hashes, prompt_version):
+        """版が未記録の記事に、現在の内容とプロンプトで解析済みとして版を記録する"""
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "UPDATE analysis SET content_hash = ?, prompt_version = ? WHERE path = ? AND content_hash IS NULL",
+                [(digest, prompt_version, path) for path, digest in content_hashes.items()]
+            )
+
+    def delete(self, path):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM analysis WHERE path = ?", (path,))
+
+    def all(self):
+        """全件を {記事: パターン} で返す"""
+        rows = self._connect().execute("SELECT path, patterns FROM analysis").fetchall()
+        return {path: json.loads(patterns) for path, patterns in rows}
+
+    def changes_since(self, seq):
+        """
+        変更番号 seq より後に追加・更新・削除された記事を返す。
+        (更新された {記事: パターン}, 削除された記事のリスト, 最新の変更番号)
+        """
+        rows = self._connect().execute(
+            "SELECT c.seq, c.path, a.patterns FROM analysis_changes c LEFT JOIN analysis a ON a.path = c.path "
+            "WHERE c.seq > ? ORDER BY c.seq",
+            (seq,)
+        ).fetchall()
+        changed = {path: json.loads(patterns) for _, path, patterns in rows if patterns is not None}
+        deleted = [path for _, path, patterns in rows if patterns is None]
+        return changed, deleted, rows[-1][0] if rows else seq
+
+    def __contains__(self, path):
+        return self._connect().execute("SELECT 1 FROM analysis WHERE path = ?", (path,)).fetchone() is not None
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
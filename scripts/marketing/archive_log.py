@@ -0,0 +1,418 @@
+"""
+ニュースアーカイブの追記専用ログ（月ごとの JSONL セグメント＋マニフェスト）
+
+    python archive_log.py migrate news_archive.json   # 旧形式（JSON 配列）をログに移行
+    python archive_log.py tail -n 20                  # 直近 20 件
+    python archive_log.py compact                     # 過去の月を検証して封印し、過去の年を1ファイルにまとめる
+    python archive_log.py verify                      # 封印済みセグメントのハッシュと各行を検査
+    python archive_log.py stats
+
+news_log/
+    manifest.json      セグメントの一覧（名前・期間・封印済みなら件数とハッシュ）
+    2026-01.jsonl      1行1レポート。追記は O(1)（開いて1行書いて fsync）
+    2025.jsonl         compact で過去の年の月セグメントをまとめたもの
+
+書き込みは追記だけで、既存の行を書き換えない。途中で落ちても壊れるのは最後の1行だけで、次の追記時に切り詰める。
+直近 N 件は新しいセグメントの末尾から逆向きに読むので、古いセグメントには触れない。
+SQLite のアーカイブ（news_archive.py）はこのログから作り直せる索引として扱う。
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_LOG_DIR = os.path.join(BASE_DIR, 'news_log')
+MANIFEST = 'manifest.json'
+MANIFEST_VERSION = 1
+# 逆向きに読むときのブロックサイズ
+TAIL_BLOCK = 64 * 1024
+
+
+def _period(entry):
+    """セグメントの期間（YYYY-MM）。timestamp が無ければ現在の月"""
+    timestamp = entry.get("timestamp") or time.strftime("%Y-%m-%d %H:%M:%S")
+    return timestamp[:7]
+
+
+def _fsync_dir(path):
+    """rename・作成したファイルの名前を確定させる（対応していない OS では何もしない）"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ArchiveLog:
+    """
+    追記専用のセグメント化された JSONL ログ。
+    セグメントは期間（月）ごとに作られ、manifest.json の更新はセグメントの作成・封印・統合のときだけ行う
+    """
+
+    def __init__(self, log_dir=ARCHIVE_LOG_DIR):
+        self.dir = log_dir
+        self._lock = threading.Lock()
+        self._repaired = set()
+
+    # --- マニフェスト ---
+
+    def _manifest_path(self):
+        return os.path.join(self.dir, MANIFEST)
+
+    def manifest(self):
+        try:
+            with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {"version": MANIFEST_VERSION, "generation": 0, "segments": []}
+        return manifest
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.dir, exist_ok=True)
+        manifest["segments"].sort(key=lambda s: s["period"])
+        tmp_path = self._manifest_path() + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path())
+        _fsync_dir(self.dir)
+
+    def segments(self):
+        """古い順のセグメント（manifest の項目に path を付けたもの）"""
+        return [dict(s, path=os.path.join(self.dir, s["name"])) for s in self.manifest()["segments"]]
+
+    # --- 書き込み ---
+
+    def _repair_tail(self, path):
+        """最後の行が途中で切れていたら（書き込み中に落ちた）切り詰める"""
+        if path in self._repaired or not os.path.exists(path):
+            self._repaired.add(path)
+            return
+        with open(path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b'\n':
+                    position = size
+                    while position > 0:
+                        step = min(TAIL_BLOCK, position)
+                        f.seek(position - step)
+                        index = f.read(step).rfind(b'\n')
+                        if index != -1:
+                            position = position - step + index + 1
+                            break
+                        position -= step
+                    f.truncate(position)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    print(f"Truncated a torn record at the end of {os.path.basename(path)}")
+        self._repaired.add(path)
+
+    def _segment_for(self, manifest, period):
+        """書き込み先のセグメント。封印済みの過去には書かず、最新のセグメント以降に追記する"""
+        segments = manifest["segments"]
+        latest = segments[-1] if segments else None
+        if latest and period <= latest["period"]:
+            if not latest.get("sealed"):
+                return latest
+            # 封印済みの月より古い日付のレポートは今月のセグメントに入れる
+            period = time.strftime("%Y-%m")
+        segment = {"name": f"{period}.jsonl", "period": period, "sealed": False}
+        segments.append(segment)
+        self._save_manifest(manifest)
+        return segment
+
+    def append(self, entry):
+        """1件を追記して fsync する。戻り値は (セグメント名, 書き込み後のバイト位置)"""
+        return self.append_many([entry])
+
+    def append_many(self, entries):
+        """
+        まとめて追記する（移行用。書き込み先のセグメントごとに fsync は1回）。
+        戻り値は最後に書いた (セグメント名, 書き込み後のバイト位置)
+        """
+        result = None
+        with self._lock:
+            manifest = self.manifest()
+            batch, segment = [], None
+            for entry in entries:
+                target = self._segment_for(manifest, _period(entry))
+                if segment is not None and target is not segment:
+                    result = self._write(segment, batch)
+                    batch = []
+                segment = target
+                batch.append(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+            if batch:
+                result = self._write(segment, batch)
+        return result
+
+    def _write(self, segment, lines):
+        path = os.path.join(self.dir, segment["name"])
+        self._repair_tail(path)
+        created = not os.path.exists(path)
+        with open(path, 'ab') as f:
+            f.write(''.join(lines).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+            position = f.tell()
+        if created:
+            _fsync_dir(self.dir)
+        return segment["name"], position
+
+    # --- 読み込み ---
+
+    @staticmethod
+    def _parse(line):
+        try:
+            return json.loads(line)
+        except ValueError:
+            # 書き込み途中で切れた行は読み飛ばす
+            return None
+
+    def _read_backwards(self, path):
+        """ファイルの末尾から1行ずつ（新しい順に）返す"""
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            remainder = b''
+            while position > 0:
+                step = min(TAIL_BLOCK, position)
+                position -= step
+                f.seek(position)
+                lines = (f.read(step) + remainder).split(b'\n')
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    if line.strip():
+                        yield line
+            if remainder.strip():
+                yield remainder
+
+    def tail(self, n=20):
+        """直近 n 件を古い順で返す。必要な分だけ新しいセグメントの末尾から読む"""
+        items = []
+        for segment in reversed(self.segments()):
+            if len(items) >= n:
+                break
+            if not os.path.exists(segment["path"]):
+                continue
+            for line in self._read_backwards(segment["path"]):
+                entry = self._parse(line)
+                if entry is not None:
+                    items.append(entry)
+                    if len(items) >= n:
+                        break
+        return list(reversed(items))
+
+    def iter_from(self, name=None, offset=0):
+        """
+        (セグメント名, 行末のバイト位置, レポート) を古い順に返す。
+        name / offset を渡すとその位置より後だけ（索引の追いつき用）
+        """
+        started = name is None
+        for segment in self.segments():
+            if not started:
+                if segment["name"] != name:
+                    continue
+                started = True
+                start = offset
+            else:
+                start = 0
+            if not os.path.exists(segment["path"]):
+                continue
+            with open(segment["path"], 'rb') as f:
+                f.seek(start)
+                position = start
+                for line in f:
+                    position += len(line)
+                    if not line.endswith(b'\n'):
+                        # 書き込み途中の行はまだ読まない
+                        break
+                    entry = self._parse(line)
+                    if entry is not None:
+                        yield segment["name"], position, entry
+
+    def __iter__(self):
+        for _, _, entry in self.iter_from():
+            yield entry
+
+    # --- 保守 ---
+
+    def migrate_json(self, json_path):
+        """旧形式の JSON 配列を時刻順に追記する。ログが空でなければ何もしない（二重移行の防止）。戻り値は移行した件数"""
+        if any(os.path.exists(s["path"]) and os.path.getsize(s["path"]) for s in self.segments()):
+            print("The archive log is not empty; migration skipped")
+            return 0
+        with open(json_path, 'r', encoding='utf-8') as f:
+            legacy = json.load(f)
+        legacy = sorted((item for item in legacy if isinstance(item, dict)), key=lambda item: item.get("timestamp") or "")
+        self.append_many(legacy)
+        return len(legacy)
+
+    def compact(self, current_period=None):
+        """
+        今月より前の月セグメントを封印し（壊れた行を除いて件数・ハッシュを記録）、
+        今年より前の年の月セグメントは1つの年セグメントにまとめる。
+        manifest の generation が上がる（索引は位置を信用せずに取り込み直す）
+        """
+        current_period = current_period or time.strftime("%Y-%m")
+        with self._lock:
+            manifest = self.manifest()
+            segments = manifest["segments"]
+            changed = False
+
+            # 過去の年の月セグメントを年ごとにまとめる
+            by_year = {}
+            for segment in segments:
+                if len(segment["period"]) == 7 and segment["period"][:4] < current_period[:4]:
+                    by_year.setdefault(segment["period"][:4], []).append(segment)
+            for year, months in by_year.items():
+                target = next((s for s in segments if s["period"] == year), None)
+                sources = ([target] if target else []) + sorted(months, key=lambda s: s["period"])
+                tmp_path = os.path.join(self.dir, f"{year}.jsonl.tmp")
+                with open(tmp_path, 'wb') as out:
+                    for source in sources:
+                        path = os.path.join(self.dir, source["name"])
+                        if os.path.exists(path):
+                            with open(path, 'rb') as f:
+                                for line in f:
+                                    if line.endswith(b'\n') and self._parse(line) is not None:
+                                        out.write(line)
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(tmp_path, os.path.join(self.dir, f"{year}.jsonl"))
+                segments[:] = [s for s in segments if s not in months and s is not target]
+                segments.append({"name": f"{year}.jsonl", "period": year, "sealed": False})
+                self._save_manifest(manifest)
+                for month in months:
+                    path = os.path.join(self.dir, month["name"])
+                    if os.path.exists(path):
+                        os.remove(path)
+                changed = True
+
+            # 今月より前のセグメントを封印する
+            for segment in segments:
+                if segment.get("sealed") or segment["period"] >= current_period[:len(segment["period"])]:
+                    continue
+                path = os.path.join(self.dir, segment["name"])
+                if not os.path.exists(path):
+                    continue
+                with open(path, 'rb') as f:
+                    lines = [line for line in f if line.endswith(b'\n') and self._parse(line) is not None]
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as out:
+                    out.writelines(lines)
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(tmp_path, path)
+                segment.update(sealed=True, count=len(lines), bytes=os.path.getsize(path), sha256=_file_sha256(path))
+                changed = True
+
+            if changed:
+                manifest["generation"] = manifest.get("generation", 0) + 1
+                self._save_manifest(manifest)
+                self._repaired.clear()
+            return changed
+
+    def verify(self):
+        """封印済みセグメントのハッシュと、全セグメントの各行を検査する。戻り値は問題のリスト"""
+        problems = []
+        listed = set()
+        for segment in self.segments():
+            listed.add(segment["name"])
+            path = segment["path"]
+            if not os.path.exists(path):
+                problems.append(f"{segment['name']}: ファイルがありません")
+                continue
+            if segment.get("sealed") and _file_sha256(path) != segment.get("sha256"):
+                problems.append(f"{segment['name']}: 封印後に内容が変わっています")
+            with open(path, 'rb') as f:
+                for number, line in enumerate(f, start=1):
+                    if not line.endswith(b'\n') or self._parse(line) is None:
+                        problems.append(f"{segment['name']}:{number}: 壊れた行があります")
+        if os.path.isdir(self.dir):
+            for name in sorted(os.listdir(self.dir)):
+                if name.endswith('.jsonl') and name not in listed:
+                    problems.append(f"{name}: manifest に載っていません")
+        return problems
+
+    def stats(self):
+        segments = self.segments()
+        total_bytes = sum(os.path.getsize(s["path"]) for s in segments if os.path.exists(s["path"]))
+        return {
+            "segments": len(segments),
+            "sealed": sum(1 for s in segments if s.get("sealed")),
+            "bytes": total_bytes,
+            "generation": self.manifest().get("generation", 0),
+        }
+
+
+_log = None
+
+
+def get_archive_log():
+    """プロセス共有のログを返す"""
+    global _log
+    if _log is None:
+        _log = ArchiveLog()
+    return _log
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="archive_log", description="ニュースアーカイブの追記専用ログを管理する")
+    parser.add_argument("--dir", default=ARCHIVE_LOG_DIR, help="ログのディレクトリ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("migrate", help="旧形式の news_archive.json をログに移行する")
+    p.add_argument("json_path", nargs="?", default=os.path.join(BASE_DIR, 'news_archive.json'))
+    p = sub.add_parser("tail", help="直近のレポートを表示する")
+    p.add_argument("-n", type=int, default=20)
+    p.add_argument("--json", action="store_true", help="JSON で出力する")
+    sub.add_parser("compact", help="過去のセグメントを封印・統合する")
+    sub.add_parser("verify", help="セグメントを検査する")
+    sub.add_parser("stats", help="セグメントの数とサイズ")
+    args = parser.parse_args(argv)
+
+    log = ArchiveLog(args.dir)
+    if args.command == "migrate":
+        print(f"Migrated {log.migrate_json(args.json_path)} reports into {log.dir}")
+    elif args.command == "tail":
+        items = log.tail(args.n)
+        if args.json:
+            print(json.dumps(items, ensure_ascii=False, indent=2))
+        for item in [] if args.json else items:
+            print(f"{item.get('timestamp', '')}  {' '.join((item.get('summary') or '').split())[:80]}")
+    elif args.command == "compact":
+        print("Compacted" if log.compact() else "Nothing to compact")
+    elif args.command == "verify":
+        problems = log.verify()
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            return 1
+        print("✅ OK")
+    elif args.command == "stats":
+        print(json.dumps(log.stats(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
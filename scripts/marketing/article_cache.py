@@ -0,0 +1,218 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+CACHE_DB = os.path.join(DATA_DIR, 'article_cache.db')
+# ディスクヒット時の last_access 更新はこの秒数に1回まで（毎回の書き込みで一覧表示が遅くならないように）
+TOUCH_INTERVAL = 3600
+
+
+class ArticleCache:
+    """
+    記事HTMLの抽出結果 (title, body_text) をキャッシュする。
+
+    - 手前にプロセス内LRU、奥にSQLiteのディスクキャッシュを置く二段構成
+    - mtime/size が一致すればファイルを読まずにヒット
+    - mtime/size が変わっていても内容ハッシュが同じならパースせずに再利用
+    - ディスク側は本文のバイト数合計で上限を設け、古いアクセス順に追い出す
+    """
+
+    def __init__(self, db_path=CACHE_DB, memory_entries=512, max_disk_bytes=64 * 1024 * 1024):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "hash_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            # get_title は本文を返さないので get の hit_rate とは別に数える
+            "title_hits": 0,
+            "title_misses": 0,
+        }
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER,
+                    size INTEGER,
+                    sha256 TEXT,
+                    title TEXT,
+                    body TEXT,
+                    nbytes INTEGER,
+                    last_access REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_access ON articles(last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, file_path, parse_func):
+        """
+        file_path の (title, body_text) を返す。
+        キャッシュに無い・内容が変わっている場合のみ parse_func(html) を呼ぶ。
+        """
+        key = os.path.abspath(file_path)
+        st = os.stat(key)
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry[3], entry[4]
+
+            row = self._load_row(key)
+            if row and row[0] == st.st_mtime_ns and row[1] == st.st_size:
+                self.counters["disk_hits"] += 1
+                if time.time() - (row[5] or 0) > TOUCH_INTERVAL:
+                    self._touch(key)
+                self._remember(key, row[:5])
+                return row[3], row[4]
+
+        with open(key, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+
+        with self._lock:
+            if row and row[2] == digest:
+                # 内容は同じ（touch されただけ等）なのでパース不要
+                self.counters["hash_hits"] += 1
+                entry = (st.st_mtime_ns, st.st_size, digest, row[3], row[4])
+                self._store(key, entry)
+                return entry[3], entry[4]
+
+        title, body = parse_func(raw.decode('utf-8'))
+
+        with self._lock:
+            self.counters["misses"] += 1
+            self._store(key, (st.st_mtime_ns, st.st_size, digest, title, body))
+        return title, body
+
+    def get_title(self, file_path):
+        """
+        mtime/size が一致するキャッシュがあればタイトルだけ返す（本文は読み込まない）。無ければ None。
+        記事一覧（utils.get_article_meta）用で、ミスしても抽出・保存はしない
+        """
+        key = os.path.abspath(file_path)
+        st = os.stat(key)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                self._memory.move_to_end(key)
+                self.counters["title_hits"] += 1
+                return entry[3]
+            try:
+                row = self._connect().execute(
+                    "SELECT mtime_ns, size, title FROM articles WHERE path = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Article cache read failed: {e}")
+                row = None
+            if row and row[0] == st.st_mtime_ns and row[1] == st.st_size:
+                self.counters["title_hits"] += 1
+                return row[2]
+            self.counters["title_misses"] += 1
+        return None
+
+    def _load_row(self, key):
+        try:
+            return self._connect().execute(
+                "SELECT mtime_ns, size, sha256, title, body, last_access FROM articles WHERE path = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Article cache read failed: {e}")
+            return None
+
+    def _touch(self, key):
+        try:
+            conn = self._connect()
+            conn.execute("UPDATE articles SET last_access = ? WHERE path = ?", (time.time(), key))
+            conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def _remember(self, key, entry):
+        self._memory[key] = tuple(entry)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _store(self, key, entry):
+        self._remember(key, entry)
+        mtime_ns, size, digest, title, body = entry
+        nbytes = len((title or '').encode('utf-8')) + len((body or '').encode('utf-8'))
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, mtime_ns, size, digest, title, body, nbytes, time.time())
+            )
+            conn.commit()
+            self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Article cache write failed: {e}")
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM articles").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        rows = conn.execute("SELECT path, nbytes FROM articles ORDER BY last_access").fetchall()
+        for path, nbytes in rows:
+            if total <= self.max_disk_bytes:
+                break
+            conn.execute("DELETE FROM articles WHERE path = ?", (path,))
+            self._memory.pop(path, None)
+            total -= nbytes
+            self.counters["evictions"] += 1
+        conn.commit()
+
+    def stats(self):
+        """ヒット/ミスのカウンタとヒット率を返す（hit_rate は get、title_hit_rate は get_title の分）"""
+        with self._lock:
+            result = dict(self.counters)
+            result["memory_entries"] = len(self._memory)
+            try:
+                count, total = self._connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM articles"
+                ).fetchone()
+                result["disk_entries"] = count
+                result["disk_bytes"] = total
+            except sqlite3.Error:
+                pass
+        hits = result["memory_hits"] + result["disk_hits"] + result["hash_hits"]
+        lookups = hits + result["misses"]
+        result["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        title_lookups = result["title_hits"] + result["title_misses"]
+        result["title_hit_rate"] = round(result["title_hits"] / title_lookups, 4) if title_lookups else 0.0
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            conn = self._connect()
+            conn.execute("DELETE FROM articles")
+            conn.commit()
+
+
+_cache = None
+
+
+def get_article_cache():
+    """プロセス共有のキャッシュインスタンスを返す"""
+    global _cache
+    if _cache is None:
+        _cache = ArticleCache()
+    return _cache
@@ -0,0 +1,233 @@
+import os
+import json
+import struct
+import hashlib
+import threading
+
+from utils import article_entry, get_analysis_store, ANALYSIS_DB
+
+
+class ArticleIndex:
+    """
+    記事一覧を常駐メモリに保持し、ファイル監視で最新に保つインデックス。
+
+    /api/articles はリクエストごとに一覧を作り直す代わりに、
+    ソート・JSON化済みのスナップショット（ETag付き）をそのまま返す。
+    """
+
+    def __init__(self, articles_dir, poll_interval=2.0):
+        self.articles_dir = os.path.abspath(articles_dir)
+        self.poll_interval = poll_interval
+        self._entries = {}
+        self._analysis = {}
+        self._analysis_version = 0
+        self._snapshot = (b"[]", '"empty"')
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.watch_mode = None
+
+    def build(self):
+        """全記事をスキャンしてインデックスを作り直す"""
+        analysis, _, version = get_analysis_store().changes_since(0)
+        entries = {}
+        for name in self._html_names():
+            try:
+                entries[name] = article_entry(os.path.join(self.articles_dir, name), analysis)
+            except OSError:
+                continue
+        with self._lock:
+            self._analysis = analysis
+            self._analysis_version = version
+            self._entries = entries
+            self._publish()
+
+    def snapshot(self):
+        """(JSONバイト列, ETag) を返す"""
+        return self._snapshot
+
+    def refresh_article(self, name):
+        """1記事分だけ更新する（削除されていれば取り除く）"""
+        path = os.path.join(self.articles_dir, name)
+        with self._lock:
+            if os.path.exists(path):
+                try:
+                    self._entries[name] = article_entry(path, self._analysis)
+                except OSError:
+                    self._entries.pop(name, None)
+            else:
+                self._entries.pop(name, None)
+            self._publish()
+
+    def refresh_analysis(self):
+        """解析結果ストアで更新・削除された記事だけを反映する（HTMLは再パースしない）"""
+        with self._lock:
+            changed, deleted, version = get_analysis_store().changes_since(self._analysis_version)
+            if not changed and not deleted:
+                return
+            self._analysis.update(changed)
+            self._analysis_version = version
+            for name, patterns in changed.items():
+                entry = self._entries.get(name)
+                if entry:
+                    entry["is_analyzed"] = True
+                    entry["patterns"] = patterns
+            for name in deleted:
+                self._analysis.pop(name, None)
+                entry = self._entries.get(name)
+                if entry:
+                    entry["is_analyzed"] = False
+                    entry["patterns"] = []
+            self._publish()
+
+    def _publish(self):
+        articles = sorted(self._entries.values(), key=lambda x: x['mtime'], reverse=True)
+        body = json.dumps(articles, ensure_ascii=False).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()[:16]
+        self._snapshot = (body, etag)
+
+    def _html_names(self):
+        try:
+            return [e.name for e in os.scandir(self.articles_dir) if e.name.endswith('.html') and e.is_file()]
+        except FileNotFoundError:
+            return []
+
+    # --- 監視 ---
+
+    def start(self):
+        """初回ビルドを行い、監視スレッドを起動する"""
+        self.build()
+        watcher = self._inotify_loop if _inotify_available() else self._poll_loop
+        self.watch_mode = "inotify" if watcher == self._inotify_loop else "polling"
+        self._thread = threading.Thread(target=watcher, name="article-index-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+
+    def _poll_loop(self):
+        last_articles = self._scan_mtimes()
+        last_analysis = _analysis_mtimes()
+        while not self._stop.wait(self.poll_interval):
+            current = self._scan_mtimes()
+            for name in set(last_articles) | set(current):
+                if last_articles.get(name) != current.get(name):
+                    self.refresh_article(name)
+            last_articles = current
+
+            analysis_mtime = _analysis_mtimes()
+            if analysis_mtime != last_analysis:
+                self.refresh_analysis()
+                last_analysis = analysis_mtime
+
+    def _scan_mtimes(self):
+        result = {}
+        for name in self._html_names():
+            mtime = _mtime_ns(os.path.join(self.articles_dir, name))
+            if mtime is not None:
+                result[name] = mtime
+        return result
+
+    def _inotify_loop(self):
+        import select
+
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            self.watch_mode = "polling"
+            return self._poll_loop()
+
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+        # SQLite は WAL ファイルを開いたまま書き込むので、data/ 側は IN_MODIFY も拾う
+        data_mask = mask | IN_MODIFY
+        watches = {}
+        analysis_dir = os.path.dirname(ANALYSIS_DB)
+        for directory, directory_mask in ((self.articles_dir, mask), (analysis_dir, data_mask)):
+            if os.path.isdir(directory):
+                wd = _libc.inotify_add_watch(fd, os.fsencode(directory), directory_mask)
+                if wd >= 0:
+                    watches[wd] = directory
+
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([fd], [], [], 1.0)
+                if not ready:
+                    # data/ ディレクトリが後から作られた場合に備える
+                    if analysis_dir not in watches.values() and os.path.isdir(analysis_dir):
+                        wd = _libc.inotify_add_watch(fd, os.fsencode(analysis_dir), data_mask)
+                        if wd >= 0:
+                            watches[wd] = analysis_dir
+                            self.refresh_analysis()
+                    continue
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+
+                changed, analysis_changed = set(), False
+                for wd, name in _parse_inotify_events(data):
+                    directory = watches.get(wd)
+                    if directory == self.articles_dir and name.endswith('.html'):
+                        changed.add(name)
+                    elif directory == analysis_dir and name.startswith(os.path.basename(ANALYSIS_DB)):
+                        analysis_changed = True
+
+                for name in changed:
+                    self.refresh_article(name)
+                if analysis_changed:
+                    self.refresh_analysis()
+        finally:
+            os.close(fd)
+
+
+# --- inotify (Linux のみ。使えない環境ではポーリングにフォールバック) ---
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+_EVENT_HEADER = struct.Struct('iIII')
+_libc = None
+
+
+def _inotify_available():
+    global _libc
+    if _libc is not None:
+        return True
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return False
+    _libc = libc
+    return True
+
+
+def _parse_inotify_events(data):
+    offset = 0
+    while offset + _EVENT_HEADER.size <= len(data):
+        wd, _mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+        offset += _EVENT_HEADER.size
+        name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+        offset += length
+        yield wd, name
+
+
+def _analysis_mtimes():
+    # WAL モードでは書き込みはまず -wal ファイルに入る
+    return _mtime_ns(ANALYSIS_DB), _mtime_ns(ANALYSIS_DB + '-wal')
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
@@ -1,27 +1,220 @@
 import os
 import sys
 import glob
-from bot_gen import generate_tweets
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import bot_gen
+import packed_analysis
+from bot_gen import generate_tweets, create_model, PROMPT_VERSION
+from analysis_manifest import classify_articles
+from article_cache import get_article_cache
+from rate_limit import RateLimiter
+from fake_model import FakeModel
+from llm_cache import get_llm_cache
+from prompt_builder import get_digest_cache
+from packed_analysis import prepare_articles, make_packs, analyze_pack
+from job_queue import get_job_queue, make_analyze_handler, analyze_job_params, PRIORITY_BATCH
 
-def batch_analyze():
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        print("Error: GOOGLE_API_KEY environment variable is not set.")
-        print("Please set it before running: set GOOGLE_API_KEY=your_key_here")
-        return
+def analyze_one(f, model, limiter, verbose, save=True, use_cache=True):
+    """1記事を解析し、(ファイル名, 状態, 所要秒数, エラー) を返す"""
+    name = os.path.basename(f)
+    started = time.monotonic()
+    try:
+        patterns = generate_tweets(f, model=model, limiter=limiter, verbose=verbose, save=save, use_cache=use_cache)
+        status = "成功" if patterns else "形式エラー"
+        error = None
+    except Exception as e:
+        status = "失敗"
+        error = e
+    return name, status, time.monotonic() - started, error
 
-    articles_dir = os.path.join(os.path.dirname(__file__), '../../blog/articles')
-    html_files = glob.glob(os.path.join(articles_dir, "*.html"))
-    
-    print(f"解析対象の記事を {len(html_files)} 件検出しました。")
-    
+def select_articles(html_files, force=False, only_changed=False):
+    """記録された解析の版と照合して解析対象の記事を選ぶ"""
+    if force:
+        return list(html_files)
+    groups = classify_articles(html_files, PROMPT_VERSION)
+    print(f"新規: {len(groups['new'])} 件 / 変更あり: {len(groups['changed'])} 件 / 最新: {len(groups['up-to-date'])} 件")
+    if only_changed:
+        return groups["changed"]
+    return groups["new"] + groups["changed"]
+
+def analyze_packs(html_files, model, limiter, workers, save=True, use_cache=True, pack_size=None, report=None):
+    """
+    K 記事ずつ1リクエストにまとめて解析する（K はモデルの入出力上限から自動で決める。pack_size で上限を指定）。
+    まとめた応答から取り出せなかった記事は個別に解析し直す
+    """
+    articles = prepare_articles(html_files, model=model, limiter=limiter, store=save)
+    packs = make_packs(articles, model, requested=pack_size)
+    prepared = {path for path, _, _ in articles}
     for f in html_files:
-        print(f"\n--- 解析開始: {os.path.basename(f)} ---")
+        if f not in prepared:
+            report((os.path.basename(f), "形式エラー", 0.0, None))
+    print(f"{len(articles)} 件を {len(packs)} リクエストにまとめて解析します（最大 {max(map(len, packs), default=0)} 件/リクエスト）")
+
+    def run(pack):
+        started = time.monotonic()
         try:
-            generate_tweets(f)
-            print(f"成功: {os.path.basename(f)}")
+            results = analyze_pack(pack, model, limiter, save=save, use_cache=use_cache)
+            error = None
         except Exception as e:
-            print(f"失敗 ({os.path.basename(f)}): {e}")
+            results, error = {}, e
+        elapsed = (time.monotonic() - started) / len(pack)
+        return [
+            (os.path.basename(path), "成功" if results.get(path) else ("失敗" if error else "形式エラー"), elapsed, error)
+            for path, _, _ in pack
+        ]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for future in as_completed([pool.submit(run, pack) for pack in packs]):
+            for result in future.result():
+                report(result)
+
+def enqueue_articles(html_files, model, limiter, workers, save=True, use_cache=True, wait=True):
+    """
+    記事ごとに analyze_article ジョブを低い優先度で登録する。
+    UI からのジョブ（キュレーションなど）は先に実行されるので、バッチ中も UI の応答が止まらない。
+    wait=False なら登録だけして終了し、起動中の Flask アプリのワーカーに処理を任せる
+    （偽モデルのジョブはどのプロセスが実行しても偽モデルで解析し、結果は保存しない）。
+    """
+    queue = get_job_queue(workers=workers)
+    queue.register("analyze_article", make_analyze_handler(model, limiter))
+    fake_model = model if isinstance(model, FakeModel) else None
+    job_ids = {}
+    for f in html_files:
+        params, key = analyze_job_params(f, save=save, use_cache=use_cache, fake_model=fake_model)
+        job_id, coalesced = queue.submit("analyze_article", params, key=key, priority=PRIORITY_BATCH)
+        job_ids[job_id] = f
+        if coalesced:
+            print(f"登録済みのジョブにまとめました: {os.path.basename(f)} ({job_id})")
+    print(f"{len(job_ids)} 件のジョブを登録しました。")
+    if not wait:
+        print("状態は /api/jobs?kind=analyze_article で確認できます。")
+        return []
+
+    queue.start()
+    results = []
+    done = set()
+    try:
+        while len(done) < len(job_ids):
+            queue.wait(job_ids, timeout=1)
+            for job_id, f in job_ids.items():
+                job = queue.get(job_id)
+                if job_id in done or job["status"] not in ("succeeded", "failed", "cancelled"):
+                    continue
+                done.add(job_id)
+                status = {"succeeded": "成功", "failed": "失敗", "cancelled": "キャンセル"}[job["status"]]
+                elapsed = (job["finished"] or 0) - (job["started"] or job["finished"] or 0)
+                results.append((os.path.basename(f), status, elapsed, job["error"]))
+                suffix = f": {job['error']}" if job["error"] else ""
+                print(f"[{len(results)}/{len(job_ids)}] {status} {os.path.basename(f)} ({elapsed:.1f}s){suffix}")
+    except KeyboardInterrupt:
+        # 中断時は残りのジョブを取り消す
+        for job_id in set(job_ids) - done:
+            queue.cancel(job_id)
+        print("\n中断しました。残りのジョブはキャンセルしました。")
+    finally:
+        queue.stop()
+    return results
+
+def batch_analyze(workers=1, rpm=10, tpm=250000, model=None, save=True, force=False, only_changed=False,
+                  use_cache=True, use_queue=False, wait=True, pack_size=None):
+    if model is None:
+        model = create_model()
+        if model is None:
+            print("Please set it before running: set GOOGLE_API_KEY=your_key_here")
+            return
+
+    articles_dir = os.path.join(os.path.dirname(__file__), '../../blog/articles')
+    html_files = glob.glob(os.path.join(articles_dir, "*.html"))
+    print(f"記事を {len(html_files)} 件検出しました。")
+
+    html_files = select_articles(html_files, force=force, only_changed=only_changed)
+    if not html_files:
+        print("解析が必要な記事はありません。（全件やり直す場合は --force）")
+        return []
+
+    print(f"解析対象: {len(html_files)} 件（並列数: {workers}, RPM: {rpm}, TPM: {tpm}）")
+
+    # 全ワーカーで共有するレートリミッター
+    limiter = RateLimiter(rpm=rpm, tpm=tpm)
+    results = []
+    lock = threading.Lock()
+    started = time.monotonic()
+
+    def report(result):
+        name, status, elapsed, error = result
+        with lock:
+            results.append(result)
+            suffix = f": {error}" if error else ""
+            print(f"[{len(results)}/{len(html_files)}] {status} {name} ({elapsed:.1f}s){suffix}")
+
+    if pack_size is not None:
+        analyze_packs(html_files, model, limiter, workers, save=save, use_cache=use_cache,
+                      pack_size=pack_size or None, report=report)
+    elif use_queue:
+        results = enqueue_articles(html_files, model, limiter, workers, save=save, use_cache=use_cache, wait=wait)
+        if not wait:
+            return results
+    elif workers <= 1:
+        for f in html_files:
+            print(f"\n--- 解析開始: {os.path.basename(f)} ---")
+            report(analyze_one(f, model, limiter, True, save, use_cache))
+    else:
+        # 並列時は出力が混ざるので本文は表示しない
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(analyze_one, f, model, limiter, False, save, use_cache) for f in html_files]
+            for future in as_completed(futures):
+                report(future.result())
+
+    total = time.monotonic() - started
+    succeeded = sum(1 for r in results if r[1] == "成功")
+    print(f"\n完了: {succeeded}/{len(results)} 件成功 / 合計 {total:.1f}s / レート待ち {limiter.waited:.1f}s")
+    if results:
+        slowest = sorted(results, key=lambda r: r[2], reverse=True)[:5]
+        print("所要時間の長い記事:")
+        for name, status, elapsed, _ in slowest:
+            print(f"  {elapsed:6.1f}s  {status}  {name}")
+
+    print(f"\n記事キャッシュ: {get_article_cache().stats()}")
+    print(f"LLMキャッシュ: {get_llm_cache().stats()}")
+    digest = get_digest_cache().stats()
+    print(f"本文ダイジェスト: {digest['digests']} 件 / 元の本文 {digest['source_tokens']} → {digest['digest_tokens']} トークン"
+          f" / 累計削減 {digest['tokens_saved']} トークン / 要約呼び出し {digest['llm_calls']} 回")
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="batch_analyze", description="blog/articles の全記事を一括解析する")
+    parser.add_argument("--workers", type=int, default=1, help="同時に実行するリクエスト数")
+    parser.add_argument("--rpm", type=int, default=10, help="1分あたりの最大リクエスト数")
+    parser.add_argument("--tpm", type=int, default=250000, help="1分あたりの最大入力トークン数")
+    parser.add_argument("--force", action="store_true", help="変更の有無に関わらず全記事を解析する（LLM キャッシュも使わない）")
+    parser.add_argument("--only-changed", action="store_true", help="解析済みで内容が変わった記事だけを解析する（新規記事は除く）")
+    parser.add_argument("--no-cache", action="store_true", help="LLM 応答キャッシュを使わない")
+    parser.add_argument("--fake", action="store_true", help="Gemini の代わりにローカルの偽モデルを使う（結果は保存しない）")
+    parser.add_argument("--fake-latency", type=float, default=0.5, help="偽モデルの応答遅延（秒）")
+    parser.add_argument("--fake-error-rate", type=float, default=0.0, help="偽モデルが 429 を返す確率")
+    parser.add_argument("--queue", action="store_true", help="ジョブキュー経由で解析する（UI のジョブを優先）")
+    parser.add_argument("--no-wait", action="store_true", help="--queue でジョブを登録するだけにする（起動中のアプリが処理する）")
+    parser.add_argument("--pack", type=int, nargs="?", const=0, default=None, metavar="K",
+                        help="K 記事ずつ1リクエストにまとめて解析する（K 省略時はモデルの上限から自動）")
+    args = parser.parse_args(argv)
+    if args.pack is not None and args.queue:
+        parser.error("--pack と --queue は同時に指定できません")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    model = None
+    if args.fake:
+        respond = packed_analysis.fake_response if args.pack is not None else bot_gen.fake_response
+        model = FakeModel(latency=args.fake_latency, error_rate=args.fake_error_rate, respond=respond)
+    # 偽モデルの出力は解析結果として保存しない
+    return batch_analyze(workers=args.workers, rpm=args.rpm, tpm=args.tpm, model=model, save=not args.fake,
+                         force=args.force, only_changed=args.only_changed,
+                         use_cache=not (args.no_cache or args.fake or args.force),
+                         use_queue=args.queue, wait=not args.no_wait, pack_size=args.pack)
 
 if __name__ == "__main__":
-    batch_analyze()
+    main()
@@ -0,0 +1,564 @@
+"""
+マーケティング / ブログ用ツールの処理速度を測るベンチマーク
+
+    python benchmark.py                          # 10 / 1,000 / 10,000 記事で計測して結果を表示
+    python benchmark.py --quick                  # 10 / 1,000 記事だけ
+    python benchmark.py --save baseline.json     # 結果を JSON で保存（ベースライン）
+    python benchmark.py --compare baseline.json  # ベースラインと比較し、遅くなった項目があれば終了コード 1
+
+合成した記事（blog/articles と同じマークアップ）とニュースアーカイブを作業ディレクトリに生成し、
+実データ（data/ 以下の DB や blog/articles）には触れない。
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib.util
+import statistics
+import tracemalloc
+from datetime import datetime, timedelta
+
+import utils
+import article_cache
+import news_archive
+import news_curator
+from article_cache import ArticleCache
+from analysis_store import AnalysisStore
+from news_archive import NewsArchive
+from archive_log import ArchiveLog
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SEARCH_INDEX_SCRIPT = os.path.join(BASE_DIR, '..', '..', 'blog', 'scripts', 'build-search-index.py')
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), 'mochi-bench')
+DEFAULT_SIZES = [10, 1000, 10000]
+QUICK_SIZES = [10, 1000]
+ARCHIVE_SIZES = [100, 1000, 10000]
+# 一覧用メタデータの計測で使う長い記事（本文を何倍にするか）と、長い記事を作る最大の記事数
+LONG_ARTICLE_REPEAT = 20
+LONG_CORPUS_MAX = 1000
+DEFAULT_THRESHOLD = 0.15
+DEFAULT_REPEAT = 5
+# 1万件以上の計測の回数（1回が長いので減らす。中央値とばらつきを出せる最小限）
+LARGE_REPEAT = 3
+# これより小さい差は計測誤差として扱う。時間はさらに、両方の計測のばらつき × NOISE_SPREADS までを誤差とみなす
+NOISE_SECONDS = 0.002
+NOISE_SPREADS = 3
+NOISE_BYTES = 64 * 1024
+
+WORDS = [
+    "AI", "Gemini", "Python", "Flask", "もちスラ", "ボクセル", "開発", "設計", "哲学", "自動化",
+    "秘書", "検索", "キャッシュ", "データベース", "ローカルLLM", "プロンプト", "記事", "分析", "実験", "改善",
+    "スライム", "文明", "エージェント", "ワークフロー", "ブラウザ", "サーバー", "パフォーマンス", "設定", "失敗", "成功",
+]
+TAGS = ["AI開発", "個人開発", "Python", "ボクセル", "初心者", "ローカルLLM", "哲学", "自動化", "Gemini", "PWA"]
+
+
+# --- 合成データ ---
+
+def _sentence(rng):
+    words = rng.choices(WORDS, k=rng.randint(6, 14))
+    return "".join(f"{w}の" if i % 3 == 1 else w for i, w in enumerate(words)) + "について試した。"
+
+
+def synthetic_article(i, rng):
+    """blog/articles/*.html と同じ構造の記事HTML"""
+    title = f"{rng.choice(WORDS)}と{rng.choice(WORDS)}の実験ログ #{i}"
+    tags = "\n".join(f'                <span class="tag">{tag}</span>' for tag in rng.sample(TAGS, 3))
+    sections = []
+    for s in range(rng.randint(3, 6)):
+        paragraphs = "\n".join(
+            f"                <p>{''.join(_sentence(rng) for _ in range(rng.randint(2, 5)))}</p>"
+            for _ in range(rng.randint(2, 4))
+        )
+        sections.append(f"                <h2>セクション{s + 1}: {rng.choice(WORDS)}</h2>\n{paragraphs}")
+    body = "\n\n".join(sections)
+    return f"""<!DOCTYPE html>
+<html lang="ja">
+
+<head>
+    <meta charset="UTF-8">
+    <title>{title} | もちスラカルテ開発ブログ</title>
+    <link rel="stylesheet" href="../css/style.css">
+</head>
+
+<body>
+    <main class="container">
+        <article class="article-content">
+            <h1 class="article-title">{title}</h1>
+            <p class="article-meta">2026-01-{(i % 28) + 1:02d} | 5 min read</p>
+
+            <div class="tags">
+{tags}
+            </div>
+
+            <div class="content">
+{body}
+            </div>
+        </article>
+    </main>
+    <script>
+        function toggleTheme() {{ document.body.classList.toggle('dark-mode'); }}
+    </script>
+    <script src="../js/search.js"></script>
+</body>
+
+</html>
+"""
+
+
+def ensure_corpus(workdir, size, seed=0):
+    """size 件の記事ディレクトリを作る（作成済みなら再利用）"""
+    corpus_dir = os.path.join(workdir, f"articles-{size}-{seed}")
+    done_marker = os.path.join(corpus_dir, '.complete')
+    if os.path.exists(done_marker):
+        return corpus_dir
+    shutil.rmtree(corpus_dir, ignore_errors=True)
+    os.makedirs(corpus_dir)
+    rng = random.Random(seed * 100003 + size)
+    for i in range(size):
+        with open(os.path.join(corpus_dir, f"article-{i:05d}.html"), 'w', encoding='utf-8') as f:
+            f.write(synthetic_article(i, rng))
+    open(done_marker, 'w').close()
+    return corpus_dir
+
+
+def synthetic_report(i, rng, start=datetime(2026, 1, 1)):
+    return {
+        "timestamp": (start + timedelta(minutes=17 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+        "analysis": "".join(_sentence(rng) for _ in range(3)),
+        "summary": f"{i:06d} {rng.choice(WORDS)}の新機能が発表された。" + _sentence(rng),
+        "source": f"https://example.com/news/{i}",
+        "commentary": "".join(_sentence(rng) for _ in range(2)),
+    }
+
+
+def ensure_archive_json(workdir, size, seed=0):
+    """size 件の news_archive.json（旧形式）を作る"""
+    path = os.path.join(workdir, f"news_archive-{size}-{seed}.json")
+    if not os.path.exists(path):
+        rng = random.Random(seed * 100003 + size)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([synthetic_report(i, rng) for i in range(size)], f, ensure_ascii=False)
+    return path
+
+
+def ensure_long_corpus(workdir, size, repeat=LONG_ARTICLE_REPEAT, seed=0):
+    """ensure_corpus の記事の本文を repeat 倍にした記事ディレクトリ（タイトルまでの位置は同じ）"""
+    corpus_dir = os.path.join(workdir, f"articles-long{repeat}-{size}-{seed}")
+    done_marker = os.path.join(corpus_dir, '.complete')
+    if os.path.exists(done_marker):
+        return corpus_dir
+    source_dir = ensure_corpus(workdir, size, seed)
+    shutil.rmtree(corpus_dir, ignore_errors=True)
+    os.makedirs(corpus_dir)
+    for name in sorted(os.listdir(source_dir)):
+        if not name.endswith('.html'):
+            continue
+        with open(os.path.join(source_dir, name), 'r', encoding='utf-8') as f:
+            head, rest = f.read().split('<div class="content">\n', 1)
+        body, tail = rest.split('\n            </div>\n        </article>', 1)
+        with open(os.path.join(corpus_dir, name), 'w', encoding='utf-8') as f:
+            f.write(head + '<div class="content">\n' + '\n'.join([body] * repeat)
+                    + '\n            </div>\n        </article>' + tail)
+    open(done_marker, 'w').close()
+    return corpus_dir
+
+
+# --- 計測 ---
+
+def measure(prepare, run, repeat=DEFAULT_REPEAT, memory=True):
+    """
+    prepare() → run() を repeat 回計測する。メモリは別の1回で tracemalloc のピークを測る。
+    seconds は最速値、median は中央値、spread は中央値からの偏差の中央値（1回ごとのばらつき）
+    """
+    times = []
+    for _ in range(repeat):
+        state = prepare()
+        started = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - started)
+    peak = None
+    if memory:
+        state = prepare()
+        tracemalloc.start()
+        try:
+            run(state)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    median = statistics.median(times)
+    return {
+        "seconds": min(times), "median": median, "spread": statistics.median(abs(t - median) for t in times),
+        "runs": len(times), "peak_bytes": peak
+    }
+
+
+class Sandbox:
+    """計測中だけ各モジュールの保存先を作業ディレクトリに向ける"""
+
+    def __init__(self, workdir):
+        self.dir = tempfile.mkdtemp(prefix='run-', dir=workdir)
+        self._saved = (article_cache._cache, utils._analysis_store, news_archive._archive)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def fresh_article_cache(self, name='article_cache.db'):
+        if os.path.exists(self.path(name)):
+            os.remove(self.path(name))
+        article_cache._cache = ArticleCache(db_path=self.path(name))
+        return article_cache._cache
+
+    def fresh_analysis_store(self, name):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path(name) + suffix):
+                os.remove(self.path(name) + suffix)
+        utils._analysis_store = AnalysisStore(self.path(name), legacy_json=None)
+        return utils._analysis_store
+
+    def fresh_news_archive(self, name, legacy_json=None):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path(name) + suffix):
+                os.remove(self.path(name) + suffix)
+        news_archive._archive = NewsArchive(
+            db_path=self.path(name), legacy_json=legacy_json, log_dir=self.fresh_archive_log(name + '-log').dir
+        )
+        return news_archive._archive
+
+    def fresh_archive_log(self, name):
+        shutil.rmtree(self.path(name), ignore_errors=True)
+        return ArchiveLog(self.path(name))
+
+    def close(self):
+        article_cache._cache, utils._analysis_store, news_archive._archive = self._saved
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def _html_files(corpus_dir):
+    return sorted(
+        os.path.join(corpus_dir, f) for f in os.listdir(corpus_dir) if f.endswith('.html')
+    )
+
+
+def bench_get_article_data(sandbox, corpus_dir, size):
+    files = _html_files(corpus_dir)
+
+    def run_uncached(_):
+        for f in files:
+            utils.get_article_data(f, use_cache=False)
+
+    def prepare_warm():
+        sandbox.fresh_article_cache()
+        for f in files:
+            utils.get_article_data(f)
+
+    def run_cached(_):
+        for f in files:
+            utils.get_article_data(f)
+
+    return [
+        ("get_article_data/uncached", size, lambda: None, run_uncached),
+        ("get_article_data/cached", size, prepare_warm, run_cached),
+    ]
+
+
+def bench_article_meta(sandbox, corpus_dir, size):
+    """
+    一覧用のメタデータ（冒頭だけの逐次パース）と従来の全体パースの比較。
+    本文を LONG_ARTICLE_REPEAT 倍にした記事でも計測し、記事の長さに依存しないことを確かめる
+    """
+    corpora = [("", corpus_dir)]
+    if size <= LONG_CORPUS_MAX:
+        corpora.append(("_long", ensure_long_corpus(os.path.dirname(corpus_dir), size)))
+    cases = []
+    for suffix, directory in corpora:
+        files = _html_files(directory)
+
+        def run_header(_, files=files):
+            for f in files:
+                utils.get_article_meta(f, use_cache=False)
+
+        def run_full(_, files=files):
+            for f in files:
+                utils.get_article_data(f, use_cache=False)
+
+        cases.append((f"article_meta/header{suffix}", size, lambda: None, run_header))
+        cases.append((f"article_meta/full_parse{suffix}", size, lambda: None, run_full))
+    return cases
+
+
+def bench_list_articles(sandbox, corpus_dir, size):
+    def prepare_cold():
+        sandbox.fresh_article_cache()
+        sandbox.fresh_analysis_store('list_analysis.db')
+
+    def prepare_warm():
+        prepare_cold()
+        utils.list_articles(corpus_dir)
+
+    def run(_):
+        utils.list_articles(corpus_dir)
+
+    return [
+        ("list_articles/cold", size, prepare_cold, run),
+        ("list_articles/warm", size, prepare_warm, run),
+    ]
+
+
+def bench_save_analysis_data(sandbox, corpus_dir, size):
+    names = [os.path.basename(f) for f in _html_files(corpus_dir)]
+    patterns = ["パターン本文 " * 20] * 3
+
+    def prepare():
+        sandbox.fresh_analysis_store('save_analysis.db')
+
+    def run(_):
+        # batch_analyze と同じく1記事ずつ保存する
+        for name in names:
+            utils.save_analysis_data({name: patterns})
+
+    return [("save_analysis_data", size, prepare, run)]
+
+
+def bench_archive_dedupe(sandbox, workdir, size):
+    """既存 size 件のアーカイブに対して news_curator の保存（重複判定つき）を行う"""
+    legacy_json = ensure_archive_json(workdir, size)
+    rng = random.Random(size)
+    with open(legacy_json, 'r', encoding='utf-8') as f:
+        existing = json.load(f)
+    # 半分は既存と重複、半分は新規
+    attempts = 200
+    results = [
+        {k: existing[rng.randrange(size)][k] for k in ("analysis", "summary", "source", "commentary")}
+        if i % 2 else synthetic_report(size + i, rng)
+        for i in range(attempts)
+    ]
+
+    def prepare_import():
+        sandbox.fresh_news_archive('news.db', legacy_json=legacy_json)
+
+    def run_import(_):
+        len(news_archive._archive)
+
+    def prepare_curate():
+        archive = sandbox.fresh_news_archive('news.db', legacy_json=legacy_json)
+        len(archive)
+
+    def run_curate(_):
+        for result in results:
+            news_curator.archive_curation(result)
+
+    return [
+        ("news_archive/import_json", size, prepare_import, run_import),
+        ("news_curator/archive_dedupe", attempts, prepare_curate, run_curate),
+    ]
+
+
+def bench_archive_log(sandbox, workdir, size):
+    """size 件のログへの追記と直近 20 件の読み込み（どちらもログの件数に依存しないはず）"""
+    legacy_json = ensure_archive_json(workdir, size)
+    rng = random.Random(size)
+    appends = 100
+    entries = [synthetic_report(size + i, rng) for i in range(appends)]
+
+    def prepare():
+        log = sandbox.fresh_archive_log('archive-log')
+        log.migrate_json(legacy_json)
+        return log
+
+    def run_append(log):
+        for entry in entries:
+            log.append(entry)
+
+    def run_tail(log):
+        for _ in range(appends):
+            log.tail(20)
+
+    return [
+        ("archive_log/append", appends, prepare, run_append),
+        ("archive_log/tail", appends, prepare, run_tail),
+    ]
+
+
+def _load_search_index_builder():
+    spec = importlib.util.spec_from_file_location('build_search_index', SEARCH_INDEX_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_search_index(sandbox, corpus_dir, size):
+    builder = _load_search_index_builder()
+    builder.ARTICLES_DIR = corpus_dir
+    builder.OUTPUT_DIR = sandbox.path('search-index')
+    builder.STATE_FILE = sandbox.path('search_index_state.json')
+
+    def quiet(func):
+        def wrapper(*args, **kwargs):
+            stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+            try:
+                return func(*args, **kwargs)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+        return wrapper
+
+    def prepare_full():
+        shutil.rmtree(builder.OUTPUT_DIR, ignore_errors=True)
+        if os.path.exists(builder.STATE_FILE):
+            os.remove(builder.STATE_FILE)
+        sandbox.fresh_article_cache()
+
+    def prepare_incremental():
+        prepare_full()
+        quiet(builder.build_search_index)()
+
+    def run(_):
+        quiet(builder.build_search_index)()
+
+    return [
+        ("search_index/full", size, prepare_full, run),
+        ("search_index/incremental", size, prepare_incremental, run),
+    ]
+
+
+def run_suite(sizes, archive_sizes, workdir=DEFAULT_WORKDIR, repeat=DEFAULT_REPEAT, memory=True, only=None):
+    os.makedirs(workdir, exist_ok=True)
+    results = {}
+    sandbox = Sandbox(workdir)
+    try:
+        cases = []
+        for size in sizes:
+            print(f"📄 合成記事 {size} 件を準備中...")
+            corpus_dir = ensure_corpus(workdir, size)
+            for factory in (bench_get_article_data, bench_article_meta, bench_list_articles, bench_save_analysis_data,
+                            bench_search_index):
+                cases.extend(factory(sandbox, corpus_dir, size))
+        for size in archive_sizes:
+            for factory in (bench_archive_dedupe, bench_archive_log):
+                cases.extend(
+                    (name, items, prepare, run, size) for name, items, prepare, run in factory(sandbox, workdir, size)
+                )
+
+        for case in cases:
+            name, items, prepare, run = case[:4]
+            corpus_size = case[4] if len(case) > 4 else items
+            key = f"{name}[{corpus_size}]"
+            if only and not any(pattern in key for pattern in only):
+                continue
+            # 1万件の計測は回数を減らす
+            result = measure(prepare, run, repeat=min(repeat, LARGE_REPEAT) if corpus_size >= 10000 else repeat,
+                             memory=memory)
+            result["items"] = items
+            result["throughput"] = items / result["seconds"] if result["seconds"] else None
+            results[key] = result
+            print(format_result(key, result))
+    finally:
+        sandbox.close()
+    return results
+
+
+def format_result(key, result):
+    peak = f"{result['peak_bytes'] / 1024 / 1024:8.2f} MB" if result.get("peak_bytes") is not None else "       -   "
+    return (f"  {key:42s} {result['seconds'] * 1000:10.1f} ms  "
+            f"{result['throughput'] or 0:12.1f} items/s  peak {peak}")
+
+
+def save_results(path, results):
+    data = {
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 結果を保存しました: {path}")
+
+
+def noise_floor(base, current):
+    """これ以下の時間の差は計測誤差とみなす秒数（両方の計測のばらつきに比例させ、最低 NOISE_SECONDS）"""
+    return max(NOISE_SECONDS, NOISE_SPREADS * (base.get("spread", 0.0) + current.get("spread", 0.0)))
+
+
+def is_time_regression(base, current, threshold=DEFAULT_THRESHOLD):
+    """
+    中央値と最速値の両方が threshold 以上遅く、中央値の差が計測誤差を超える場合だけ性能低下とする
+    （1回だけ遅れた計測や、ばらつきの大きい短い項目で誤検出しない。median の無い古いベースラインは最速値で比べる）
+    """
+    base_median = base.get("median", base["seconds"])
+    current_median = current.get("median", current["seconds"])
+    return (current_median > base_median * (1 + threshold)
+            and current["seconds"] > base["seconds"] * (1 + threshold)
+            and current_median - base_median > noise_floor(base, current))
+
+
+def compare_results(baseline_path, results, threshold=DEFAULT_THRESHOLD):
+    """ベースラインと比べて threshold 以上遅い・メモリが多い項目を返す（時間は中央値で比べる）"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)["results"]
+
+    print(f"\n📊 ベースライン比較: {baseline_path}（許容 +{threshold:.0%}）")
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            print(f"  {key:42s} (ベースラインなし)")
+            continue
+        base_median = base.get("median", base["seconds"])
+        current_median = current.get("median", current["seconds"])
+        ratio = current_median / base_median if base_median else 1.0
+        mark = "  "
+        if is_time_regression(base, current, threshold):
+            mark = "❌"
+            regressions.append((key, "time", ratio))
+        elif ratio < 1 - threshold and base_median - current_median > noise_floor(base, current):
+            mark = "✅"
+        line = (f"{mark}{key:42s} {base_median * 1000:10.1f} → {current_median * 1000:10.1f} ms ({ratio:5.2f}x"
+                f" ±{noise_floor(base, current) * 1000:.1f} ms)")
+        if base.get("peak_bytes") and current.get("peak_bytes"):
+            mem_ratio = current["peak_bytes"] / base["peak_bytes"]
+            line += f"  peak {mem_ratio:5.2f}x"
+            if mem_ratio > 1 + threshold and current["peak_bytes"] - base["peak_bytes"] > NOISE_BYTES:
+                regressions.append((key, "memory", mem_ratio))
+                line += " ❌"
+        print(line)
+
+    if regressions:
+        print(f"\n❌ {len(regressions)}件の性能低下:")
+        for key, kind, ratio in regressions:
+            print(f"   - {key}: {'時間' if kind == 'time' else 'メモリ'} {ratio:.2f}x")
+    else:
+        print("\n✅ 性能低下はありません")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='合成データでツール群の処理速度とメモリを計測する')
+    parser.add_argument('--quick', action='store_true', help='1万件の計測を省く')
+    parser.add_argument('--sizes', type=lambda s: [int(x) for x in s.split(',')], help='記事数（例: 10,1000）')
+    parser.add_argument('--archive-sizes', type=lambda s: [int(x) for x in s.split(',')],
+                        help='アーカイブ件数（例: 100,1000）')
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='名前に含まれる項目だけ計測（例: list_articles）')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'各項目の計測回数（既定 {DEFAULT_REPEAT}。比較は中央値とばらつきで行う）')
+    parser.add_argument('--no-memory', action='store_true', help='ピークメモリを計測しない')
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR, help='合成データの作業ディレクトリ')
+    parser.add_argument('--save', metavar='PATH', help='結果を JSON で保存する')
+    parser.add_argument('--compare', metavar='PATH', help='ベースラインの JSON と比較する')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='性能低下とみなす割合（既定 0.15）')
+    args = parser.parse_args()
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    archive_sizes = args.archive_sizes or (ARCHIVE_SIZES[:2] if args.quick else ARCHIVE_SIZES)
+    results = run_suite(sizes, archive_sizes, workdir=args.workdir, repeat=args.repeat,
+                        memory=not args.no_memory, only=args.only)
+    if args.save:
+        save_results(args.save, results)
+    if args.compare and compare_results(args.compare, results, threshold=args.threshold):
+        sys.exit(1)
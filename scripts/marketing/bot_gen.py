@@ -1,71 +1,139 @@
 import os
+import re
 import sys
 
 # 自身のディレクトリをパスに追加して utils を読み込めるようにする
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-import google.generativeai as genai
-from utils import get_article_data
+from utils import get_article_data, save_analysis_data
+from rate_limit import call_with_backoff, estimate_tokens
+from analysis_manifest import content_hash
+from llm_cache import cached_generate
+from model_router import get_router
+from prompt_builder import get_article_digest, truncate_to_tokens, BODY_TOKEN_BUDGET
 
-def generate_tweets(html_path):
+# プロンプトを変更したら上げる（記録された解析の版と食い違うので全記事が再解析対象になる）
+PROMPT_VERSION = 2
+
+def create_model():
+    """共有のモデルルーターを返す（APIキーが無ければ None）"""
     # APIキーの取得（環境変数から）
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
+    if not os.environ.get("GOOGLE_API_KEY"):
         print("Error: GOOGLE_API_KEY environment variable is not set.")
-        return
+        return None
+
+    # Gemini 2.5 Flash を優先し、制限中は他のモデルへ回す
+    return get_router()
+
+# 解析の指示（1記事用・複数記事まとめて用で共通）
+ANALYSIS_RULES = """
+【キャラクター・ミッション】
+- 専門的な「ラボの研究データ」を、一般ユーザー向けの「憧れの未来」へ論理的に翻訳する。
+- 煽りや商材言葉は一切使わず、知的で洗練された「凄み」を感じさせること。
+- 読者が「自分もそうなりたい（勉強したい）」と思う、具体的で達成可能な成果を提示すること。
+
+【出力パターンの構成】
+1. 【成果の提示】読者が手に入れる「能力」や「自由」を一言で明示。なぜそれが可能か（ラボのエビデンス）を添える。
+2. 【期待される未来】その技術を得た後の「サロンの日常」を情景描写。
+3. 【知的な動機付け】マニアックな知見のどの部分が「安心の根拠」なのかを論理的に解説。
 
-    genai.configure(api_key=api_key)
-    # Gemini 2.5 Flash を使用
-    model = genai.GenerativeModel('gemini-2.5-flash')
+【重要事項】
+- 商材屋（「稼げる」「秒で」等）との差別化を徹底。
+- パターンごとに見出しをつけ、各パターンの末尾に必ず以下を添えること：
+  解析完了。 もちスララボ｜近日公開予定
+""".strip()
+
+def build_analysis_prompt(title_text, body_text):
+    """
+    記事から3パターンの発信文を作らせるプロンプト（ui/app.py と共通）。
+    body_text は prepare_analysis_prompt で予算内に収めた本文またはダイジェスト
+    """
+    return f"""あなたはMochisura Labの「データ解析官（Data Analyst Slime）」です。
+提供されたブログ記事（タイトル: {title_text}）から、読者が「結局何ができるようになるのか」というアウトカム（成果）を蒸留し、情報を欲しがらせる（憧れさせる）メッセージを3パターン生成してください。
 
-    # HTMLの共通解析
+{ANALYSIS_RULES}
+
+【データ元：ラボの研究記事】
+タイトル: {title_text}
+解析対象: {truncate_to_tokens(body_text, BODY_TOKEN_BUDGET)}"""
+
+def prepare_analysis_prompt(html_path, model=None, limiter=None, store=True):
+    """
+    記事を読み込んで解析プロンプトを作る: (タイトル, プロンプト, ダイジェスト情報)。
+    長い記事は先頭で切らずに見出しごとに要約したダイジェスト（内容ハッシュでキャッシュ）を使う。
+    本文が無ければプロンプトは None。store=False ならダイジェストを保存しない
+    """
     title_text, body_text = get_article_data(html_path)
     if not body_text:
-        print("Error: 記事の本文が見つかりませんでした。")
-        return
-
-    # AIへの指示（スキル定義に基づくプロンプト）
-    prompt = f"""
-    あなたはMochisura Labの「データ解析官（Data Analyst Slime）」です。
-    提供されたブログ記事（タイトル: {title_text}）から、読者が「結局何ができるようになるのか」というアウトカム（成果）を蒸留し、情報を欲しがらせる（憧れさせる）メッセージを3パターン生成してください。
-
-    【キャラクター・ミッション】
-    - 専門的な「ラボの研究データ」を、一般ユーザー向けの「憧れの未来」へ論理的に翻訳する。
-    - 煽りや商材言葉は一切使わず、知的で洗練された「凄み」を感じさせること。
-    - 読者が「自分もそうなりたい（勉強したい）」と思う、具体的で達成可能な成果を提示すること。
-
-    【出力パターンの構成】
-    1. 【成果の提示】読者が手に入れる「能力」や「自由」を一言で明示。なぜそれが可能か（ラボのエビデンス）を添える。
-    2. 【期待される未来】その技術を得た後の「サロンの日常」を情景描写。
-    3. 【知的な動機付け】マニアックな知見のどの部分が「安心の根拠」なのかを論理的に解説。
-
-    【重要事項】
-    - 商材屋（「稼げる」「秒で」等）との差別化を徹底。
-    - パターンごとに見出しをつけ、各パターンの末尾に必ず以下を添えること：
-      解析完了。 もちスララボ｜近日公開予定
-
-    【データ元：ラボの研究記事】
-    タイトル: {title_text}
-    解析対象: {body_text[:1500]}
+        return title_text, None, None
+    digest, info = get_article_digest(html_path, title_text, body_text, model=model, limiter=limiter, store=store)
+    return title_text, build_analysis_prompt(title_text, digest), info
+
+def save_patterns(html_path, title_text, patterns):
+    """解析結果と、解析に使った記事の版（内容のハッシュ・プロンプトのバージョン）を同じトランザクションで保存する"""
+    rel_path = os.path.basename(html_path)
+    _, body_text = get_article_data(html_path)
+    save_analysis_data({rel_path: patterns}, content_hashes={rel_path: content_hash(title_text, body_text)},
+                       prompt_version=PROMPT_VERSION)
+    print(f"\n[解析成功] 結果を保存しました: {rel_path}")
+
+def fake_response(prompt):
+    """偽モデル（fake_model.FakeModel）用の応答。parse_patterns で3パターンに分けられる形"""
+    return "\n".join(f"パターン{i}: 偽モデルの出力 {i}\n解析完了。 もちスララボ｜近日公開予定" for i in range(1, 4))
+
+def parse_patterns(text):
+    """「パターンN:」で区切られた出力をパターンのリストに分解する"""
+    patterns = re.split(r'パターン\d[:：]', text)
+    return [p.strip() for p in patterns if p.strip()]
+
+def generate_tweets(html_path, model=None, limiter=None, verbose=True, save=True, use_cache=True):
+    """
+    記事から3パターンの発信文を生成して保存する。
+    model / limiter を渡すとバッチ処理で共有できる。成功時はパターンのリストを返す。
+    save=False の場合は解析結果を保存しない（偽モデルでの試験用）。
+    同じ記事・同じプロンプトの応答は LLM キャッシュから返す（use_cache=False で無効化）。
     """
+    if model is None:
+        model = create_model()
+        if model is None:
+            return None
+
+    # HTMLの共通解析と、AIへの指示（スキル定義に基づくプロンプト）
+    title_text, prompt, digest_info = prepare_analysis_prompt(html_path, model=model, limiter=limiter, store=save)
+    if prompt is None:
+        print("Error: 記事の本文が見つかりませんでした。")
+        return None
+    if verbose and digest_info["mode"] != "full":
+        print(f"[本文] {digest_info['mode']}: {digest_info['source_tokens']} → {digest_info['body_tokens']} トークン"
+              + ("（キャッシュ）" if digest_info["cached"] else ""))
+
+    def attempt():
+        if limiter:
+            limiter.acquire(estimate_tokens(prompt))
+        return model.generate_content(prompt)
+
+    def on_retry(n, delay, error):
+        print(f"[429] {os.path.basename(html_path)}: {delay:.1f}秒後に再試行します ({n}回目)")
 
-    response = model.generate_content(prompt)
-    text = response.text
-    print(text)
+    def invoke():
+        # レート制限 (429) は指数バックオフ＋ジッターで再試行
+        response, _ = call_with_backoff(attempt, on_retry=on_retry)
+        return response.text
+
+    text = cached_generate(model, prompt, use_cache=use_cache, invoke=invoke)
+    if verbose:
+        print(text)
 
     # 抽出ロジック（簡易版）
-    import re
-    from utils import save_analysis_data
-    
-    patterns = re.split(r'パターン\d[:：]', text)
-    patterns = [p.strip() for p in patterns if p.strip()]
-    
+    patterns = parse_patterns(text)
+
     if len(patterns) >= 3:
-        rel_path = os.path.basename(html_path)
-        save_analysis_data({rel_path: patterns[:3]})
-        print(f"\n[解析成功] 結果を保存しました: {rel_path}")
+        if save:
+            save_patterns(html_path, title_text, patterns[:3])
+        return patterns[:3]
     else:
         print("\n[解析エラー] 出力形式が正規表現にマッチしませんでした。")
+        return None
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -1,6 +1,5 @@
 import os
 import sys
-import google.generativeai as genai
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,52 @@
+"""
+Gemini の代わりに使うローカルの偽モデル（--fake・ベンチマーク・テスト用）
+
+応答の中身は機能ごとに用意した関数（respond）が決める。偽モデル自体はプロンプトの文面を見ない:
+    bot_gen.fake_response           1記事の解析（3パターン形式）
+    packed_analysis.fake_response   複数記事をまとめた解析（記事ごとの JSON 配列）
+    history_generator.fake_response 歴史記事（必須ブロックを含む HTML）
+"""
+import time
+import random
+import threading
+
+
+class FakeRateLimitError(Exception):
+    pass
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def default_response(prompt):
+    return "偽モデルの出力"
+
+
+class FakeModel:
+    """
+    latency 秒待ってから respond(prompt) の文字列を返し、error_rate の確率で 429 を投げる。
+    stream=True なら1行ずつのチャンクに分けて返す
+    """
+
+    def __init__(self, latency=0.5, error_rate=0.0, seed=None, model_name="fake-model", respond=default_response):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.model_name = model_name
+        self.respond = respond
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.error_rate
+        time.sleep(self.latency)
+        if fail:
+            raise FakeRateLimitError("429 Resource has been exhausted (fake)")
+        text = self.respond(prompt)
+        if stream:
+            return [FakeResponse(line + "\n") for line in text.split("\n")]
+        return FakeResponse(text)
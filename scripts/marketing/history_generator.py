@@ -1,21 +1,60 @@
+"""
+歴史記事（blog/history/ の HTML）の生成
+
+1時代ずつ:
+    python history_generator.py --era "枢軸時代（BC 500前後）" --topics "ソクラテス、孔子" --round 3
+
+月次セッションの計画（複数の時代）をまとめて:
+    python history_generator.py --plan session-03.json --workers 3 --rpm 10
+
+計画ファイルの形式:
+    {
+      "session_round": 3,
+      "focus_philosophy": true,
+      "eras": [
+        {"slug": "axial-age", "era": "枢軸時代（BC 500前後）", "topics": "ソクラテス、孔子、ブッダ"},
+        {"slug": "hellenism", "era": "ヘレニズム時代", "topics": "アレクサンドロス、ストア派"}
+      ]
+    }
+
+各時代は共有のレートリミッターの下で並列に生成し、完成したものから既存の歴史記事と同じ枠（blog/templates/history.html。
+head・CSS・ナビゲーション・前後の時代へのリンク）に埋め込んで blog/history/<slug>.html に書き込む。
+進捗はチェックポイント（data/history_checkpoint.json）に記録するので、中断しても再実行すれば未完成の時代だけを生成する。
+必須のブロック（article-header / cosmic-content / scene-box / fact-sidebar）が揃っていない応答は書き込まない。
+"""
 import os
-import google.generativeai as genai
-from datetime import datetime
+import re
+import sys
+import html as html_lib
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def generate_history_article(era_name, context_topics, focus_philosophy=True, session_round=None):
-    """
-    歴史の特定の時代に関する詳細記事（HTML）を生成する。
-    session_roundが指定されている場合、「月次セッション」としてのメタデータを付与する。
-    """
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        return "Error: GOOGLE_API_KEY not set."
+from llm_cache import cached_generate, get_llm_cache, model_name_of
+from model_router import get_router
+from rate_limit import RateLimiter, call_with_backoff, estimate_tokens
+from fake_model import FakeModel
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+HISTORY_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'blog', 'history'))
+CHECKPOINT_FILE = os.path.join(DATA_DIR, 'history_checkpoint.json')
+PAGE_TEMPLATE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'blog', 'templates', 'history.html'))
+# ページの枠（PAGE_TEMPLATE や render_page）を変えたら上げる（生成済みの時代も書き直す。応答は LLM キャッシュから）
+PAGE_VERSION = 2
 
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.5-flash')
+# 出力に必須のブロック（class 名）
+REQUIRED_BLOCKS = ['article-header', 'cosmic-content', 'scene-box', 'fact-sidebar']
+# 必須ブロックが欠けた応答を生成し直す回数
+MAX_ATTEMPTS = 2
 
+
+def build_history_prompt(era_name, context_topics, focus_philosophy=True, session_round=None):
     session_text = f"第 {session_round} 回セッション：" if session_round else ""
-    
+
     philosophy_instruction = ""
     if focus_philosophy:
         philosophy_instruction = f"""
@@ -25,7 +64,7 @@ def generate_history_article(era_name, context_topics, focus_philosophy=True, se
         そして、その「問い」が2,500年後の現在、AIを操る私たちにどう響いているのかを深く考察してください。
         """
 
-    prompt = f"""
+    return f"""
     あなたはMochisura Labの「歴史探究班・筆頭記録官」です。
     以下の時代・トピックについて、プロフェッショナルかつ叙情的な詳細記事をHTML形式で生成してください。
 
@@ -45,22 +84,325 @@ def generate_history_article(era_name, context_topics, focus_philosophy=True, se
     3. 記事内には、現在の閲覧者に語りかけるような、AI調査員からの「問い」を1つ配置してください。
     """
 
+
+def extract_html(content):
+    """HTMLタグの抽出（もしGeminiがmarkdownの```htmlで囲んできた場合）"""
+    if "```html" in content:
+        return content.split("```html")[1].split("```")[0].strip()
+    if "```" in content:
+        return content.split("```")[1].strip()
+    return content
+
+
+def missing_blocks(html):
+    """REQUIRED_BLOCKS のうち、その class を持つ要素が無いもの"""
+    return [
+        block for block in REQUIRED_BLOCKS
+        if not re.search(r'<\w+[^>]*\sclass\s*=\s*["\'][^"\']*(?<![\w-])' + re.escape(block) + r'(?![\w-])', html)
+    ]
+
+
+def _strip_tags(fragment):
+    return re.sub(r'\s+', ' ', html_lib.unescape(re.sub(r'<[^>]+>', '', fragment))).strip()
+
+
+def page_link(entry, label, align_right=False):
+    style = ' style="text-align: right;"' if align_right else ''
+    return (f'                <a href="{html_lib.escape(entry["slug"])}.html" class="nav-link"{style}>\n'
+            f'                    <span class="nav-label">{label}</span>\n'
+            f'                    <span class="nav-title">{html_lib.escape(entry["era"])}</span>\n'
+            f'                </a>')
+
+
+def render_page(fragment, entry, previous=None, following=None, template_path=PAGE_TEMPLATE):
+    """
+    モデルが生成した本文（article-header / cosmic-content のブロック）を歴史記事の枠に埋め込んだ HTML を返す。
+    previous / following は前後の時代のエントリ（無ければ一覧へのリンク / 省略）。
+    応答が既に完全な HTML 文書ならそのまま返す
+    """
+    if re.search(r'<html[\s>]', fragment, re.IGNORECASE):
+        return fragment
+    header = re.search(r'<div[^>]*class="[^"]*article-header[^"]*"[^>]*>(.*?)</div>', fragment, re.DOTALL)
+    title = re.search(r'<h1[^>]*>(.*?)</h1>', header.group(1) if header else fragment, re.DOTALL)
+    title = _strip_tags(title.group(1)) if title else entry["era"]
+    subtitle = re.search(r'<p[^>]*>(.*?)</p>', header.group(1), re.DOTALL) if header else None
+    description = _strip_tags(subtitle.group(1)) if subtitle else f"{entry['era']}を観測する History Chronicles の記録。"
+
+    links = [page_link(previous, "Previous") if previous else (
+        '                <a href="index.html" class="nav-link">\n'
+        '                    <span class="nav-label">Previous</span>\n'
+        '                    <span class="nav-title">Chronicles Index</span>\n'
+        '                </a>')]
+    if following:
+        links.append(page_link(following, "Next", align_right=True))
+    values = {
+        "title": html_lib.escape(title),
+        "description": html_lib.escape(description),
+        "slug": html_lib.escape(entry["slug"]),
+        "content": "\n".join("        " + line if line else line for line in fragment.strip().split("\n")),
+        "page_nav": '        <div class="page-nav">\n' + "\n".join(links) + '\n        </div>',
+    }
+    with open(template_path, 'r', encoding='utf-8') as f:
+        template = f.read()
+    # 置換は1回だけ（本文に {{ }} が含まれていても展開しない）
+    return re.sub(r'\{\{\s*(\w+)\s*\}\}', lambda m: values[m.group(1)], template)
+
+
+def fake_response(prompt):
+    """偽モデル用の応答（必須ブロックを全て含む HTML）"""
+    return ('```html\n<div class="article-header"><h1 class="article-title">偽モデルの時代</h1></div>\n'
+            '<div class="cosmic-content"><p>偽モデルの本文</p>\n'
+            '<div class="scene-box"><p>偽モデルの情景</p></div>\n'
+            '<div class="fact-sidebar"><p>偽モデルの解説</p></div></div>\n```')
+
+
+def generate_history_article(era_name, context_topics, focus_philosophy=True, session_round=None):
+    """
+    歴史の特定の時代に関する詳細記事（HTML）を生成する。
+    session_roundが指定されている場合、「月次セッション」としてのメタデータを付与する。
+    """
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        return "Error: GOOGLE_API_KEY not set."
+
+    model = get_router()
+    prompt = build_history_prompt(era_name, context_topics, focus_philosophy, session_round)
+
     try:
-        response = model.generate_content(prompt)
-        content = response.text
-        
-        # HTMLタグの抽出（もしGeminiがmarkdownの```htmlで囲んできた場合）
-        if "```html" in content:
-            content = content.split("```html")[1].split("```")[0].strip()
-        elif "```" in content:
-            content = content.split("```")[1].strip()
-
-        return content
+        return extract_html(cached_generate(model, prompt))
     except Exception as e:
         return f"Error: {e}"
 
+
+# --- 月次セッションのまとめて生成 ---
+
+def load_plan(path):
+    """計画ファイルを読み、時代ごとのエントリ（slug / era / topics / 出力ファイル名）にする"""
+    with open(path, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    session_round = plan.get("session_round")
+    focus = plan.get("focus_philosophy", True)
+    eras, slugs = [], set()
+    for i, entry in enumerate(plan.get("eras", [])):
+        if not entry.get("era"):
+            raise ValueError(f"eras[{i}]: era がありません")
+        slug = entry.get("slug") or (f"session-{session_round:02d}-{i + 1:02d}" if session_round else f"era-{i + 1:02d}")
+        if not re.fullmatch(r'[a-z0-9][a-z0-9-]*', slug):
+            raise ValueError(f"eras[{i}]: slug {slug!r} は英小文字・数字・ハイフンだけにしてください")
+        if slug in slugs:
+            raise ValueError(f"eras[{i}]: slug {slug!r} が重複しています")
+        slugs.add(slug)
+        eras.append({
+            "slug": slug,
+            "era": entry["era"],
+            "topics": entry.get("topics", ""),
+            "session_round": entry.get("session_round", session_round),
+            "focus_philosophy": entry.get("focus_philosophy", focus),
+        })
+    if not eras:
+        raise ValueError("eras が空です")
+    return eras
+
+
+def era_key(entry):
+    """プロンプトとページの枠の版を表すキー（時代やキーワードを変えたらその時代だけ生成し直す）"""
+    prompt = build_history_prompt(entry["era"], entry["topics"], entry["focus_philosophy"], entry["session_round"])
+    return hashlib.sha256(f"{PAGE_VERSION}\0{prompt}".encode('utf-8')).hexdigest()[:16]
+
+
+class Checkpoint:
+    """
+    時代ごとの進捗（出力パス → 状態）。更新のたびに一時ファイル＋rename で保存する。
+    path=None ならメモリ上だけで持つ（偽モデルでの試験用）
+    """
+
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get("eras", {})
+            except (OSError, ValueError):
+                pass
+
+    def is_done(self, output_path, key):
+        """同じプロンプトで書き込み済みで、ファイルも書いたときのままなら完了とみなす"""
+        entry = self.entries.get(output_path)
+        if not entry or entry.get("status") != "done" or entry.get("key") != key:
+            return False
+        try:
+            with open(output_path, 'r', encoding='utf-8') as f:
+                return hashlib.sha256(f.read().encode('utf-8')).hexdigest() == entry.get("sha256")
+        except OSError:
+            return False
+
+    def update(self, output_path, **fields):
+        with self._lock:
+            self.entries[output_path] = {**self.entries.get(output_path, {}), **fields, "updated": time.time()}
+            if not self.path:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({"eras": self.entries}, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self.path + '.tmp', self.path)
+
+
+def write_atomic(path, text):
+    """同じディレクトリの一時ファイルに書いてから rename する（途中で落ちても壊れない）"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def generate_era(entry, model, limiter=None, use_cache=True):
+    """
+    1時代分を生成して検証する。戻り値は (HTML, 試行回数)。
+    必須ブロックが欠けていれば MAX_ATTEMPTS まで生成し直し、それでも欠けていれば ValueError。
+    検証を通った応答だけを LLM キャッシュに保存する
+    """
+    prompt = build_history_prompt(entry["era"], entry["topics"], entry["focus_philosophy"], entry["session_round"])
+    cache = get_llm_cache()
+    name = model_name_of(model)
+
+    def attempt():
+        if limiter:
+            limiter.acquire(estimate_tokens(prompt))
+        return model.generate_content(prompt)
+
+    missing = REQUIRED_BLOCKS
+    for number in range(1, MAX_ATTEMPTS + 1):
+        # 2回目以降はキャッシュを見ない（同じ崩れた応答を使わない）
+        text = cache.lookup(name, prompt) if use_cache and number == 1 else None
+        cached = text is not None
+        if text is None:
+            started = time.monotonic()
+            response, _ = call_with_backoff(attempt)
+            text = response.text
+        html = extract_html(text)
+        missing = missing_blocks(html)
+        if not missing:
+            if use_cache and not cached:
+                cache.store(name, prompt, text, time.monotonic() - started)
+            return html, number
+        print(f"[{entry['slug']}] 必須ブロックがありません（{', '.join(missing)}）。生成し直します ({number}/{MAX_ATTEMPTS})")
+    raise ValueError(f"必須ブロックがありません: {', '.join(missing)}")
+
+
+def generate_session(eras, out_dir=HISTORY_DIR, workers=3, rpm=10, tpm=250000, model=None,
+                     force=False, use_cache=True, checkpoint=None, save=True):
+    """
+    計画の各時代を並列に生成し、完成したものから歴史記事の枠に埋め込んで out_dir/<slug>.html に書き込む
+    （前後のリンクは計画の並び順）。
+    チェックポイントで完了済みの時代はスキップする（force で全部やり直す）。
+    戻り値は [(slug, 状態, 所要秒数, エラー)]（API キーが無ければ None）
+    """
+    if model is None:
+        if not os.environ.get("GOOGLE_API_KEY"):
+            print("Error: GOOGLE_API_KEY not set.")
+            return None
+        model = get_router()
+    checkpoint = checkpoint or Checkpoint()
+    limiter = RateLimiter(rpm=rpm, tpm=tpm)
+    os.makedirs(out_dir, exist_ok=True)
+
+    pending = []
+    for i, entry in enumerate(eras):
+        output_path = os.path.join(out_dir, f"{entry['slug']}.html")
+        key = era_key(entry)
+        if not force and checkpoint.is_done(output_path, key):
+            print(f"⏭️  {entry['slug']}: 生成済み")
+            continue
+        neighbours = (eras[i - 1] if i > 0 else None, eras[i + 1] if i + 1 < len(eras) else None)
+        pending.append((entry, neighbours, output_path, key))
+    print(f"生成対象: {len(pending)}/{len(eras)} 件（並列数: {workers}, RPM: {rpm}）")
+
+    results = []
+    lock = threading.Lock()
+    started = time.monotonic()
+
+    def run(entry, neighbours, output_path, key):
+        era_started = time.monotonic()
+        checkpoint.update(output_path, key=key, slug=entry["slug"], status="running")
+        try:
+            fragment, attempts = generate_era(entry, model, limiter, use_cache=use_cache)
+            html = render_page(fragment, entry, *neighbours)
+            if save:
+                write_atomic(output_path, html)
+            checkpoint.update(output_path, status="done" if save else "generated", attempts=attempts, error=None,
+                              sha256=hashlib.sha256(html.encode('utf-8')).hexdigest())
+            return entry["slug"], "成功", time.monotonic() - era_started, None
+        except Exception as e:
+            checkpoint.update(output_path, status="failed", error=str(e))
+            return entry["slug"], "失敗", time.monotonic() - era_started, e
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    futures = [pool.submit(run, *item) for item in pending]
+    try:
+        for future in as_completed(futures):
+            slug, status, elapsed, error = future.result()
+            with lock:
+                results.append((slug, status, elapsed, error))
+                suffix = f": {error}" if error else ""
+                print(f"[{len(results)}/{len(pending)}] {status} {slug} ({elapsed:.1f}s){suffix}")
+    except KeyboardInterrupt:
+        # 未着手の時代は取り消す（完成した時代はチェックポイントに残っている）
+        for future in futures:
+            future.cancel()
+        print("\n中断しました。再実行すると未完成の時代だけを生成します。")
+        raise
+    finally:
+        pool.shutdown(wait=True)
+
+    succeeded = sum(1 for r in results if r[1] == "成功")
+    print(f"\n完了: {succeeded}/{len(pending)} 件成功 / 合計 {time.monotonic() - started:.1f}s / レート待ち {limiter.waited:.1f}s")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="history_generator", description="歴史記事（blog/history/）を生成する")
+    parser.add_argument("--plan", help="月次セッションの計画ファイル（JSON）")
+    parser.add_argument("--era", help="時代・トピック（1時代だけ生成する場合）")
+    parser.add_argument("--topics", default="", help="キーワード（--era と一緒に指定）")
+    parser.add_argument("--round", type=int, help="月次セッションの回数（--era と一緒に指定）")
+    parser.add_argument("--no-philosophy", action="store_true", help="哲学特化の指示を付けない（--era と一緒に指定）")
+    parser.add_argument("--out-dir", default=HISTORY_DIR, help="出力先ディレクトリ")
+    parser.add_argument("--workers", type=int, default=3, help="同時に生成する時代の数")
+    parser.add_argument("--rpm", type=int, default=10, help="1分あたりの最大リクエスト数")
+    parser.add_argument("--tpm", type=int, default=250000, help="1分あたりの最大入力トークン数")
+    parser.add_argument("--force", action="store_true", help="チェックポイントを無視して全時代を生成し直す")
+    parser.add_argument("--no-cache", action="store_true", help="LLM 応答キャッシュを使わない")
+    parser.add_argument("--fake", action="store_true", help="Gemini の代わりにローカルの偽モデルを使う（ファイルは書き込まない）")
+    parser.add_argument("--fake-latency", type=float, default=0.5, help="偽モデルの応答遅延（秒）")
+    args = parser.parse_args(argv)
+
+    if args.plan:
+        eras = load_plan(args.plan)
+    elif args.era:
+        eras = [{"slug": f"session-{args.round:02d}" if args.round else "era-01", "era": args.era,
+                 "topics": args.topics, "session_round": args.round, "focus_philosophy": not args.no_philosophy}]
+    else:
+        parser.error("--plan か --era を指定してください")
+
+    model = FakeModel(latency=args.fake_latency, respond=fake_response) if args.fake else None
+    results = generate_session(
+        eras, out_dir=args.out_dir, workers=args.workers, rpm=args.rpm, tpm=args.tpm, model=model,
+        force=args.force or args.fake, use_cache=not (args.no_cache or args.fake), save=not args.fake,
+        checkpoint=Checkpoint(None) if args.fake else None
+    )
+    if results is None:
+        return 1
+    return 1 if any(status != "成功" for _, status, _, _ in results) else 0
+
+
 if __name__ == "__main__":
-    # テスト実行例：枢軸時代の哲学
-    # result = generate_history_article("枢軸時代（BC 500前後）", "ソクラテス、プラトン、アリストテレス、孔子、老子、ブッダ、思想の爆発")
-    # print(result)
-    pass
+    sys.exit(main())
@@ -0,0 +1,431 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+JOBS_DB = os.path.join(DATA_DIR, 'jobs.db')
+
+# 優先度（小さいほど先に実行）。UI からの依頼をバッチ解析より先に処理する
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+# 終了したジョブを残す期間と、ワーカーが古いジョブを削除する間隔
+FINISHED_RETENTION = 7 * 24 * 3600
+PRUNE_INTERVAL = 3600
+
+
+class JobCancelled(Exception):
+    """実行中のジョブがキャンセルされた（ハンドラは job.check_cancelled() で中断できる）"""
+
+
+class Job:
+    """ハンドラに渡されるジョブ。キャンセルの確認と進捗の報告ができる"""
+
+    def __init__(self, queue, job_id, kind, params):
+        self.queue = queue
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+
+    @property
+    def cancelled(self):
+        return self.queue._cancel_requested(self.id)
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(self.id)
+
+    def progress(self, done, total=None, message=None):
+        self.queue._set_progress(self.id, {"done": done, "total": total, "message": message})
+
+
+class JobQueue:
+    """
+    SQLite のジョブテーブルを使うバックグラウンドジョブキュー。
+
+    - submit() はすぐにジョブIDを返し、ワーカースレッドが優先度順に実行する
+    - 同じ kind と key のジョブが待機中/実行中なら新しく作らずそのジョブを返す（重複リクエストの集約）
+    - ジョブはテーブルに残るので再起動後も結果を参照でき、未実行のジョブは再開される
+    - 取り出しは UPDATE ... RETURNING で行うため、複数プロセス（Flask と batch_analyze）で同じテーブルを共有できる
+    """
+
+    def __init__(self, db_path=JOBS_DB, workers=2, poll_interval=1.0):
+        self.db_path = db_path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.handlers = {}
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+        self._init_db()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                key TEXT,
+                params TEXT,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                worker TEXT,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs(status, priority, created);
+            CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(kind, key, status);
+            CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(status, finished);
+        """)
+
+    # --- 登録・投入 ---
+
+    def register(self, kind, handler):
+        """handler(params, job) の戻り値（JSON にできる値）がジョブの結果になる"""
+        self.handlers[kind] = handler
+        return handler
+
+    def submit(self, kind, params=None, key=None, priority=PRIORITY_INTERACTIVE):
+        """ジョブを登録して (ジョブID, 既存ジョブに集約されたか) を返す"""
+        conn = self._connect()
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if key is not None:
+                    row = conn.execute(
+                        "SELECT id FROM jobs WHERE kind = ? AND key = ? AND status IN (?, ?) "
+                        "AND cancel_requested = 0 ORDER BY created LIMIT 1",
+                        (kind, key, *ACTIVE_STATUSES)
+                    ).fetchone()
+                    if row:
+                        conn.execute("COMMIT")
+                        return row["id"], True
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, key, params, priority, status, created) VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+                    (job_id, kind, key, json.dumps(params or {}, ensure_ascii=False), priority, time.time())
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self._wakeup.set()
+        return job_id, False
+
+    # --- 参照・キャンセル ---
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _to_dict(row) if row else None
+
+    def list(self, status=None, kind=None, limit=50):
+        where, params = [], []
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+        sql = "SELECT * FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created DESC LIMIT ?"
+        params.append(limit)
+        return [_to_dict(row) for row in self._connect().execute(sql, params).fetchall()]
+
+    def counts(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def cancel(self, job_id):
+        """
+        待機中のジョブはその場でキャンセル、実行中のジョブはキャンセルを要求する
+        （ハンドラが job.check_cancelled() を呼んだ時点、または終了時に cancelled になる）。
+        戻り値は更新後のジョブ（存在しなければ None）
+        """
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id)
+        )
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def wait(self, job_ids, timeout=None, interval=0.5):
+        """全ジョブが終わるまで待つ（バッチ用）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pending = set(job_ids)
+        while pending:
+            placeholders = ",".join("?" * len(pending))
+            rows = self._connect().execute(
+                f"SELECT id FROM jobs WHERE id IN ({placeholders}) AND status IN (?, ?, ?)",
+                (*pending, *FINISHED_STATUSES)
+            ).fetchall()
+            pending -= {row["id"] for row in rows}
+            if pending:
+                if deadline is not None and time.monotonic() > deadline:
+                    return False
+                time.sleep(interval)
+        return True
+
+    def _cancel_requested(self, job_id):
+        row = self._connect().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def _set_progress(self, job_id, progress):
+        self._connect().execute(
+            "UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress, ensure_ascii=False), job_id)
+        )
+
+    # --- ワーカー ---
+
+    def prune(self, retention=FINISHED_RETENTION):
+        """終了してから retention 秒より経ったジョブを削除し、削除した件数を返す（待機中・実行中は残す）"""
+        placeholders = ",".join("?" * len(FINISHED_STATUSES))
+        deleted = self._connect().execute(
+            f"DELETE FROM jobs WHERE status IN ({placeholders}) AND finished < ?",
+            (*FINISHED_STATUSES, time.time() - retention)
+        ).rowcount
+        self._next_prune = time.time() + PRUNE_INTERVAL
+        return deleted
+
+    def start(self):
+        """ワーカースレッドを起動する（前回の実行中に止まったジョブは failed にし、古い終了済みのジョブを消す）"""
+        if self._threads:
+            return self
+        self._recover()
+        self.prune()
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _recover(self):
+        # 'running' のまま残っていて、実行していたプロセスがもう居ないジョブは途中で落ちたもの
+        conn = self._connect()
+        rows = conn.execute("SELECT id, worker FROM jobs WHERE status = 'running'").fetchall()
+        for row in rows:
+            pid = (row["worker"] or "").split(":", 1)[0]
+            if pid.isdigit() and _process_alive(int(pid)):
+                continue
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'interrupted', finished = ? WHERE id = ? AND status = 'running'",
+                (time.time(), row["id"])
+            )
+
+    def _claim(self, worker_name):
+        """実行できるジョブを1件取り出して running にする（他のプロセスと競合しても1件は1回だけ）"""
+        if not self.handlers:
+            return None
+        kinds = list(self.handlers)
+        placeholders = ",".join("?" * len(kinds))
+        row = self._connect().execute(
+            f"""
+            UPDATE jobs SET status = 'running', started = ?, worker = ?
+            WHERE id = (
+                SELECT id FROM jobs WHERE status = 'queued' AND kind IN ({placeholders})
+                ORDER BY priority, created LIMIT 1
+            ) AND status = 'queued'
+            RETURNING id, kind, params
+            """,
+            (time.time(), worker_name, *kinds)
+        ).fetchone()
+        return row
+
+    def _worker(self):
+        worker_name = f"{os.getpid()}:{threading.current_thread().name}"
+        while not self._stop.is_set():
+            try:
+                row = self._claim(worker_name)
+            except sqlite3.OperationalError as e:
+                print(f"Job queue busy: {e}")
+                row = None
+            if row is None:
+                if time.time() >= self._next_prune:
+                    try:
+                        self.prune()
+                    except sqlite3.OperationalError as e:
+                        print(f"Job queue busy: {e}")
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self.run_job(row["id"], row["kind"], json.loads(row["params"] or "{}"))
+
+    def run_job(self, job_id, kind, params):
+        job = Job(self, job_id, kind, params)
+        status, result, error = "succeeded", None, None
+        try:
+            result = self.handlers[kind](params, job)
+            if job.cancelled:
+                status = "cancelled"
+        except JobCancelled:
+            status = "cancelled"
+        except Exception as e:
+            status, error = "failed", str(e)
+            print(f"Job {kind} {job_id} failed: {e}")
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error, time.time(), job_id)
+        )
+        return status
+
+
+def _process_alive(pid):
+    """
+    pid のプロセスが生きているか。
+    Windows の os.kill(pid, 0) はシグナルの確認ではなく TerminateProcess になるので、プロセスの終了コードを調べる
+    """
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        return _windows_process_alive(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # EPERM: 別ユーザーのプロセスとして存在する
+        return True
+    return True
+
+
+def _windows_process_alive(pid):
+    import ctypes
+    from ctypes import wintypes
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    STILL_ACTIVE = 259
+    ERROR_ACCESS_DENIED = 5
+
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # 開けないが存在はする（権限不足）。それ以外（ERROR_INVALID_PARAMETER）はそのPIDのプロセスが無い
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        exit_code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+            return True
+        return exit_code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _to_dict(row):
+    job = dict(row)
+    for field in ("params", "result", "progress"):
+        job[field] = json.loads(job[field]) if job[field] else None
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+# --- 標準のジョブ ---
+
+_batch_limiter = None
+
+
+def _shared_limiter():
+    """analyze_article ジョブで共有するレートリミッター"""
+    global _batch_limiter
+    if _batch_limiter is None:
+        from rate_limit import RateLimiter
+        _batch_limiter = RateLimiter(
+            rpm=int(os.environ.get("MOCHI_BATCH_RPM", 10)), tpm=int(os.environ.get("MOCHI_BATCH_TPM", 250000))
+        )
+    return _batch_limiter
+
+
+def analyze_job_params(path, save=True, use_cache=True, fake_model=None):
+    """
+    analyze_article ジョブの (パラメータ, 集約キー)。
+    結果が変わるパラメータ（保存するか・LLM キャッシュ・偽モデル）はキーにも含め、
+    偽モデルや保存しない解析が本物の解析のジョブに集約されないようにする
+    """
+    path = os.path.abspath(path)
+    params = {"path": path, "save": save, "use_cache": use_cache, "fake": fake_model is not None}
+    if fake_model is not None:
+        params.update(fake_latency=fake_model.latency, fake_error_rate=fake_model.error_rate)
+    key = json.dumps([path, save, use_cache, params["fake"]])
+    return params, key
+
+
+def make_analyze_handler(model=None, limiter=None):
+    """
+    analyze_article ジョブのハンドラを作る。
+    batch_analyze は自分のモデル（偽モデルを含む）とレートリミッターを渡して登録し直す。
+    モデルはジョブの fake に合わせて選ぶ（別のプロセスが登録した偽モデルのジョブを本物のモデルで実行したり、
+    その逆をしたりしない）。
+    """
+    def model_for(params):
+        from bot_gen import create_model, fake_response
+        from fake_model import FakeModel
+        if params.get("fake"):
+            if isinstance(model, FakeModel):
+                return model
+            return FakeModel(latency=params.get("fake_latency", 0.5), error_rate=params.get("fake_error_rate", 0.0),
+                             respond=fake_response)
+        if model is not None and not isinstance(model, FakeModel):
+            return model
+        return create_model()
+
+    def analyze_article_job(params, job):
+        from bot_gen import generate_tweets
+        current = model_for(params)
+        if current is None:
+            raise RuntimeError("GOOGLE_API_KEY is not set.")
+        job.check_cancelled()
+        patterns = generate_tweets(
+            params["path"], model=current, limiter=limiter or _shared_limiter(), verbose=False,
+            save=params.get("save", True) and not params.get("fake"), use_cache=params.get("use_cache", True)
+        )
+        if not patterns:
+            raise RuntimeError("出力形式が正規表現にマッチしませんでした。")
+        return {"path": params["path"], "patterns": patterns}
+    return analyze_article_job
+
+
+def register_default_jobs(queue):
+    queue.register("analyze_article", make_analyze_handler())
+    return queue
+
+
+_queue = None
+
+
+def get_job_queue(workers=None):
+    """プロセス共有のキュー（標準のジョブを登録済み。start() は呼び出し側で行う）"""
+    global _queue
+    if _queue is None:
+        workers = workers or int(os.environ.get("MOCHI_JOB_WORKERS", 2))
+        _queue = register_default_jobs(JobQueue(workers=workers))
+    return _queue
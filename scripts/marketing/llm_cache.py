@@ -0,0 +1,220 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+CACHE_DB = os.path.join(DATA_DIR, 'llm_cache.db')
+
+
+def normalize_prompt(prompt):
+    """インデントや空行の違いだけのプロンプトが同じキーになるよう正規化する"""
+    if isinstance(prompt, (list, tuple)):
+        prompt = "\n\n".join(str(p) for p in prompt)
+    lines = [line.strip() for line in str(prompt).splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', "\n".join(lines)).strip()
+
+
+def cache_key(model_name, prompt, params=None):
+    payload = json.dumps(
+        {"model": model_name, "prompt": normalize_prompt(prompt), "params": params or {}},
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SQLiteBackend:
+    """再起動後も残るディスクバックエンド"""
+
+    def __init__(self, db_path=CACHE_DB, max_entries=5000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    text TEXT,
+                    latency REAL,
+                    created REAL,
+                    last_access REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT text, latency, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row:
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return row
+
+    def set(self, key, model_name, text, latency, created):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model_name, text, latency, created, created)
+        )
+        count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,)
+            )
+        conn.commit()
+
+    def delete(self, key):
+        conn = self._connect()
+        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        conn.commit()
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+
+
+class LLMCache:
+    """
+    LLM 応答のキャッシュ。キーは (モデル名, 正規化したプロンプト, 生成パラメータ)。
+    プロセス内 LRU を手前に置き、backend（既定は SQLite）に永続化する。
+    """
+
+    def __init__(self, backend=None, ttl=7 * 24 * 3600, memory_entries=256):
+        self.backend = backend
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "bypassed": 0, "saved_seconds": 0.0}
+
+    def get(self, key, ttl=None):
+        """(text, latency) を返す。無い・期限切れなら None"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self.backend is not None:
+                try:
+                    entry = self.backend.get(key)
+                except sqlite3.Error as e:
+                    print(f"LLM cache read failed: {e}")
+                    entry = None
+                if entry:
+                    self._remember(key, entry)
+            if entry is None:
+                return None
+            text, latency, created = entry
+            if ttl and now - created > ttl:
+                self._memory.pop(key, None)
+                if self.backend is not None:
+                    self.backend.delete(key)
+                return None
+            self._memory.move_to_end(key)
+            return text, latency
+
+    def set(self, key, model_name, text, latency):
+        created = time.time()
+        with self._lock:
+            self._remember(key, (text, latency, created))
+            if self.backend is not None:
+                try:
+                    self.backend.set(key, model_name, text, latency, created)
+                except sqlite3.Error as e:
+                    print(f"LLM cache write failed: {e}")
+
+    def _remember(self, key, entry):
+        self._memory[key] = tuple(entry)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, model_name, prompt, params=None, ttl=None):
+        """キャッシュ済みのテキストを返す（無ければ None）。ヒット/ミスを記録する"""
+        cached = self.get(cache_key(model_name, prompt, params), ttl=ttl)
+        with self._lock:
+            if cached is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["hits"] += 1
+            self.counters["saved_seconds"] += cached[1] or 0.0
+        return cached[0]
+
+    def store(self, model_name, prompt, text, latency, params=None):
+        if text:
+            self.set(cache_key(model_name, prompt, params), model_name, text, latency)
+
+    def fetch(self, model_name, prompt, invoke, params=None, use_cache=True, ttl=None):
+        """
+        キャッシュにあればそれを返し、無ければ invoke() を呼んで結果（テキスト）を保存する。
+        use_cache=False の場合はキャッシュを読み書きしない（常に最新が必要な呼び出し用）。
+        """
+        if not use_cache:
+            with self._lock:
+                self.counters["bypassed"] += 1
+            return invoke()
+
+        cached = self.lookup(model_name, prompt, params=params, ttl=ttl)
+        if cached is not None:
+            return cached
+
+        started = time.monotonic()
+        text = invoke()
+        self.store(model_name, prompt, text, time.monotonic() - started, params=params)
+        return text
+
+    def stats(self):
+        with self._lock:
+            result = dict(self.counters)
+            result["memory_entries"] = len(self._memory)
+        lookups = result["hits"] + result["misses"]
+        result["hit_rate"] = round(result["hits"] / lookups, 4) if lookups else 0.0
+        result["saved_seconds"] = round(result["saved_seconds"], 3)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.backend is not None:
+                self.backend.clear()
+
+
+_cache = None
+
+
+def get_llm_cache():
+    """プロセス共有のキャッシュインスタンスを返す"""
+    global _cache
+    if _cache is None:
+        _cache = LLMCache(backend=SQLiteBackend())
+    return _cache
+
+
+def model_name_of(model):
+    return getattr(model, 'model_name', None) or type(model).__name__
+
+
+def cached_generate(model, prompt, use_cache=True, ttl=None, invoke=None, **params):
+    """
+    model.generate_content(prompt, **params) の結果テキストをキャッシュ付きで返す。
+    invoke を渡すと実際の呼び出し（リトライ込みなど）を差し替えられる。
+    """
+    if invoke is None:
+        def invoke():
+            return model.generate_content(prompt, **params).text
+    return get_llm_cache().fetch(
+        model_name_of(model), prompt, invoke, params=params, use_cache=use_cache, ttl=ttl
+    )
@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import deque
+
+QUANTILES = (0.5, 0.95, 0.99)
+# パーセンタイルは直近 WINDOW 件から計算する
+WINDOW = 1024
+
+# MOCHI_JSON_LOGS=1 でリクエスト・LLM呼び出しごとに1行のJSONを標準エラーに出す
+JSON_LOGS = os.environ.get("MOCHI_JSON_LOGS", "").lower() in ("1", "true", "yes")
+
+# 現在のリクエストで計測したフェーズごとの秒数（JSONログ用）
+_current_phases = contextvars.ContextVar("mochi_phases", default=None)
+
+
+class Summary:
+    """件数・合計と、直近 WINDOW 件のパーセンタイル"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=WINDOW)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class MetricsRegistry:
+    """
+    プロセス内のメトリクス（外部サービス不要）。
+    render_prometheus() で Prometheus のテキスト形式、snapshot() で JSON 向けの dict を返す。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}   # (名前, ラベル) -> 値
+        self.summaries = {}  # (名前, ラベル) -> Summary
+        self.help = {}
+
+    def _labels(self, labels):
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, value=1, help=None, **labels):
+        with self._lock:
+            key = (name, self._labels(labels))
+            self.counters[key] = self.counters.get(key, 0) + value
+            if help:
+                self.help.setdefault(name, help)
+
+    def observe(self, name, value, help=None, **labels):
+        with self._lock:
+            key = (name, self._labels(labels))
+            if key not in self.summaries:
+                self.summaries[key] = Summary()
+            self.summaries[key].observe(value)
+            if help:
+                self.help.setdefault(name, help)
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            names = sorted({name for name, _ in self.counters} | {name for name, _ in self.summaries})
+            for name in names:
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                counters = [(labels, v) for (n, labels), v in sorted(self.counters.items()) if n == name]
+                if counters:
+                    lines.append(f"# TYPE {name} counter")
+                    for labels, value in counters:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+                lines.append(f"# TYPE {name} summary")
+                for (n, labels), summary in sorted(self.summaries.items()):
+                    if n != name:
+                        continue
+                    for q in QUANTILES:
+                        value = summary.quantile(q)
+                        quantile_labels = labels + (("quantile", str(q)),)
+                        lines.append(f"{name}{_format_labels(quantile_labels)} {_format_value(value)}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(summary.total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {summary.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """p50/p95/p99 などを JSON にしやすい形で返す"""
+        with self._lock:
+            result = {"counters": {}, "summaries": {}}
+            for (name, labels), value in sorted(self.counters.items()):
+                result["counters"].setdefault(name, []).append({"labels": dict(labels), "value": value})
+            for (name, labels), summary in sorted(self.summaries.items()):
+                entry = {"labels": dict(labels), "count": summary.count, "sum": round(summary.total, 6)}
+                for q in QUANTILES:
+                    value = summary.quantile(q)
+                    entry[f"p{int(q * 100)}"] = round(value, 6) if value is not None else None
+                result["summaries"].setdefault(name, []).append(entry)
+            return result
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.summaries.clear()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    if value is None:
+        return "NaN"
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+
+
+def log_event(event, **fields):
+    """構造化ログ（MOCHI_JSON_LOGS が有効な場合のみ）"""
+    if not JSON_LOGS:
+        return
+    record = {"ts": round(time.time(), 3), "event": event, **fields}
+    print(json.dumps(record, ensure_ascii=False, default=str), file=sys.stderr, flush=True)
+
+
+# --- HTTP リクエスト ---
+
+def start_request():
+    """リクエスト開始時に呼ぶ。フェーズ計測の入れ物を用意する"""
+    phases = {}
+    _current_phases.set(phases)
+    return phases
+
+
+def record_request(endpoint, method, status, seconds, phases=None):
+    registry.inc("mochi_http_requests_total", help="HTTP requests",
+                 endpoint=endpoint, method=method, status=status)
+    registry.observe("mochi_http_request_duration_seconds", seconds,
+                     help="HTTP request latency (streaming responses until the stream closes)", endpoint=endpoint)
+    log_event("http_request", endpoint=endpoint, method=method, status=status,
+              seconds=round(seconds, 4), phases={k: round(v, 4) for k, v in (phases or {}).items()})
+
+
+@contextmanager
+def phase(name):
+    """処理の内訳（記事のパース、アーカイブの I/O など）を計測する"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe("mochi_phase_duration_seconds", elapsed,
+                         help="Time spent per processing phase", phase=name)
+        phases = _current_phases.get()
+        if phases is not None:
+            phases[name] = phases.get(name, 0.0) + elapsed
+
+
+# --- LLM 呼び出し ---
+
+def usage_tokens(response):
+    """応答の usage_metadata から (プロンプト, 応答) のトークン数を取る（無ければ None）"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None, None
+    return getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None)
+
+
+def record_llm_call(model, seconds, prompt_tokens=None, response_tokens=None, retries=0, outcome="ok"):
+    """
+    generate_content 1回分を記録する。
+    outcome は ok / rate_limited / error、retries はこの呼び出しまでに失敗した回数。
+    """
+    registry.inc("mochi_llm_calls_total", help="LLM generate_content calls", model=model, outcome=outcome)
+    registry.observe("mochi_llm_call_duration_seconds", seconds, help="LLM call latency", model=model)
+    if prompt_tokens:
+        registry.inc("mochi_llm_tokens_total", prompt_tokens, help="LLM tokens", model=model, kind="prompt")
+    if response_tokens:
+        registry.inc("mochi_llm_tokens_total", response_tokens, help="LLM tokens", model=model, kind="response")
+    if retries:
+        registry.inc("mochi_llm_retries_total", retries, help="Failed attempts before this call", model=model)
+    log_event("llm_call", model=model, seconds=round(seconds, 4), prompt_tokens=prompt_tokens,
+              response_tokens=response_tokens, retries=retries, outcome=outcome)
+
+
+def record_backoff_retry(reason="rate_limited"):
+    registry.inc("mochi_llm_backoff_retries_total", help="Retries after exponential backoff", reason=reason)
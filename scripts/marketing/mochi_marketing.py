@@ -0,0 +1,204 @@
+"""
+マーケティング用スクリプトの共通エントリポイント
+
+    mochi-marketing list                       # 記事一覧と解析状況
+    mochi-marketing archive -q "エージェント"   # ニュースアーカイブの検索
+    mochi-marketing archive --compact          # 過去の月のログを封印・統合する（archive_log.py）
+    mochi-marketing analyze blog/articles/foo.html
+    mochi-marketing batch --workers 4 --pack   # batch_analyze.py と同じオプション
+    mochi-marketing curate --topic "ロボティクス"
+    mochi-marketing history "枢軸時代" "ソクラテス、孔子" --round 3
+    mochi-marketing history --plan session-03.json --workers 3   # 複数の時代を並列に（中断しても再開できる）
+
+（pip install -e scripts/marketing でコマンドが入る。python scripts/marketing/mochi_marketing.py でも同じ）
+
+起動を速くするため、このモジュールでは argparse 以外を読み込まない。
+各サブコマンドは必要になった時点で自分の依存（SDK・BeautifulSoup・SQLite のストア）を読み込む。
+LLM クライアントは model_router.get_router() でプロセス内の1つを共有する。
+"""
+import os
+import sys
+import argparse
+
+# 自身のディレクトリをパスに追加して utils などを読み込めるようにする（インストール時は不要）
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+ARTICLES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'blog', 'articles'))
+
+
+def _print_json(data):
+    import json
+    print(json.dumps(data, ensure_ascii=False, indent=2))
+
+
+def cmd_list(args):
+    """記事の一覧（解析済みかどうか）。記事キャッシュが効いていれば HTML はパースしない"""
+    from utils import list_articles
+    articles = list_articles(args.dir)
+    if args.analyzed:
+        articles = [a for a in articles if a["is_analyzed"]]
+    elif args.pending:
+        articles = [a for a in articles if not a["is_analyzed"]]
+    if args.json:
+        _print_json(articles)
+        return 0
+    for article in articles:
+        mark = "✅" if article["is_analyzed"] else "  "
+        print(f"{mark} {os.path.basename(article['path'])}  {article['title']}")
+    analyzed = sum(1 for a in articles if a["is_analyzed"])
+    print(f"\n{len(articles)} 件（解析済み {analyzed} 件）")
+    return 0
+
+
+def cmd_archive(args):
+    """ニュースアーカイブを新しい順に表示・検索する"""
+    if args.compact or args.verify:
+        import archive_log
+        return archive_log.main(["compact" if args.compact else "verify"])
+    from news_archive import get_news_archive
+    items, next_cursor = get_news_archive().search(
+        q=args.query, date_from=args.date_from, date_to=args.date_to, source=args.source,
+        cursor=args.cursor, limit=args.limit
+    )
+    if args.json:
+        _print_json({"archive": items, "next_cursor": next_cursor})
+        return 0
+    for item in items:
+        summary = " ".join((item.get("summary") or "").split())
+        print(f"[{item['id']}] {item.get('timestamp', '')}  {summary[:80]}")
+        if item.get("source"):
+            print(f"      {item['source']}")
+    if next_cursor:
+        print(f"\n続き: --cursor {next_cursor}")
+    return 0
+
+
+def cmd_analyze(args):
+    """1記事を解析して3パターンを保存する"""
+    from bot_gen import generate_tweets
+    patterns = generate_tweets(args.path, verbose=not args.quiet, use_cache=not args.no_cache)
+    return 0 if patterns else 1
+
+
+def cmd_batch(args):
+    """全記事の一括解析（オプションは batch_analyze.py と同じ）"""
+    import batch_analyze
+    batch_analyze.main(args.batch_args)
+    return 0
+
+
+def cmd_curate(args):
+    """最新のAIニュースをキュレートしてアーカイブに保存する"""
+    from news_curator import fetch_and_curate_news
+    result = fetch_and_curate_news(custom_topic=args.topic)
+    if not result:
+        return 1
+    if isinstance(result, dict):
+        for key in ("summary", "source", "analysis", "commentary"):
+            print(f"[{key.upper()}]\n{result.get(key, '')}\n")
+    else:
+        print(result)
+    return 0
+
+
+def cmd_history(args):
+    """歴史記事（HTML）を生成する。--plan なら月次セッションの全時代を blog/history/ に書き込む"""
+    if args.plan:
+        from history_generator import load_plan, generate_session
+        try:
+            eras = load_plan(args.plan)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+        results = generate_session(eras, workers=args.workers, rpm=args.rpm, force=args.force)
+        if results is None:
+            return 1
+        return 1 if any(status != "成功" for _, status, _, _ in results) else 0
+    if not (args.era and args.topics):
+        print("Error: era と topics（または --plan）を指定してください")
+        return 2
+    from history_generator import generate_history_article, render_page
+    content = generate_history_article(
+        args.era, args.topics, focus_philosophy=not args.no_philosophy, session_round=args.round
+    )
+    if content.startswith("Error"):
+        print(content)
+        return 1
+    if args.output:
+        # blog/history/ に置けるよう、既存の歴史記事と同じ枠に埋め込む
+        slug = os.path.splitext(os.path.basename(args.output))[0]
+        content = render_page(content, {"slug": slug, "era": args.era})
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(content)
+        print(f"保存しました: {args.output}")
+    else:
+        print(content)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="mochi-marketing", description="もちスララボのマーケティング用ツール")
+    sub = parser.add_subparsers(dest="command", metavar="<command>")
+    sub.required = True
+
+    p = sub.add_parser("list", help="記事の一覧と解析状況")
+    p.add_argument("--dir", default=ARTICLES_DIR, help="記事のディレクトリ")
+    p.add_argument("--json", action="store_true", help="JSON で出力する")
+    group = p.add_mutually_exclusive_group()
+    group.add_argument("--analyzed", action="store_true", help="解析済みの記事だけ")
+    group.add_argument("--pending", action="store_true", help="未解析の記事だけ")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("archive", help="ニュースアーカイブの表示・検索")
+    p.add_argument("-q", "--query", help="キーワード")
+    p.add_argument("--from", dest="date_from", help="YYYY-MM-DD 以降")
+    p.add_argument("--to", dest="date_to", help="YYYY-MM-DD 以前")
+    p.add_argument("--source", help="ソースの部分一致")
+    p.add_argument("--cursor", type=int, help="前回の続きから表示する")
+    p.add_argument("-n", "--limit", type=int, default=20, help="表示件数")
+    p.add_argument("--json", action="store_true", help="JSON で出力する")
+    group = p.add_mutually_exclusive_group()
+    group.add_argument("--compact", action="store_true", help="過去の月のログセグメントを封印・統合する")
+    group.add_argument("--verify", action="store_true", help="ログセグメントを検査する")
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser("analyze", help="1記事を解析する")
+    p.add_argument("path", help="記事のHTMLパス")
+    p.add_argument("--no-cache", action="store_true", help="LLM 応答キャッシュを使わない")
+    p.add_argument("--quiet", action="store_true", help="生成結果を表示しない")
+    p.set_defaults(func=cmd_analyze)
+
+    p = sub.add_parser("batch", help="全記事を一括解析する（batch_analyze.py のオプションをそのまま渡す）",
+                       add_help=False)
+    p.add_argument("batch_args", nargs=argparse.REMAINDER)
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser("curate", help="最新のAIニュースをキュレートする")
+    p.add_argument("--topic", help="調査するトピック")
+    p.set_defaults(func=cmd_curate)
+
+    p = sub.add_parser("history", help="歴史記事を生成する")
+    p.add_argument("era", nargs="?", help="時代・トピック")
+    p.add_argument("topics", nargs="?", help="キーワード")
+    p.add_argument("--round", type=int, help="月次セッションの回数")
+    p.add_argument("--no-philosophy", action="store_true", help="哲学特化の指示を付けない")
+    p.add_argument("-o", "--output", help="保存先（省略時は標準出力）")
+    p.add_argument("--plan", help="月次セッションの計画ファイル（JSON。history_generator.py の説明を参照）")
+    p.add_argument("--workers", type=int, default=3, help="--plan: 同時に生成する時代の数")
+    p.add_argument("--rpm", type=int, default=10, help="--plan: 1分あたりの最大リクエスト数")
+    p.add_argument("--force", action="store_true", help="--plan: 生成済みの時代も生成し直す")
+    p.set_defaults(func=cmd_history)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # batch の引数（--help を含む）はそのまま batch_analyze に渡す
+    if argv[:1] == ["batch"]:
+        return cmd_batch(argparse.Namespace(batch_args=argv[1:]))
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
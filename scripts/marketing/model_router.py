@@ -0,0 +1,345 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from rate_limit import is_rate_limit_error, estimate_tokens
+import metrics
+
+# 優先順（先頭ほど優先）
+DEFAULT_MODELS = ['gemini-2.5-flash', 'gemini-1.5-flash', 'gemini-1.5-pro']
+
+# モデルごとの (入力, 出力) トークン上限。一覧に無いモデルは DEFAULT_LIMITS とみなす
+MODEL_LIMITS = {
+    'gemini-2.5-flash': (1048576, 65536),
+    'gemini-1.5-flash': (1048576, 8192),
+    'gemini-1.5-pro': (2097152, 8192),
+}
+DEFAULT_LIMITS = (32768, 8192)
+
+
+class ModelUnavailableError(Exception):
+    """全モデルが制限中・失敗した場合のエラー（最後のエラーが 429 ならメッセージに含まれる）"""
+
+
+class RoutedResponse:
+    def __init__(self, text, model_used):
+        self.text = text
+        self.model_used = model_used
+
+
+class ModelStats:
+    """直近 window 件のレイテンシと成否"""
+
+    def __init__(self, window=50):
+        self.samples = deque(maxlen=window)
+
+    def record(self, latency, ok):
+        self.samples.append((latency, ok))
+
+    def percentile(self, q):
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(q * (len(latencies) - 1))))
+        return latencies[index]
+
+    def error_rate(self):
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def successes(self):
+        return sum(1 for _, ok in self.samples if ok)
+
+
+class CircuitBreaker:
+    """
+    レート制限を受けたモデルを一定時間外す。
+    closed → (429) → open → (cooldown 経過) → half_open で1件だけ試す → 成功で closed / 失敗で再 open（待ち時間は倍）
+    """
+
+    def __init__(self, cooldown=30.0, max_cooldown=600.0, clock=time.monotonic):
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = "closed"
+        self.open_until = 0.0
+        self.probing = False
+
+    def available(self):
+        """送信候補になり得るか（状態は変えない）"""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            return self.clock() >= self.open_until
+        return not self.probing
+
+    def allow(self):
+        """実際に送る直前に呼ぶ。送ってよいか（half_open では1件だけ許可）"""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and self.clock() >= self.open_until:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.cooldown = self.base_cooldown
+        self.probing = False
+
+    def trip(self):
+        if self.state == "half_open":
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+        self.state = "open"
+        self.open_until = self.clock() + self.cooldown
+        self.probing = False
+
+    def release(self):
+        """half_open の試行がレート制限以外で終わった場合は次の試行を許す"""
+        self.probing = False
+
+
+class ModelRouter:
+    """
+    複数モデルへの振り分け。
+
+    - モデルごとに直近のレイテンシ/エラー率を保持
+    - 429 を受けたモデルはサーキットブレーカーで一定時間スキップ（half_open で復帰を確認）
+    - hedge=True の場合、優先モデルが自身の p95 を超えても返ってこなければ次のモデルにも同時に投げ、
+      先に返ってきた方を使う
+    generate_content() を持つので GenerativeModel の代わりにそのまま渡せる。
+    """
+
+    def __init__(self, models=None, backend_factory=None, hedge=False, hedge_quantile=0.95,
+                 hedge_min_samples=5, cooldown=30.0, clock=time.monotonic):
+        self.models = list(models or DEFAULT_MODELS)
+        self.model_name = "router:" + ",".join(self.models)
+        self.backend_factory = backend_factory or _genai_backend
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.clock = clock
+        self.stats_by_model = {name: ModelStats() for name in self.models}
+        self.breakers = {name: CircuitBreaker(cooldown=cooldown, clock=clock) for name in self.models}
+        self._backends = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="model-router") if hedge else None
+
+    def backend(self, name):
+        """モデル名に対応するクライアント（使い回す）"""
+        with self._lock:
+            if name not in self._backends:
+                self._backends[name] = self.backend_factory(name)
+            return self._backends[name]
+
+    def candidates(self):
+        """今リクエストを送れそうなモデルを優先順に返す"""
+        with self._lock:
+            return [name for name in self.models if self.breakers[name].available()]
+
+    def _acquire(self, name):
+        with self._lock:
+            return self.breakers[name].allow()
+
+    def record_success(self, name, latency):
+        with self._lock:
+            self.stats_by_model[name].record(latency, True)
+            self.breakers[name].record_success()
+
+    def record_failure(self, name, latency, error):
+        with self._lock:
+            self.stats_by_model[name].record(latency, False)
+            if is_rate_limit_error(error):
+                self.breakers[name].trip()
+            else:
+                self.breakers[name].release()
+
+    def _call(self, name, contents, params, retries=0):
+        started = self.clock()
+        try:
+            with metrics.phase("llm"):
+                response = self.backend(name).generate_content(contents, **params)
+                text = response.text
+        except Exception as e:
+            elapsed = self.clock() - started
+            self.record_failure(name, elapsed, e)
+            _record_call(name, elapsed, contents, None, None, retries, e)
+            raise
+        elapsed = self.clock() - started
+        self.record_success(name, elapsed)
+        _record_call(name, elapsed, contents, response, text, retries)
+        return text
+
+    def _hedge_delay(self, name):
+        stats = self.stats_by_model[name]
+        if stats.successes() < self.hedge_min_samples:
+            return None
+        return stats.percentile(self.hedge_quantile)
+
+    def generate_content(self, contents, **params):
+        """候補モデルを順に試し、RoutedResponse を返す"""
+        candidates = self.candidates()
+        last_error = None
+        failures = 0
+        while candidates:
+            name = candidates.pop(0)
+            if not self._acquire(name):
+                continue
+            delay = self._hedge_delay(name) if self.hedge and candidates else None
+            try:
+                if delay is None:
+                    return RoutedResponse(self._call(name, contents, params, failures), name)
+                return self._hedged(name, candidates, delay, contents, params, failures)
+            except Exception as e:
+                failures += 1
+                last_error = e
+                print(f"Error with {name}: {e}")
+                if not is_rate_limit_error(e):
+                    raise
+        if last_error is None:
+            raise ModelUnavailableError("429: 全てのモデルがレート制限で一時停止中です")
+        raise ModelUnavailableError(f"全てのモデルで制限に達しました。 (Last Error: {last_error})") from last_error
+
+    def _hedged(self, primary, candidates, delay, contents, params, retries=0):
+        primary_future = self._pool.submit(self._call, primary, contents, params, retries)
+        done, _ = wait([primary_future], timeout=delay)
+        if done:
+            return RoutedResponse(primary_future.result(), primary)
+
+        # 優先モデルが p95 を超えたので次のモデルにも投げる
+        secondary = candidates.pop(0)
+        if not self._acquire(secondary):
+            return RoutedResponse(primary_future.result(), primary)
+        print(f"Hedging: {primary} が {delay:.1f}s を超えたため {secondary} にも送信")
+        futures = {
+            primary_future: primary,
+            self._pool.submit(self._call, secondary, contents, params, retries): secondary
+        }
+        pending = set(futures)
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return RoutedResponse(future.result(), futures[future])
+                except Exception as e:
+                    last_error = e
+        raise last_error
+
+    def stream(self, contents, **params):
+        """
+        ストリーミング生成。(モデル名, テキストのチャンク) を順に返す。
+        最初のチャンクが届く前の 429 は次のモデルに切り替える。
+        """
+        from streaming import iter_stream_text
+
+        last_error = None
+        failures = 0
+        for name in self.candidates():
+            if not self._acquire(name):
+                continue
+            started = self.clock()
+            sent = False
+            recorded = False
+            chunks = []
+            try:
+                response = self.backend(name).generate_content(contents, stream=True, **params)
+                for chunk in iter_stream_text(response):
+                    sent = True
+                    chunks.append(chunk)
+                    yield name, chunk
+            except Exception as e:
+                recorded = True
+                elapsed = self.clock() - started
+                self.record_failure(name, elapsed, e)
+                _record_call(name, elapsed, contents, None, "".join(chunks), failures, e)
+                failures += 1
+                last_error = e
+                print(f"Error with {name}: {e}")
+                if sent or not is_rate_limit_error(e):
+                    raise
+                continue
+            else:
+                recorded = True
+                elapsed = self.clock() - started
+                self.record_success(name, elapsed)
+                _record_call(name, elapsed, contents, response, "".join(chunks), failures)
+                return
+            finally:
+                # クライアントの切断で GeneratorExit が投げられた場合など、成否を記録せずに終わったら
+                # half_open の試行枠を返す（返さないとこのモデルが二度と選ばれなくなる）
+                if not recorded:
+                    with self._lock:
+                        self.breakers[name].release()
+        raise ModelUnavailableError(f"全てのモデルで制限に達しました。 (Last Error: {last_error})")
+
+    def stats(self):
+        with self._lock:
+            result = {}
+            for name in self.models:
+                stats = self.stats_by_model[name]
+                breaker = self.breakers[name]
+                result[name] = {
+                    "state": breaker.state,
+                    "samples": len(stats.samples),
+                    "error_rate": round(stats.error_rate(), 3),
+                    "p50": stats.percentile(0.5),
+                    "p95": stats.percentile(0.95),
+                }
+            return result
+
+
+def _record_call(name, seconds, contents, response, text, retries, error=None):
+    """メトリクスに1回分の呼び出しを記録する（usage_metadata が無ければトークン数は概算）"""
+    prompt_tokens, response_tokens = metrics.usage_tokens(response)
+    if prompt_tokens is None:
+        prompt = "\n".join(contents) if isinstance(contents, (list, tuple)) else str(contents)
+        prompt_tokens = estimate_tokens(prompt)
+    if response_tokens is None and text:
+        response_tokens = estimate_tokens(text)
+    if error is None:
+        outcome = "ok"
+    else:
+        outcome = "rate_limited" if is_rate_limit_error(error) else "error"
+    metrics.record_llm_call(name, seconds, prompt_tokens, response_tokens, retries, outcome)
+
+
+def model_limits(model):
+    """
+    model（モデル名・ルーター・モデルオブジェクト）の (入力, 出力) トークン上限。
+    ルーターは切り替え先のどのモデルでも収まるよう、全モデルの最小値を返す
+    """
+    names = getattr(model, "models", None) or [model if isinstance(model, str) else getattr(model, "model_name", "")]
+    limits = [MODEL_LIMITS.get(str(name).replace("models/", ""), DEFAULT_LIMITS) for name in names]
+    return min(limit[0] for limit in limits), min(limit[1] for limit in limits)
+
+
+_configured = False
+
+
+def _genai_backend(name):
+    """google.generativeai のモデルを作る（configure はプロセスで1回だけ）"""
+    global _configured
+    import google.generativeai as genai
+    if not _configured:
+        genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
+        _configured = True
+    return genai.GenerativeModel(name)
+
+
+_router = None
+
+
+def get_router():
+    """プロセス共有のルーター（bot_gen / ui/app.py / news_curator / history_generator で共用）"""
+    global _router
+    if _router is None:
+        hedge = os.environ.get("MOCHI_HEDGE_REQUESTS", "").lower() in ("1", "true", "yes")
+        _router = ModelRouter(hedge=hedge)
+    return _router
@@ -0,0 +1,366 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+
+import metrics
+from metrics import phase
+from archive_log import ArchiveLog, ARCHIVE_LOG_DIR
+from near_duplicates import (
+    signature, similarity, band_buckets, pack, unpack,
+    SIGNATURE_VERSION, DUPLICATE_THRESHOLD, RELATED_THRESHOLD,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DB = os.path.join(BASE_DIR, 'data', 'news_archive.db')
+# 旧形式のアーカイブ（ログが空なら移行する。ログを使わない場合は内容が変わっていれば取り込み直す）
+ARCHIVE_JSON = os.path.join(BASE_DIR, 'news_archive.json')
+
+FIELDS = ("timestamp", "analysis", "summary", "source", "commentary")
+
+
+def dedupe_hash(summary):
+    """重複判定用のハッシュ（従来どおり summary の先頭50文字で判定）"""
+    return hashlib.sha1((summary or "")[:50].encode('utf-8')).hexdigest()
+
+
+class NewsArchive:
+    """
+    調査レポートのアーカイブ (SQLite + FTS5)。
+
+    - 正本は追記専用のログ（archive_log.py の news_log/）。SQLite はログから作り直せる索引で、
+      開くときにログの前回位置より後ろの行を取り込む（追記後・コミット前に落ちた場合もここで追いつく）
+    - 重複チェックはハッシュ列の UNIQUE 制約で O(1)
+    - 言い換えた重複は summary の MinHash 署名と LSH バケット（report_lsh）で候補だけを比較する
+    - 全文検索は trigram トークナイザ（日本語でも部分一致できる）
+    - 一覧は id をカーソルにしたページング
+    """
+
+    def __init__(self, db_path=ARCHIVE_DB, legacy_json=ARCHIVE_JSON, log_dir=ARCHIVE_LOG_DIR):
+        self.db_path = db_path
+        self.legacy_json = legacy_json
+        # log_dir=None ならログを使わない（SQLite だけ）
+        self.log = ArchiveLog(log_dir) if log_dir else None
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            with self._init_lock:
+                if not self._initialized:
+                    self._init_schema(conn)
+                    self._build_similarity_index(conn)
+                    self._import_legacy_json(conn)
+                    self._sync_from_log(conn)
+                    self._initialized = True
+        return conn
+
+    def _init_schema(self, conn):
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS reports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                analysis TEXT,
+                summary TEXT,
+                source TEXT,
+                commentary TEXT,
+                dedupe_hash TEXT NOT NULL UNIQUE
+            );
+            CREATE INDEX IF NOT EXISTS idx_reports_timestamp ON reports(timestamp);
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+                analysis, summary, source, commentary,
+                content='reports', content_rowid='id', tokenize='trigram'
+            );
+            CREATE TRIGGER IF NOT EXISTS reports_ai AFTER INSERT ON reports BEGIN
+                INSERT INTO reports_fts(rowid, analysis, summary, source, commentary)
+                VALUES (new.id, new.analysis, new.summary, new.source, new.commentary);
+            END;
+            CREATE TRIGGER IF NOT EXISTS reports_ad AFTER DELETE ON reports BEGIN
+                INSERT INTO reports_fts(reports_fts, rowid, analysis, summary, source, commentary)
+                VALUES ('delete', old.id, old.analysis, old.summary, old.source, old.commentary);
+            END;
+
+            CREATE TABLE IF NOT EXISTS report_signatures (id INTEGER PRIMARY KEY, signature BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS report_lsh (bucket INTEGER NOT NULL, id INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS idx_report_lsh_bucket ON report_lsh(bucket);
+            CREATE INDEX IF NOT EXISTS idx_report_lsh_id ON report_lsh(id);
+            CREATE TRIGGER IF NOT EXISTS reports_ad_lsh AFTER DELETE ON reports BEGIN
+                DELETE FROM report_signatures WHERE id = old.id;
+                DELETE FROM report_lsh WHERE id = old.id;
+            END;
+
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        conn.commit()
+
+    def _import_legacy_json(self, conn):
+        if not self.legacy_json or not os.path.exists(self.legacy_json):
+            return
+        st = os.stat(self.legacy_json)
+        signature = f"{st.st_mtime_ns}:{st.st_size}"
+        row = conn.execute("SELECT value FROM meta WHERE key = 'legacy_json'").fetchone()
+        if row and row[0] == signature:
+            return
+        try:
+            with open(self.legacy_json, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Failed to read {self.legacy_json} for import: {e}")
+            return
+        if self.log:
+            # ログに移行すれば _sync_from_log で索引に入る
+            with phase("archive_io"):
+                migrated = self.log.migrate_json(self.legacy_json)
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('legacy_json', ?)", (signature,))
+            if migrated:
+                print(f"Migrated {migrated} reports from {os.path.basename(self.legacy_json)} to the archive log")
+            return
+        with conn:
+            inserted = sum(self._insert(conn, item) for item in legacy)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('legacy_json', ?)", (signature,))
+        if inserted:
+            print(f"Imported {inserted} reports from {os.path.basename(self.legacy_json)}")
+
+    def _sync_from_log(self, conn):
+        """ログの前回位置より後ろの行を索引に取り込む"""
+        if not self.log:
+            return
+        with phase("archive_io"), conn:
+            first_sync = conn.execute("SELECT 1 FROM meta WHERE key = 'log_position'").fetchone() is None
+            if first_sync:
+                self._export_to_log(conn)
+            inserted = self._replay_log(conn)
+        if inserted:
+            print(f"Indexed {inserted} reports from the archive log")
+
+    def _export_to_log(self, conn):
+        """ログを使う前から SQLite にだけあったレポートをログに書き出す（初回だけ）"""
+        logged = {dedupe_hash(entry.get("summary")) for entry in self.log}
+        rows = [
+            _to_dict(row) for row in conn.execute("SELECT * FROM reports ORDER BY timestamp, id")
+            if row["dedupe_hash"] not in logged
+        ]
+        if rows:
+            self.log.append_many([{field: item[field] for field in FIELDS} for item in rows])
+            print(f"Exported {len(rows)} reports to the archive log")
+
+    def _replay_log(self, conn):
+        """
+        前回位置より後ろのログを挿入し、位置を進める（トランザクションは呼び出し側）。
+        compact でセグメントが組み替えられた（generation が変わった）ときは先頭から照合する（重複は UNIQUE で無視）
+        """
+        generation = self.log.manifest().get("generation", 0)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'log_position'").fetchone()
+        position = json.loads(row[0]) if row else {}
+        if position.get("generation") == generation and position.get("segment"):
+            records = self.log.iter_from(position["segment"], position.get("offset", 0))
+        else:
+            records = self.log.iter_from()
+        inserted = 0
+        last = None
+        for name, offset, entry in records:
+            inserted += self._insert(conn, entry)
+            last = (name, offset)
+        if last or position.get("generation") != generation:
+            self._save_log_position(conn, *(last or (position.get("segment"), position.get("offset", 0))), generation=generation)
+        return inserted
+
+    def _save_log_position(self, conn, segment, offset, generation=None):
+        if generation is None:
+            generation = self.log.manifest().get("generation", 0)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('log_position', ?)",
+            (json.dumps({"generation": generation, "segment": segment, "offset": offset}),)
+        )
+
+    def _build_similarity_index(self, conn):
+        """署名の無いレポート（既存のアーカイブ・署名の版が変わった場合は全件）を索引に入れる"""
+        row = conn.execute("SELECT value FROM meta WHERE key = 'signature_version'").fetchone()
+        with conn:
+            if not row or row[0] != str(SIGNATURE_VERSION):
+                conn.execute("DELETE FROM report_signatures")
+                conn.execute("DELETE FROM report_lsh")
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('signature_version', ?)", (str(SIGNATURE_VERSION),))
+            rows = conn.execute(
+                "SELECT id, summary FROM reports WHERE id NOT IN (SELECT id FROM report_signatures)"
+            ).fetchall()
+            for report_id, summary in rows:
+                self._index_report(conn, report_id, summary)
+        if len(rows) > 1:
+            print(f"Indexed {len(rows)} reports for near-duplicate detection")
+
+    def _index_report(self, conn, report_id, summary):
+        sig = signature(summary)
+        if sig is None:
+            return
+        conn.execute("INSERT OR REPLACE INTO report_signatures VALUES (?, ?)", (report_id, pack(sig)))
+        conn.executemany("INSERT INTO report_lsh VALUES (?, ?)", [(bucket, report_id) for bucket in band_buckets(sig)])
+
+    def _insert(self, conn, entry):
+        values = [entry.get(field) for field in FIELDS]
+        if not values[0]:
+            values[0] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO reports (timestamp, analysis, summary, source, commentary, dedupe_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (*values, dedupe_hash(entry.get("summary")))
+        )
+        if cursor.rowcount:
+            self._index_report(conn, cursor.lastrowid, entry.get("summary"))
+        return cursor.rowcount
+
+    def add(self, entry, threshold=DUPLICATE_THRESHOLD):
+        """
+        レポートを追加する。重複していた場合は False。
+        summary が同じもの（先頭50文字）に加え、threshold 以上似ている言い換えも重複とみなす（None で無効）
+        """
+        if threshold is not None and self.find_duplicate(entry.get("summary"), threshold):
+            metrics.registry.inc("mochi_news_near_duplicates_total", help="Curated reports rejected as near-duplicates")
+            return False
+        record = {field: entry.get(field) for field in FIELDS}
+        if not record["timestamp"]:
+            record["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with phase("archive_io"):
+            conn = self._connect()
+            with conn:
+                if self.log:
+                    # 書き込みロックを先に取り、他のプロセスとログへの追記を直列にする。
+                    # 他のプロセスが追記後・コミット前に落ちていた場合はその行もここで取り込む
+                    conn.execute("BEGIN IMMEDIATE")
+                    self._replay_log(conn)
+                if not self._insert(conn, record):
+                    return False
+                if self.log:
+                    # ログへの追記（fsync 済み）が終わってからコミットする。
+                    # 追記に失敗すれば索引への挿入も取り消され、コミット前に落ちても次に開いたとき取り込まれる
+                    self._save_log_position(conn, *self.log.append(record))
+                return True
+
+    def find_similar(self, text, threshold=RELATED_THRESHOLD, limit=5):
+        """
+        text（summary）に似た過去のレポートを類似度の高い順に返す（各レポートに similarity を付ける）。
+        LSH バケットが一致した候補だけを比較するので、アーカイブの件数にほぼ依存しない
+        """
+        sig = signature(text)
+        if sig is None:
+            return []
+        buckets = band_buckets(sig)
+        with phase("archive_io"):
+            conn = self._connect()
+            rows = conn.execute(
+                f"SELECT id, signature FROM report_signatures WHERE id IN "
+                f"(SELECT id FROM report_lsh WHERE bucket IN ({', '.join('?' for _ in buckets)}))",
+                buckets
+            ).fetchall()
+            scored = sorted(
+                ((similarity(sig, unpack(blob)), report_id) for report_id, blob in rows), reverse=True
+            )
+            scored = [(score, report_id) for score, report_id in scored if score >= threshold][:limit]
+            if not scored:
+                return []
+            reports = {
+                row["id"]: row for row in conn.execute(
+                    f"SELECT * FROM reports WHERE id IN ({', '.join('?' for _ in scored)})",
+                    [report_id for _, report_id in scored]
+                )
+            }
+        results = []
+        for score, report_id in scored:
+            if report_id in reports:
+                item = _to_dict(reports[report_id])
+                item["similarity"] = round(score, 3)
+                results.append(item)
+        return results
+
+    def find_duplicate(self, summary, threshold=DUPLICATE_THRESHOLD):
+        """summary の言い換えとみなせる既存レポート（無ければ None）"""
+        similar = self.find_similar(summary, threshold=threshold, limit=1)
+        return similar[0] if similar else None
+
+    def exists(self, summary):
+        with phase("archive_io"):
+            return self._connect().execute(
+                "SELECT 1 FROM reports WHERE dedupe_hash = ?", (dedupe_hash(summary),)
+            ).fetchone() is not None
+
+    def recent(self, n=20):
+        """直近 n 件を古い順で返す"""
+        with phase("archive_io"):
+            rows = self._connect().execute(
+                "SELECT * FROM reports ORDER BY id DESC LIMIT ?", (n,)
+            ).fetchall()
+        return [_to_dict(row) for row in reversed(rows)]
+
+    def search(self, q=None, date_from=None, date_to=None, source=None, cursor=None, limit=20):
+        """
+        新しい順に検索する。戻り値は (レポートのリスト, 次ページのカーソル)。
+        date_from / date_to は 'YYYY-MM-DD'（両端を含む）。
+        """
+        where, params = [], []
+        join = ""
+        if q and q.strip():
+            q = q.strip()
+            if len(q) >= 3:
+                join = "JOIN reports_fts ON reports_fts.rowid = reports.id"
+                where.append("reports_fts MATCH ?")
+                params.append('"' + q.replace('"', '""') + '"')
+            else:
+                # trigram は3文字未満を扱えないので LIKE で代替
+                like = f"%{q}%"
+                where.append("(summary LIKE ? OR analysis LIKE ? OR commentary LIKE ? OR source LIKE ?)")
+                params.extend([like] * 4)
+        if date_from:
+            where.append("timestamp >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("timestamp <= ?")
+            params.append(date_to + " 23:59:59" if len(date_to) == 10 else date_to)
+        if source:
+            where.append("source LIKE ?")
+            params.append(f"%{source}%")
+        if cursor:
+            where.append("reports.id < ?")
+            params.append(int(cursor))
+
+        sql = f"SELECT reports.* FROM reports {join}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY reports.id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with phase("archive_io"):
+            rows = self._connect().execute(sql, params).fetchall()
+        items = [_to_dict(row) for row in rows[:limit]]
+        next_cursor = items[-1]["id"] if len(rows) > limit else None
+        return items, next_cursor
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+
+def _to_dict(row):
+    item = {field: row[field] for field in FIELDS}
+    item["id"] = row["id"]
+    return item
+
+
+_archive = None
+
+
+def get_news_archive():
+    """プロセス共有のアーカイブを返す"""
+    global _archive
+    if _archive is None:
+        _archive = NewsArchive()
+    return _archive
@@ -1,40 +1,59 @@
 import os
 import sys
-import google.generativeai as genai
+import re
+from datetime import datetime
 
 # Add parent directory to path to import utils
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-def fetch_and_curate_news(custom_topic=None):
+from llm_cache import cached_generate
+from news_archive import get_news_archive
+from model_router import get_router
+from job_queue import JobCancelled
+from near_duplicates import RELATED_THRESHOLD
+
+# 回避プロンプトに入れる既知トピックの数
+AVOID_TOPICS = 20
+# 既存レポートの言い換えが返ってきたときに生成し直す回数
+MAX_DUPLICATE_RETRIES = 1
+
+def select_avoid_topics(custom_topic=None, similar_to=None, limit=AVOID_TOPICS):
+    """
+    回避させる既知トピック（アーカイブのレポート）を選ぶ。次の順に limit 件まで埋める:
+    1. similar_to（重複と判定された下書きの summary）に似た過去レポート（MinHash の索引で類似度順）
+    2. トピック指定に似た過去レポート（同じ索引で類似度順。初回の生成から使う）
+    3. トピックの語を含むレポート（新しい順）
+    4. 直近のレポート
+    """
+    archive = get_news_archive()
+    selected = {}
+    for text in (similar_to, custom_topic):
+        if text and len(selected) < limit:
+            for item in archive.find_similar(text, threshold=RELATED_THRESHOLD, limit=limit):
+                selected.setdefault(item["id"], item)
+    if custom_topic and len(selected) < limit:
+        items, _ = archive.search(q=custom_topic, limit=limit)
+        for item in items:
+            selected.setdefault(item["id"], item)
+    if len(selected) < limit:
+        for item in reversed(archive.recent(limit)):
+            selected.setdefault(item["id"], item)
+    return list(selected.values())[:limit]
+
+def build_curation_prompt(custom_topic=None, avoid=None):
     """
-    最新のAIニュースを取得し、調査班のペルソナで要約・発信文を作成する
+    キュレーション用のプロンプト（generate_content に渡すリスト）を作る。
+    avoid は回避させる既知のレポート（省略時は select_avoid_topics(custom_topic)）
     """
     # --- 履歴・アーカイブ管理 ---
-    import json
-    from datetime import datetime
-    archive_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "news_archive.json")
-    archive = []
-    if os.path.exists(archive_path):
-        try:
-            with open(archive_path, "r", encoding="utf-8") as f:
-                archive = json.load(f)
-        except:
-            archive = []
-    
-    # 最近のタイトルを重複回避用に抽出
-    history_titles = [item.get("summary", "")[:50] for item in archive[-20:]]
+    if avoid is None:
+        avoid = select_avoid_topics(custom_topic)
+
+    # 既知のトピックを重複回避用に抽出
+    history_titles = [(item.get("summary") or "")[:50] for item in avoid]
     history_context = "\n".join([f"- {t}" for t in history_titles])
     history_instruction = f"\n【重要: 回避すべき既知のトピック】\n以下のトピックは既に調査済みです。これらとは異なる、新しい「事件（ネタ）」を独自に選定してください：\n{history_context}" if history_titles else ""
 
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        print("Error: GOOGLE_API_KEY environment variable is not set.")
-        return None
-
-    genai.configure(api_key=api_key)
-    # Gemini 2.5 Flash を使用
-    model = genai.GenerativeModel('gemini-2.5-flash')
-
     # 1. ニュースの検索とキュレーション
     # 検索範囲を「身体操作・セラピスト」に限定せず、AIの包括的なトレンド・経済・技術革新に広げる
     base_query = """
@@ -88,51 +107,99 @@ def fetch_and_curate_news(custom_topic=None):
     最後に必ず「観測完了。未来は、あなたの手のひらの中に。 もちスララボ｜調査班」を添えてください。
     """
 
+    return [prompt, f"今日の最新ニュースを検索して: {search_query}"]
+
+def extract(tag, text):
+    """タグによる解析（大文字小文字を区別しない）"""
+    match = re.search(f'<{tag}>(.*?)</{tag}>', text, re.DOTALL | re.IGNORECASE)
+    if match:
+        return match.group(1).strip()
+    # 簡易フォールバック
+    match = re.search(f'{tag}[:：](.*?)(?=\\n[A-Z]|\\n<|$)', text, re.DOTALL | re.IGNORECASE)
+    return match.group(1).strip() if match else ""
+
+def parse_curation(text):
+    """モデルの出力を4つのセクションに分解する"""
+    return {
+        "analysis": extract("Analysis", text),
+        "summary": extract("Summary", text),
+        "source": extract("Source", text),
+        "commentary": extract("Commentary", text),
+        "raw": text
+    }
+
+def archive_curation(results):
+    """アーカイブの保存 (詳細データをすべて保持)。保存できたら True（重複・失敗は False）"""
+    if not results["summary"]:
+        return False
     try:
-        response = model.generate_content([prompt, f"今日の最新ニュースを検索して: {search_query}"])
-        text = response.text
-        
-        # タグによる解析（大文字小文字を区別しない）
-        import re
-        def extract(tag, text):
-            match = re.search(f'<{tag}>(.*?)</{tag}>', text, re.DOTALL | re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-            # 簡易フォールバック
-            match = re.search(f'{tag}[:：](.*?)(?=\\n[A-Z]|\\n<|$)', text, re.DOTALL | re.IGNORECASE)
-            return match.group(1).strip() if match else ""
-
-        results = {
-            "analysis": extract("Analysis", text),
-            "summary": extract("Summary", text),
-            "source": extract("Source", text),
-            "commentary": extract("Commentary", text),
-            "raw": text
+        new_entry = {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "analysis": results["analysis"],
+            "summary": results["summary"],
+            "source": results["source"],
+            "commentary": results["commentary"]
         }
-        
-        # アーカイブの保存 (詳細データをすべて保持)
-        if results["summary"]:
-            try:
-                new_entry = {
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "analysis": results["analysis"],
-                    "summary": results["summary"],
-                    "source": results["source"],
-                    "commentary": results["commentary"]
-                }
-                # タイトル的な部分で重複チェック
-                if not any(item.get("summary", "")[:50] == results["summary"][:50] for item in archive):
-                    archive.append(new_entry)
-                    with open(archive_path, "w", encoding="utf-8") as f:
-                        json.dump(archive, f, ensure_ascii=False, indent=2)
-            except Exception as e:
-                print(f"Failed to save archive: {e}")
-
-        # 必須項目が欠けている場合のチェック
-        if not results["analysis"] and not results["summary"]:
-            return text
-        
+        # 完全一致はハッシュの一意制約、言い換えは MinHash の類似度で重複を判定
+        return get_news_archive().add(new_entry)
+    except Exception as e:
+        print(f"Failed to save archive: {e}")
+        return False
+
+def archive_unless_duplicate(results, custom_topic=None):
+    """
+    過去のレポートと重複していなければアーカイブに保存して None を返す。
+    重複していれば results に duplicate_of を付け、やり直し用の回避リスト（今回の下書きに似た過去トピックが先頭）を返す
+    """
+    duplicate = get_news_archive().find_duplicate(results["summary"])
+    if not duplicate:
+        archive_curation(results)
+        return None
+    print(f"既存のレポート（#{duplicate['id']}, 類似度 {duplicate['similarity']}）と重複しています")
+    results["duplicate_of"] = duplicate["id"]
+    return select_avoid_topics(custom_topic, similar_to=results["summary"])
+
+def create_model():
+    """共有のモデルルーターを返す（APIキーが無ければ None）"""
+    if not os.environ.get("GOOGLE_API_KEY"):
+        print("Error: GOOGLE_API_KEY environment variable is not set.")
+        return None
+
+    # Gemini 2.5 Flash を優先し、制限中は他のモデルへ回す
+    return get_router()
+
+def fetch_and_curate_news(custom_topic=None, check_cancelled=None):
+    """
+    最新のAIニュースを取得し、調査班のペルソナで要約・発信文を作成する。
+    check_cancelled を渡すと生成とアーカイブの前に呼ぶ（ジョブのキャンセルで JobCancelled を送出させる）
+    """
+    check_cancelled = check_cancelled or (lambda: None)
+    model = create_model()
+    if model is None:
+        return None
+
+    avoid = select_avoid_topics(custom_topic)
+
+    try:
+        for attempt in range(MAX_DUPLICATE_RETRIES + 1):
+            # ニュースは常に最新である必要があるためキャッシュしない
+            check_cancelled()
+            text = cached_generate(model, build_curation_prompt(custom_topic, avoid), use_cache=False)
+            results = parse_curation(text)
+
+            # 必須項目が欠けている場合のチェック
+            if not results["analysis"] and not results["summary"]:
+                return text
+
+            # 重複したら今回の下書きに似た過去トピックを回避リストの先頭にしてやり直す
+            check_cancelled()
+            avoid = archive_unless_duplicate(results, custom_topic)
+            if avoid is None:
+                return results
+        # やり直しても重複したものはアーカイブしない
         return results
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"Error during news curation: {e}")
         return None
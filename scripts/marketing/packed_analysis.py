@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import time
+
+import bot_gen
+from bot_gen import ANALYSIS_RULES, generate_tweets, save_patterns
+from prompt_builder import get_article_digest
+from rate_limit import call_with_backoff, estimate_tokens
+from model_router import model_limits
+from llm_cache import get_llm_cache, model_name_of
+from utils import get_article_data
+
+# 1リクエストにまとめる記事数の上限（多すぎると1件の崩れで全体がやり直しになる）
+MAX_PACK = 8
+# 1記事分の応答（3パターン + JSON の枠）のトークン数の見積もり
+OUTPUT_TOKENS_PER_ARTICLE = 1200
+# 上限いっぱいまで使わない（見積もりの誤差と応答の揺れの分）
+CONTEXT_HEADROOM = 0.5
+OUTPUT_HEADROOM = 0.8
+# プロンプト内の記事の区切り（偽モデルの応答もこの形から記事IDを取り出す）
+ARTICLE_HEADER = "=== 記事ID: {} ==="
+ARTICLE_HEADER_RE = re.compile(re.escape(ARTICLE_HEADER).replace(r'\{\}', r'(\S+)'))
+
+
+def build_packed_prompt(articles):
+    """
+    複数記事をまとめて解析するプロンプト。共通の指示は1回だけ送る。
+    articles は [(記事ID, タイトル, 本文またはダイジェスト), ...]
+    """
+    blocks = "\n\n".join(
+        f"{ARTICLE_HEADER.format(article_id)}\nタイトル: {title}\n解析対象: {body}"
+        for article_id, title, body in articles
+    )
+    ids = ", ".join(f'"{article_id}"' for article_id, _, _ in articles)
+    return f"""あなたはMochisura Labの「データ解析官（Data Analyst Slime）」です。
+以下の{len(articles)}本のブログ記事それぞれについて、読者が「結局何ができるようになるのか」というアウトカム（成果）を蒸留し、情報を欲しがらせる（憧れさせる）メッセージを3パターンずつ生成してください。
+記事ごとに独立して書き、他の記事の内容を混ぜないこと。
+
+{ANALYSIS_RULES}
+
+【出力形式】
+次の形の JSON 配列だけを出力してください（コードブロックや説明文は不要）。記事IDは {ids} をそのまま使うこと。
+[{{"id": "記事ID", "patterns": ["パターン1の全文", "パターン2の全文", "パターン3の全文"]}}]
+
+【データ元：ラボの研究記事】
+{blocks}"""
+
+
+def fake_response(prompt):
+    """
+    偽モデル用の応答。まとめたプロンプトには記事ごとの JSON 配列を、
+    1件ずつ解析し直すプロンプトには bot_gen.fake_response と同じ3パターン形式を返す
+    """
+    article_ids = ARTICLE_HEADER_RE.findall(str(prompt))
+    if not article_ids:
+        return bot_gen.fake_response(prompt)
+    return json.dumps([
+        {"id": article_id, "patterns": [f"偽モデルの出力 {article_id}-{i}" for i in range(1, 4)]}
+        for article_id in article_ids
+    ], ensure_ascii=False)
+
+
+_SEPARATOR_RE = re.compile(r'[\s,]*')
+
+
+def _decode_items(text):
+    """
+    応答の中の JSON 配列の要素を返す（コードフェンスや前後の説明文は読み飛ばす）。
+    出力が途中で切れて配列が閉じていなければ、読み終えた要素までを返す
+    """
+    decoder = json.JSONDecoder()
+    start = text.find('[')
+    while start != -1:
+        try:
+            items, _ = decoder.raw_decode(text, start)
+            if isinstance(items, list):
+                return items
+        except ValueError:
+            pass
+        # 要素を1つずつ読み、読めなくなったところで止める
+        items = []
+        pos = _SEPARATOR_RE.match(text, start + 1).end()
+        while pos < len(text) and text[pos] != ']':
+            try:
+                item, pos = decoder.raw_decode(text, pos)
+            except ValueError:
+                break
+            items.append(item)
+            pos = _SEPARATOR_RE.match(text, pos).end()
+        if items:
+            return items
+        # 説明文の中の [ だった
+        start = text.find('[', start + 1)
+    return []
+
+
+def parse_packed_response(text, article_ids):
+    """
+    まとめて解析した応答を {記事ID: [3パターン]} に分ける。
+    形式が崩れている記事は含めない（呼び出し側で個別に解析し直す）
+    """
+    wanted = set(article_ids)
+    results = {}
+    for item in _decode_items(text):
+        if not isinstance(item, dict):
+            continue
+        article_id = str(item.get("id", "")).strip()
+        patterns = item.get("patterns")
+        if article_id not in wanted or article_id in results or not isinstance(patterns, list):
+            continue
+        patterns = [p.strip() for p in patterns if isinstance(p, str) and p.strip()]
+        if len(patterns) >= 3:
+            results[article_id] = patterns[:3]
+    return results
+
+
+def choose_pack_size(model, article_tokens, requested=None):
+    """
+    1リクエストにまとめる記事数。入力・出力トークンの上限（ルーターは切り替え先の最小値）から決める。
+    requested を指定した場合もこの上限は超えない
+    """
+    input_limit, output_limit = model_limits(model)
+    preamble = estimate_tokens(build_packed_prompt([]))
+    by_output = int(output_limit * OUTPUT_HEADROOM) // OUTPUT_TOKENS_PER_ARTICLE
+    by_input = int(input_limit * CONTEXT_HEADROOM - preamble) // max(1, article_tokens)
+    size = max(1, min(MAX_PACK, by_output, by_input))
+    return min(size, requested) if requested else size
+
+
+def make_packs(articles, model, requested=None):
+    """
+    articles（[(パス, タイトル, 本文)]）を上限内のまとまりに分ける。
+    記事の長さにばらつきがあるので、件数だけでなく入力トークンの合計でも区切る
+    """
+    if not articles:
+        return []
+    average = sum(estimate_tokens(body) for _, _, body in articles) // len(articles)
+    size = choose_pack_size(model, average, requested)
+    input_limit, _ = model_limits(model)
+    budget = int(input_limit * CONTEXT_HEADROOM)
+
+    packs, current, used = [], [], estimate_tokens(build_packed_prompt([]))
+    for article in articles:
+        cost = estimate_tokens(article[2]) + 20
+        if current and (len(current) >= size or used + cost > budget):
+            packs.append(current)
+            current, used = [], estimate_tokens(build_packed_prompt([]))
+        current.append(article)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def prepare_articles(html_files, model=None, limiter=None, store=True):
+    """記事を読み込み、本文（長い記事はダイジェスト）を用意する。本文の無い記事は除く"""
+    articles = []
+    for f in html_files:
+        title, body = get_article_data(f)
+        if not body:
+            print(f"Error: 記事の本文が見つかりませんでした: {os.path.basename(f)}")
+            continue
+        digest, _ = get_article_digest(f, title, body, model=model, limiter=limiter, store=store)
+        articles.append((f, title, digest))
+    return articles
+
+
+def analyze_pack(pack, model, limiter=None, save=True, use_cache=True, verbose=False):
+    """
+    1まとまりの記事を1リクエストで解析する。
+    戻り値は {パス: パターンのリスト or None}。応答から取り出せなかった記事は1件ずつ解析し直す
+    """
+    ids = [f"A{i + 1}" for i in range(len(pack))]
+    results = {}
+    parsed = {}
+
+    if len(pack) > 1:
+        prompt = build_packed_prompt([(article_id, title, body) for article_id, (_, title, body) in zip(ids, pack)])
+
+        def attempt():
+            if limiter:
+                limiter.acquire(estimate_tokens(prompt))
+            return model.generate_content(prompt)
+
+        cache = get_llm_cache()
+        name = model_name_of(model)
+        try:
+            text = cache.lookup(name, prompt) if use_cache else None
+            if text is None:
+                started = time.monotonic()
+                response, _ = call_with_backoff(attempt)
+                text = response.text
+                parsed = parse_packed_response(text, ids)
+                # 全記事分を取り出せた応答だけキャッシュする（崩れた応答を再利用しない）
+                if use_cache and len(parsed) == len(ids):
+                    cache.store(name, prompt, text, time.monotonic() - started)
+            else:
+                parsed = parse_packed_response(text, ids)
+        except Exception as e:
+            print(f"[まとめて解析] 失敗したので1件ずつ解析します: {e}")
+
+    for article_id, (path, title, _) in zip(ids, pack):
+        patterns = parsed.get(article_id)
+        if patterns:
+            if save:
+                save_patterns(path, title, patterns)
+            results[path] = patterns
+        else:
+            if len(pack) > 1:
+                print(f"[まとめて解析] {os.path.basename(path)} の結果を取り出せなかったので個別に解析します")
+            results[path] = generate_tweets(path, model=model, limiter=limiter, verbose=verbose,
+                                            save=save, use_cache=use_cache)
+    return results
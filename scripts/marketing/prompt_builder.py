@@ -0,0 +1,273 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+from rate_limit import call_with_backoff, estimate_tokens
+import metrics
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+DIGEST_DB = os.path.join(DATA_DIR, 'digest_cache.db')
+
+# 解析プロンプトに入れる記事本文（またはダイジェスト）の上限トークン数
+BODY_TOKEN_BUDGET = 1200
+# 1回の要約（map）に渡すセクションの上限トークン数
+MAP_CHUNK_TOKENS = 1000
+# 要約が短くなりすぎないようにするセクションごとの下限
+MIN_SECTION_TOKENS = 80
+# ダイジェストの作り方を変えたら上げる（キャッシュが作り直される）
+DIGEST_VERSION = 1
+
+SECTION_HEADINGS = ['h2']
+_SECTION_MARK = '\u0000SECTION\u0000'
+
+
+def split_sections(html):
+    """
+    記事HTMLの div.content を見出し（h2）ごとのセクションに分ける。
+    戻り値は [(見出し, 本文テキスト), ...]（最初の見出しより前は見出し ""）
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    content_div = soup.find('div', class_='content')
+    if not content_div:
+        return []
+    for s in content_div(["script", "style", "nav", "footer"]):
+        s.decompose()
+    for heading in content_div.find_all(SECTION_HEADINGS):
+        heading.insert_before(_SECTION_MARK)
+
+    sections = []
+    # 先頭のパートは最初の見出しより前、以降のパートは見出しのテキストから始まる
+    for i, part in enumerate(content_div.get_text(separator='\n').split(_SECTION_MARK)):
+        lines = [line.strip() for line in part.split('\n') if line.strip()]
+        if not lines:
+            continue
+        if i == 0:
+            sections.append(("", "\n".join(lines)))
+        else:
+            sections.append((lines[0], "\n".join(lines[1:])))
+    return sections
+
+
+def truncate_to_tokens(text, budget):
+    """トークン数の概算が budget に収まるよう、行単位（最後は文字単位）で切り詰める"""
+    if estimate_tokens(text) <= budget:
+        return text
+    lines, used = [], 0
+    for line in text.split('\n'):
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            remaining = budget - used
+            if remaining > 20:
+                lines.append(line[:remaining])
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def content_key(title, body):
+    """記事の版を表すキー（本文が変わればダイジェストも作り直す）"""
+    payload = f"{DIGEST_VERSION}\n{BODY_TOKEN_BUDGET}\n{title}\n{body}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def build_map_prompt(title, chunk, target_tokens):
+    return (
+        f"以下はブログ記事「{title}」の一部です。\n"
+        f"読者が得られる成果・その根拠・具体的な手順や数値・印象的なエピソードを落とさずに、"
+        f"日本語の箇条書きで約{target_tokens}文字に要約してください。前置きや結びの言葉は不要です。\n\n"
+        f"{chunk}"
+    )
+
+
+def build_reduce_prompt(title, digest, target_tokens):
+    return (
+        f"以下はブログ記事「{title}」をセクションごとに要約したものです。\n"
+        f"重複を除いて、記事全体の要点が分かる約{target_tokens}文字の箇条書きにまとめ直してください。"
+        f"見出しごとのまとまりは残してください。\n\n"
+        f"{digest}"
+    )
+
+
+def pack_sections(sections, max_tokens=MAP_CHUNK_TOKENS):
+    """連続するセクションを max_tokens 以内のチャンクにまとめる（要約の呼び出し回数を減らす）"""
+    chunks, current, used = [], [], 0
+    for heading, text in sections:
+        block = f"## {heading}\n{text}" if heading else text
+        cost = estimate_tokens(block)
+        if cost > max_tokens:
+            block = truncate_to_tokens(block, max_tokens)
+            cost = max_tokens
+        if current and used + cost > max_tokens:
+            chunks.append(("\n\n".join(current), used))
+            current, used = [], 0
+        current.append(block)
+        used += cost
+    if current:
+        chunks.append(("\n\n".join(current), used))
+    return chunks
+
+
+def summarize_article(title, sections, generate, budget=BODY_TOKEN_BUDGET):
+    """
+    map-reduce でダイジェストを作る。generate(prompt) はモデルの応答テキストを返す関数。
+    各チャンクを元の分量に比例した長さに要約し（map）、合計が budget を超えたらもう一度まとめる（reduce）
+    """
+    chunks = pack_sections(sections)
+    total = sum(tokens for _, tokens in chunks) or 1
+    summaries = []
+    for chunk, tokens in chunks:
+        target = max(MIN_SECTION_TOKENS, budget * tokens // total)
+        summaries.append(generate(build_map_prompt(title, chunk, target)).strip())
+    digest = "\n\n".join(summaries)
+    if estimate_tokens(digest) > budget:
+        digest = generate(build_reduce_prompt(title, digest, budget)).strip()
+    return truncate_to_tokens(digest, budget)
+
+
+class DigestCache:
+    """
+    記事ダイジェストのキャッシュ（内容ハッシュがキー）。
+    元の本文と比べて何トークン減らせたかを記録し、stats() で報告する。
+    """
+
+    def __init__(self, db_path=DIGEST_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {"hits": 0, "misses": 0, "passthrough": 0, "fallbacks": 0, "llm_calls": 0}
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS digests (
+                    key TEXT PRIMARY KEY,
+                    title TEXT,
+                    digest TEXT,
+                    source_tokens INTEGER,
+                    digest_tokens INTEGER,
+                    sections INTEGER,
+                    build_seconds REAL,
+                    uses INTEGER DEFAULT 0,
+                    created REAL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT digest, source_tokens, digest_tokens FROM digests WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self._conn.execute("UPDATE digests SET uses = uses + 1 WHERE key = ?", (key,))
+                self._conn.commit()
+            return row
+
+    def set(self, key, title, digest, source_tokens, sections, build_seconds):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)",
+                (key, title, digest, source_tokens, estimate_tokens(digest), sections, build_seconds, time.time())
+            )
+            conn.commit()
+
+    def stats(self):
+        """ダイジェストの件数と、元の本文をそのまま送った場合との差（トークン）"""
+        with self._lock:
+            result = dict(self.counters)
+            count, source, digest, uses, saved = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(source_tokens), 0), COALESCE(SUM(digest_tokens), 0), "
+                "COALESCE(SUM(uses), 0), COALESCE(SUM((source_tokens - digest_tokens) * uses), 0) FROM digests"
+            ).fetchone()
+        result.update({
+            "digests": count,
+            "source_tokens": source,
+            "digest_tokens": digest,
+            "uses": uses,
+            "tokens_saved": saved,
+            "compression": round(digest / source, 4) if source else None,
+        })
+        return result
+
+
+_digest_cache = None
+
+
+def get_digest_cache():
+    global _digest_cache
+    if _digest_cache is None:
+        _digest_cache = DigestCache()
+    return _digest_cache
+
+
+def get_article_digest(file_path, title, body, model=None, limiter=None, cache=None, store=True):
+    """
+    解析プロンプトに入れる本文を返す: (テキスト, 情報 dict)。
+
+    - BODY_TOKEN_BUDGET に収まる記事は本文をそのまま使う（LLM 呼び出しなし）
+    - 長い記事は見出しごとに要約したダイジェストを作り、内容ハッシュをキーにキャッシュする
+    - 要約に失敗した場合は本文を切り詰めて使う（キャッシュしない）
+    - store=False なら作ったダイジェストを保存しない（偽モデルでの試験用）
+    """
+    cache = cache or get_digest_cache()
+    source_tokens = estimate_tokens(body)
+    info = {"source_tokens": source_tokens, "mode": "full", "cached": False}
+
+    if source_tokens <= BODY_TOKEN_BUDGET:
+        cache.counters["passthrough"] += 1
+        info["body_tokens"] = source_tokens
+        return body, info
+
+    key = content_key(title, body)
+    row = cache.get(key)
+    if row:
+        cache.counters["hits"] += 1
+        info.update(mode="digest", cached=True, body_tokens=row[2])
+        metrics.registry.inc("mochi_prompt_tokens_saved_total", max(0, source_tokens - row[2]),
+                             help="Prompt tokens saved by cached article digests")
+        return row[0], info
+
+    cache.counters["misses"] += 1
+    if model is None:
+        # モデルが無ければ要約できないので切り詰める
+        cache.counters["fallbacks"] += 1
+        text = truncate_to_tokens(body, BODY_TOKEN_BUDGET)
+        info.update(mode="truncated", body_tokens=estimate_tokens(text))
+        return text, info
+
+    def generate(prompt):
+        def attempt():
+            if limiter:
+                limiter.acquire(estimate_tokens(prompt))
+            return model.generate_content(prompt)
+        cache.counters["llm_calls"] += 1
+        response, _ = call_with_backoff(attempt)
+        return response.text
+
+    started = time.monotonic()
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            sections = split_sections(f.read()) or [("", body)]
+        with metrics.phase("article_digest"):
+            digest = summarize_article(title, sections, generate)
+    except Exception as e:
+        print(f"Digest failed for {os.path.basename(file_path)}: {e}")
+        cache.counters["fallbacks"] += 1
+        text = truncate_to_tokens(body, BODY_TOKEN_BUDGET)
+        info.update(mode="truncated", body_tokens=estimate_tokens(text))
+        return text, info
+
+    elapsed = time.monotonic() - started
+    if store:
+        cache.set(key, title, digest, source_tokens, len(sections), elapsed)
+    info.update(mode="digest", body_tokens=estimate_tokens(digest), sections=len(sections),
+                build_seconds=round(elapsed, 3))
+    return digest, info
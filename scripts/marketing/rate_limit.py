@@ -0,0 +1,97 @@
+import time
+import random
+import threading
+
+import metrics
+
+
+class TokenBucket:
+    """1分あたり rate_per_minute 個まで補充されるトークンバケット（スレッドセーフ）"""
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount=1):
+        """amount 分を確保し、実際に使えるまでの待ち秒数を返す（残高はマイナスになり得る）"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self, amount=1):
+        """amount 分のトークンが使えるまでブロックする"""
+        wait = self.reserve(amount)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """リクエスト数/分 (RPM) とトークン数/分 (TPM) を同時に守るリミッター"""
+
+    def __init__(self, rpm=10, tpm=250000, clock=time.monotonic, sleep=time.sleep):
+        self.requests = TokenBucket(rpm, clock=clock, sleep=sleep) if rpm else None
+        self.tokens = TokenBucket(tpm, clock=clock, sleep=sleep) if tpm else None
+        self.sleep = sleep
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=0):
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            with self._lock:
+                self.waited += wait
+            self.sleep(wait)
+        return wait
+
+
+def estimate_tokens(text):
+    """トークン数の概算（日本語は1文字≒1トークン弱、英語は4文字≒1トークン）"""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return max(1, (len(text) - ascii_chars) + ascii_chars // 4)
+
+
+def is_rate_limit_error(error):
+    """429 / ResourceExhausted 系のエラーかどうか"""
+    name = type(error).__name__
+    return "429" in str(error) or name in ("ResourceExhausted", "TooManyRequests", "FakeRateLimitError")
+
+
+def call_with_backoff(func, max_retries=5, base_delay=1.0, max_delay=60.0, sleep=time.sleep, on_retry=None):
+    """
+    func() を実行し、レート制限エラーの場合は指数バックオフ＋ジッターで再試行する。
+    戻り値は (結果, リトライ回数)。
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return func(), attempt
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == max_retries:
+                raise
+            # Full Jitter: 0 〜 min(max_delay, base * 2^n) の一様乱数
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            metrics.record_backoff_retry()
+            if on_retry:
+                on_retry(attempt + 1, delay, e)
+            sleep(delay)
+
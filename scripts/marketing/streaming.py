@@ -0,0 +1,81 @@
+import re
+import json
+
+PATTERN_HEADER = re.compile(r'パターン(\d)[:：]')
+CURATION_TAGS = ("Analysis", "Summary", "Source", "Commentary")
+
+
+class PatternStreamParser:
+    """
+    「パターンN:」形式の出力をストリームのまま解析し、
+    次の見出しが現れた時点で直前のパターンを確定させる。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.sections = []
+
+    def feed(self, chunk):
+        """チャンクを追加し、新たに確定したパターンのリストを返す"""
+        self.buffer += chunk
+        headers = list(PATTERN_HEADER.finditer(self.buffer))
+        completed = []
+        # 最後の見出しの後ろはまだ書きかけ
+        for i in range(len(self.sections), len(headers) - 1):
+            text = self.buffer[headers[i].end():headers[i + 1].start()].strip()
+            self.sections.append(text)
+            completed.append((i + 1, text))
+        return completed
+
+    def finish(self):
+        """ストリーム終了時に最後のパターンを確定させる"""
+        headers = list(PATTERN_HEADER.finditer(self.buffer))
+        if len(headers) > len(self.sections):
+            text = self.buffer[headers[-1].end():].strip()
+            self.sections.append(text)
+            return [(len(self.sections), text)]
+        return []
+
+
+class TagStreamParser:
+    """
+    <Analysis>...</Analysis> などのタグをストリームのまま解析し、
+    閉じタグが届いたセクションから順に確定させる。
+    """
+
+    def __init__(self, tags=CURATION_TAGS):
+        self.buffer = ""
+        self.done = {}
+        self._patterns = {
+            tag: re.compile(f'<{tag}>(.*?)</{tag}>', re.DOTALL | re.IGNORECASE) for tag in tags
+        }
+
+    def feed(self, chunk):
+        """チャンクを追加し、新たに確定した (タグ, 内容) のリストを返す"""
+        self.buffer += chunk
+        completed = []
+        for tag, pattern in self._patterns.items():
+            if tag in self.done:
+                continue
+            match = pattern.search(self.buffer)
+            if match:
+                self.done[tag] = match.group(1).strip()
+                completed.append((tag, self.done[tag]))
+        return completed
+
+
+def iter_stream_text(response):
+    """generate_content(..., stream=True) の応答からテキストのチャンクを取り出す"""
+    for chunk in response:
+        try:
+            text = chunk.text
+        except (ValueError, AttributeError):
+            # 安全フィルタ等でテキストの無いチャンク
+            continue
+        if text:
+            yield text
+
+
+def sse_event(event, data):
+    """Server-Sent Events の1イベント分の文字列を作る"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
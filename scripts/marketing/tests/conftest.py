@@ -0,0 +1,23 @@
+import os
+import sys
+
+# scripts/marketing のモジュールをインストールせずに import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """time.monotonic / time.sleep の代わり（sleep すると時計が進む）"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
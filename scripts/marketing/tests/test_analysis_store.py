@@ -0,0 +1,73 @@
+import os
+import sqlite3
+
+import pytest
+
+import analysis_store
+import utils
+from analysis_store import AnalysisStore
+from article_index import ArticleIndex
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AnalysisStore(str(tmp_path / "analysis.db"))
+
+
+def test_changes_follow_commit_order_not_timestamps(store, monkeypatch):
+    # 書き込み A は 100.0 で時刻を取ったが、B (100.1) より後にコミットした
+    monkeypatch.setattr(analysis_store.time, "time", lambda: 100.1)
+    store.upsert({"b.html": ["B"]})
+    _, _, cursor = store.changes_since(0)
+
+    monkeypatch.setattr(analysis_store.time, "time", lambda: 100.0)
+    store.upsert({"a.html": ["A"]})
+    changed, deleted, latest = store.changes_since(cursor)
+    assert changed == {"a.html": ["A"]}
+    assert deleted == []
+    assert latest > cursor
+    assert store.changes_since(latest) == ({}, [], latest)
+
+
+def test_changes_report_updates_and_deletions_once(store):
+    store.upsert({"a.html": ["1"], "b.html": ["2"]})
+    _, _, cursor = store.changes_since(0)
+    store.upsert({"a.html": ["3"]})
+    store.delete("b.html")
+    store.upsert({"a.html": ["4"]})
+    changed, deleted, _ = store.changes_since(cursor)
+    assert changed == {"a.html": ["4"]}
+    assert deleted == ["b.html"]
+
+
+def test_existing_rows_get_change_numbers(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE analysis (path TEXT PRIMARY KEY, patterns TEXT NOT NULL, updated_at REAL NOT NULL)")
+    conn.execute("INSERT INTO analysis VALUES ('a.html', '[\"A\"]', 2), ('b.html', '[\"B\"]', 1)")
+    conn.commit()
+    conn.close()
+    changed, deleted, latest = AnalysisStore(path).changes_since(0)
+    assert changed == {"a.html": ["A"], "b.html": ["B"]}
+    assert latest == 2
+
+
+def test_article_index_picks_up_late_commits_and_deletions(store, tmp_path, monkeypatch):
+    articles = tmp_path / "articles"
+    articles.mkdir()
+    for name in ("a", "b"):
+        (articles / f"{name}.html").write_text(
+            f'<h1 class="article-title">{name}</h1><div class="content"><p>本文</p></div>', encoding="utf-8"
+        )
+    monkeypatch.setattr(utils, "_analysis_store", store)
+    store.upsert({"b.html": ["B"]})
+    index = ArticleIndex(str(articles))
+    index.build()
+
+    monkeypatch.setattr(analysis_store.time, "time", lambda: 0.0)
+    store.upsert({"a.html": ["A"]})
+    store.delete("b.html")
+    index.refresh_analysis()
+    entries = {os.path.basename(e["path"]): e for e in index._entries.values()}
+    assert entries["a.html"]["is_analyzed"] and entries["a.html"]["patterns"] == ["A"]
+    assert not entries["b.html"]["is_analyzed"] and entries["b.html"]["patterns"] == []
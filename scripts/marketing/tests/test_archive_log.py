@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+import archive_log
+from archive_log import ArchiveLog
+
+
+def report(n, timestamp):
+    return {"timestamp": timestamp, "summary": f"レポート {n}"}
+
+
+@pytest.fixture
+def log(tmp_path):
+    return ArchiveLog(str(tmp_path / "news_log"))
+
+
+def test_append_writes_monthly_segments_and_tail_reads_across_them(log):
+    log.append(report(1, "2025-12-30 10:00:00"))
+    log.append(report(2, "2026-01-02 10:00:00"))
+    log.append(report(3, "2026-01-05 10:00:00"))
+    assert [s["name"] for s in log.segments()] == ["2025-12.jsonl", "2026-01.jsonl"]
+    assert [e["summary"] for e in log.tail(2)] == ["レポート 2", "レポート 3"]
+    assert [e["summary"] for e in log.tail(10)] == ["レポート 1", "レポート 2", "レポート 3"]
+
+
+def test_iter_from_resumes_after_a_position(log):
+    log.append(report(1, "2026-01-02 10:00:00"))
+    name, offset = log.append(report(2, "2026-01-03 10:00:00"))
+    log.append(report(3, "2026-02-01 10:00:00"))
+    assert [e["summary"] for _, _, e in log.iter_from(name, offset)] == ["レポート 3"]
+
+
+def _tear(log, text):
+    """書き込み中に落ちたのと同じ状態（最後の行が改行で終わっていない）にする"""
+    path = log.segments()[-1]["path"]
+    with open(path, "ab") as f:
+        f.write(text.encode("utf-8"))
+    return path
+
+
+def test_torn_last_line_is_skipped_by_readers(log):
+    log.append(report(1, "2026-01-02 10:00:00"))
+    _tear(log, '{"timestamp": "2026-01-03 10:00:00", "summ')
+    assert [e["summary"] for e in log.tail(5)] == ["レポート 1"]
+    assert [e["summary"] for e in log] == ["レポート 1"]
+    assert log.verify() == ["2026-01.jsonl:2: 壊れた行があります"]
+
+
+def test_next_append_truncates_torn_line(log):
+    log.append(report(1, "2026-01-02 10:00:00"))
+    path = _tear(log, '{"timestamp": "2026-01-03 10:00:00", "summ')
+    # 再起動後の別インスタンスが追記する
+    reopened = ArchiveLog(log.dir)
+    reopened.append(report(2, "2026-01-04 10:00:00"))
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["summary"] for line in f] == ["レポート 1", "レポート 2"]
+    assert reopened.verify() == []
+
+
+def test_torn_line_longer_than_a_read_block(log, monkeypatch):
+    monkeypatch.setattr(archive_log, "TAIL_BLOCK", 8)
+    log.append(report(1, "2026-01-02 10:00:00"))
+    _tear(log, '{"timestamp": "2026-01-03 10:00:00", "summary": "' + "あ" * 100)
+    reopened = ArchiveLog(log.dir)
+    reopened.append(report(2, "2026-01-04 10:00:00"))
+    assert [e["summary"] for e in reopened] == ["レポート 1", "レポート 2"]
+    assert reopened.verify() == []
+
+
+def test_segment_with_only_a_torn_line_is_emptied(log):
+    log.append(report(1, "2026-01-02 10:00:00"))
+    path = log.segments()[-1]["path"]
+    with open(path, "wb") as f:
+        f.write(b'{"timestamp": "2026-01')
+    reopened = ArchiveLog(log.dir)
+    reopened.append(report(2, "2026-01-04 10:00:00"))
+    assert [e["summary"] for e in reopened] == ["レポート 2"]
+
+
+def test_compact_seals_past_months_and_merges_past_years(log):
+    for n, timestamp in enumerate(["2025-11-01 10:00:00", "2025-12-01 10:00:00",
+                                   "2026-01-01 10:00:00", "2026-02-01 10:00:00"], start=1):
+        log.append(report(n, timestamp))
+    _tear(log, '{"timestamp": "2026-02-02')
+    assert log.compact(current_period="2026-02")
+    segments = {s["name"]: s for s in log.segments()}
+    assert list(segments) == ["2025.jsonl", "2026-01.jsonl", "2026-02.jsonl"]
+    assert segments["2025.jsonl"]["sealed"] and segments["2025.jsonl"]["count"] == 2
+    assert segments["2026-01.jsonl"]["sealed"]
+    assert not segments["2026-02.jsonl"]["sealed"]
+    assert log.manifest()["generation"] == 1
+    assert [e["summary"] for e in log.tail(10)] == [f"レポート {n}" for n in range(1, 5)]
+    # 今月のセグメントの切れた行は次の追記で切り詰められる
+    log.append(report(5, "2026-02-03 10:00:00"))
+    assert log.verify() == []
+    assert not log.compact(current_period="2026-02")
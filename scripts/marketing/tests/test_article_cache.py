@@ -0,0 +1,37 @@
+import os
+
+from article_cache import ArticleCache
+
+
+def parse(html):
+    return "タイトル", html
+
+
+def test_title_lookups_have_their_own_counters(tmp_path):
+    cache = ArticleCache(db_path=str(tmp_path / "cache.db"))
+    path = tmp_path / "a.html"
+    path.write_text("本文", encoding='utf-8')
+
+    assert cache.get_title(str(path)) is None
+    cache.get(str(path), parse)
+    assert cache.get_title(str(path)) == "タイトル"
+    cache._memory.clear()
+    assert cache.get_title(str(path)) == "タイトル"
+
+    stats = cache.stats()
+    assert (stats["title_hits"], stats["title_misses"]) == (2, 1)
+    assert stats["title_hit_rate"] == round(2 / 3, 4)
+    # タイトルの参照は get のヒット率に入らない
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (0, 0, 1)
+    assert stats["hit_rate"] == 0.0
+
+
+def test_changed_file_is_a_title_miss(tmp_path):
+    cache = ArticleCache(db_path=str(tmp_path / "cache.db"))
+    path = tmp_path / "a.html"
+    path.write_text("本文", encoding='utf-8')
+    cache.get(str(path), parse)
+    path.write_text("書き換えた本文", encoding='utf-8')
+    os.utime(path, ns=(1, 1))
+    assert cache.get_title(str(path)) is None
+    assert cache.stats()["title_misses"] == 1
@@ -0,0 +1,44 @@
+import json
+
+from benchmark import measure, compare_results, is_time_regression, noise_floor, NOISE_SECONDS
+
+
+def timing(seconds, median=None, spread=0.0):
+    return {"seconds": seconds, "median": seconds if median is None else median, "spread": spread,
+            "runs": 5, "peak_bytes": None}
+
+
+def test_measure_records_median_and_spread():
+    result = measure(lambda: None, lambda _: None, repeat=5, memory=False)
+    assert result["runs"] == 5
+    assert result["seconds"] <= result["median"]
+    assert result["spread"] >= 0
+
+
+def test_noise_floor_scales_with_spread():
+    assert noise_floor(timing(0.1), timing(0.1)) == NOISE_SECONDS
+    assert noise_floor(timing(0.1, spread=0.01), timing(0.1, spread=0.02)) > 0.05
+
+
+def test_single_slow_run_is_not_a_regression():
+    # 最速値は変わらず、外れ値で中央値だけが動いた
+    assert not is_time_regression(timing(0.100, 0.105), timing(0.100, 0.140))
+
+
+def test_slowdown_within_variance_is_not_a_regression():
+    base = timing(0.100, 0.110, spread=0.010)
+    current = timing(0.130, 0.140, spread=0.010)
+    assert not is_time_regression(base, current)
+
+
+def test_consistent_slowdown_is_a_regression():
+    base = timing(0.100, 0.102, spread=0.001)
+    current = timing(0.150, 0.152, spread=0.001)
+    assert is_time_regression(base, current)
+
+
+def test_old_baseline_without_median(tmp_path):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"results": {"case[10]": {"seconds": 0.1, "peak_bytes": None}}}))
+    assert compare_results(str(path), {"case[10]": timing(0.2)}) == [("case[10]", "time", 2.0)]
+    assert compare_results(str(path), {"case[10]": timing(0.1)}) == []
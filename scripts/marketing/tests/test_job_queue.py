@@ -0,0 +1,151 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from job_queue import JobQueue, PRIORITY_BATCH, PRIORITY_INTERACTIVE, analyze_job_params, _process_alive
+from fake_model import FakeModel
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), workers=1)
+    queue.register("echo", lambda params, job: params)
+    return queue
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_submit_coalesces_active_jobs_with_the_same_key(queue):
+    first, coalesced = queue.submit("echo", {"n": 1}, key="a")
+    assert not coalesced
+    assert queue.submit("echo", {"n": 2}, key="a") == (first, True)
+    assert queue.submit("echo", {"n": 3}, key="b")[0] != first
+
+    queue.cancel(first)
+    assert queue.submit("echo", {"n": 4}, key="a") != (first, True)
+
+
+def test_claim_takes_priority_then_submission_order(queue):
+    batch, _ = queue.submit("echo", {}, priority=PRIORITY_BATCH)
+    first, _ = queue.submit("echo", {}, priority=PRIORITY_INTERACTIVE)
+    second, _ = queue.submit("echo", {}, priority=PRIORITY_INTERACTIVE)
+    claimed = [queue._claim("w")["id"] for _ in range(3)]
+    assert claimed == [first, second, batch]
+    assert queue._claim("w") is None
+    assert queue.get(first)["status"] == "running"
+    assert queue.get(first)["worker"] == "w"
+
+
+def test_claim_hands_each_job_to_one_process_only(queue, tmp_path):
+    # 同じテーブルを共有する別プロセスのキュー
+    other = JobQueue(db_path=queue.db_path, workers=1)
+    other.register("echo", lambda params, job: params)
+    submitted = {queue.submit("echo", {"n": n})[0] for n in range(10)}
+    claimed = []
+    while True:
+        rows = [q._claim(name) for q, name in ((queue, "a"), (other, "b"))]
+        rows = [row for row in rows if row is not None]
+        if not rows:
+            break
+        claimed.extend(row["id"] for row in rows)
+    assert sorted(claimed) == sorted(submitted)
+
+
+def test_claim_skips_kinds_without_a_handler(queue):
+    queue.submit("unknown", {})
+    assert queue._claim("w") is None
+    job_id, _ = queue.submit("echo", {"n": 1})
+    assert queue._claim("w")["id"] == job_id
+
+
+def test_recover_fails_jobs_of_dead_workers_only(queue):
+    dead, _ = queue.submit("echo", {})
+    alive, _ = queue.submit("echo", {})
+    queue._claim(f"{_dead_pid()}:job-worker-0")
+    queue._claim(f"{os.getpid()}:job-worker-0")
+    queue._recover()
+    assert queue.get(dead)["status"] == "failed"
+    assert queue.get(dead)["error"] == "interrupted"
+    assert queue.get(alive)["status"] == "running"
+
+
+def test_process_alive():
+    assert _process_alive(os.getpid())
+    assert not _process_alive(_dead_pid())
+
+
+def test_recover_fails_stale_running_row_after_its_worker_dies(queue):
+    job_id, _ = queue.submit("echo", {})
+    worker = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    try:
+        queue._claim(f"{worker.pid}:job-worker-0")
+        queue._recover()
+        assert queue.get(job_id)["status"] == "running"
+    finally:
+        worker.kill()
+        worker.wait()
+    # 別のプロセス（再起動後のアプリ）が開き直したときに回収される
+    JobQueue(db_path=queue.db_path, workers=1)._recover()
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "interrupted"
+    assert job["finished"] is not None
+
+
+def test_run_job_records_result_and_failure(queue):
+    queue.register("boom", lambda params, job: 1 / 0)
+    ok, _ = queue.submit("echo", {"n": 1})
+    bad, _ = queue.submit("boom", {})
+    assert queue.run_job(ok, "echo", {"n": 1}) == "succeeded"
+    assert queue.get(ok)["result"] == {"n": 1}
+    assert queue.run_job(bad, "boom", {}) == "failed"
+    assert "division" in queue.get(bad)["error"]
+
+
+def test_analyze_jobs_do_not_coalesce_across_fake_or_save(tmp_path):
+    path = str(tmp_path / "a.html")
+    _, real = analyze_job_params(path)
+    _, no_save = analyze_job_params(path, save=False)
+    params, fake = analyze_job_params(path, save=False, use_cache=False, fake_model=FakeModel(latency=0.1))
+    assert len({real, no_save, fake}) == 3
+    assert params["fake"] and params["fake_latency"] == 0.1
+
+
+def test_prune_deletes_old_finished_jobs_only(queue):
+    old, _ = queue.submit("echo", {"n": 1})
+    recent, _ = queue.submit("echo", {"n": 2})
+    queued, _ = queue.submit("echo", {"n": 3})
+    queue.run_job(old, "echo", {"n": 1})
+    queue.run_job(recent, "echo", {"n": 2})
+    queue._connect().execute("UPDATE jobs SET finished = finished - 3600 WHERE id = ?", (old,))
+    assert queue.prune(retention=60) == 1
+    assert queue.get(old) is None
+    assert queue.get(recent)["status"] == "succeeded"
+    assert queue.get(queued)["status"] == "queued"
+
+
+def test_curation_job_cancelled_before_archiving(monkeypatch):
+    import news_curator
+    from job_queue import JobCancelled
+    archived = []
+    generated = []
+    monkeypatch.setattr(news_curator, "create_model", lambda: object())
+    monkeypatch.setattr(news_curator, "select_avoid_topics", lambda custom_topic=None, similar_to=None: [])
+    monkeypatch.setattr(news_curator, "cached_generate",
+                        lambda model, prompt, use_cache=True: (generated.append(True), "<Summary>要約</Summary>")[1])
+    monkeypatch.setattr(news_curator, "archive_unless_duplicate", lambda results, custom_topic=None: archived.append(1))
+
+    def check_cancelled():
+        # 生成が終わった後でキャンセルされた
+        if generated:
+            raise JobCancelled("job")
+
+    with pytest.raises(JobCancelled):
+        news_curator.fetch_and_curate_news(check_cancelled=check_cancelled)
+    assert archived == []
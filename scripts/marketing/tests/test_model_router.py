@@ -0,0 +1,116 @@
+import pytest
+
+from model_router import CircuitBreaker, ModelRouter, ModelUnavailableError
+from fake_model import FakeModel, FakeRateLimitError
+from conftest import FakeClock
+
+
+def test_breaker_opens_and_probes_once_after_cooldown():
+    clock = FakeClock()
+    breaker = CircuitBreaker(cooldown=30, clock=clock)
+    breaker.trip()
+    assert breaker.state == "open"
+    assert not breaker.available()
+    assert not breaker.allow()
+
+    clock.advance(30)
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    # half_open では1件だけ試す
+    assert not breaker.available()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_breaker_doubles_cooldown_when_probe_is_rate_limited():
+    clock = FakeClock()
+    breaker = CircuitBreaker(cooldown=30, max_cooldown=100, clock=clock)
+    breaker.trip()
+    for expected in (60, 100, 100):
+        clock.advance(breaker.cooldown)
+        assert breaker.allow()
+        breaker.trip()
+        assert breaker.cooldown == expected
+        assert breaker.open_until == clock() + expected
+    clock.advance(100)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.cooldown == 30
+
+
+def test_breaker_release_allows_the_next_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(cooldown=30, clock=clock)
+    breaker.trip()
+    clock.advance(30)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.available()
+    assert breaker.allow()
+
+
+class FlakyBackend(FakeModel):
+    """fail が True の間は 429 を投げる偽モデル"""
+
+    def __init__(self):
+        super().__init__(latency=0)
+        self.fail = False
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if self.fail:
+            raise FakeRateLimitError("429 Resource has been exhausted (fake)")
+        return super().generate_content(prompt, stream=stream, **kwargs)
+
+
+def make_router(clock, names=("primary", "secondary")):
+    backends = {name: FlakyBackend() for name in names}
+    router = ModelRouter(models=list(names), backend_factory=backends.__getitem__, cooldown=30, clock=clock)
+    return router, backends
+
+
+def test_router_skips_rate_limited_model_until_cooldown():
+    clock = FakeClock()
+    router, backends = make_router(clock)
+    backends["primary"].fail = True
+    assert router.generate_content("x").model_used == "secondary"
+    assert router.stats()["primary"]["state"] == "open"
+
+    backends["primary"].fail = False
+    assert router.generate_content("x").model_used == "secondary"
+    clock.advance(30)
+    assert router.generate_content("x").model_used == "primary"
+    assert router.stats()["primary"]["state"] == "closed"
+
+
+def test_router_raises_when_every_model_is_rate_limited():
+    clock = FakeClock()
+    router, backends = make_router(clock)
+    for backend in backends.values():
+        backend.fail = True
+    with pytest.raises(ModelUnavailableError):
+        router.generate_content("x")
+    with pytest.raises(ModelUnavailableError, match="429"):
+        router.generate_content("x")
+
+
+def test_closed_stream_releases_half_open_probe():
+    clock = FakeClock()
+    router, backends = make_router(clock, names=("primary",))
+    router.breakers["primary"].trip()
+    clock.advance(30)
+
+    stream = router.stream("x")
+    assert next(stream)[0] == "primary"
+    assert not router.breakers["primary"].available()
+    # SSE のクライアントが切断すると Flask はジェネレータを close する
+    stream.close()
+    breaker = router.breakers["primary"]
+    assert not breaker.probing
+    assert breaker.available()
+    assert {name for name, _ in router.stream("x")} == {"primary"}
+    assert breaker.state == "closed"
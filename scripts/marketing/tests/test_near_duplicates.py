@@ -0,0 +1,38 @@
+from near_duplicates import (
+    signature, similarity, shingles, normalize, band_buckets, pack, unpack,
+    NUM_PERM, BANDS, DUPLICATE_THRESHOLD, RELATED_THRESHOLD,
+)
+
+REPORT = "OpenAIが新しい推論モデルを発表し、数学とプログラミングのベンチマークで従来モデルを大きく上回った。企業向けの提供も来月から始まる。"
+REPHRASED = "OpenAIが新たな推論モデルを発表し、数学とプログラミングのベンチマークで従来のモデルを大きく上回った。企業向けの提供は来月から始まる予定。"
+UNRELATED = "トヨタが全固体電池の量産計画を公表し、2027年に搭載車を投入すると明らかにした。"
+
+
+def test_normalize_ignores_width_case_and_punctuation():
+    assert normalize("ＯｐｅｎＡＩ、 発表！") == normalize("openai発表")
+    assert shingles("ＡＢＣ") == {"ab", "bc"}
+    assert shingles("a") == {"a"}
+    assert shingles("、") == set()
+
+
+def test_signature_is_deterministic():
+    sig = signature(REPORT)
+    assert len(sig) == NUM_PERM
+    assert sig == signature(REPORT)
+    assert unpack(pack(sig)) == sig
+    assert signature("") is None
+
+
+def test_similarity_estimates_jaccard():
+    assert similarity(signature(REPORT), signature(REPORT)) == 1.0
+    assert similarity(signature(REPORT), signature(REPHRASED)) >= DUPLICATE_THRESHOLD
+    assert similarity(signature(REPORT), signature(UNRELATED)) < RELATED_THRESHOLD
+    assert similarity(None, signature(REPORT)) == 0.0
+
+
+def test_similar_reports_share_a_bucket():
+    buckets = band_buckets(signature(REPORT))
+    assert len(buckets) == BANDS
+    assert all(0 <= bucket < 2 ** 63 for bucket in buckets)
+    assert set(buckets) & set(band_buckets(signature(REPHRASED)))
+    assert not set(buckets) & set(band_buckets(signature(UNRELATED)))
@@ -0,0 +1,47 @@
+import pytest
+
+import news_curator
+from news_archive import NewsArchive
+from test_near_duplicates import REPORT, REPHRASED, UNRELATED
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = NewsArchive(db_path=str(tmp_path / "news.db"), legacy_json=None, log_dir=None)
+    monkeypatch.setattr(news_curator, "get_news_archive", lambda: archive)
+    return archive
+
+
+def add(archive, summary, day):
+    assert archive.add({"timestamp": f"2026-01-{day:02d} 10:00:00", "summary": summary}, threshold=None)
+    return archive.recent(1)[0]["id"]
+
+
+def test_find_duplicate_matches_a_rephrased_summary(archive):
+    report_id = add(archive, REPORT, 1)
+    add(archive, UNRELATED, 2)
+    duplicate = archive.find_duplicate(REPHRASED)
+    assert duplicate["id"] == report_id
+    assert duplicate["similarity"] >= 0.5
+    assert archive.find_duplicate("ソニーが新型のゲーム機を発表した。") is None
+    # 言い換えは追加されない
+    assert not archive.add({"summary": REPHRASED})
+
+
+def test_avoid_topics_rank_reports_similar_to_the_topic_first(archive):
+    related = add(archive, REPORT, 1)
+    for day in range(2, 6):
+        add(archive, f"{UNRELATED} 続報{day}", day)
+    avoid = news_curator.select_avoid_topics("OpenAIの新しい推論モデルと数学ベンチマーク", limit=3)
+    assert [item["id"] for item in avoid][0] == related
+    assert len(avoid) == 3
+
+
+def test_avoid_topics_put_the_duplicate_draft_neighbours_first(archive):
+    related = add(archive, REPORT, 1)
+    for day in range(2, 6):
+        add(archive, f"{UNRELATED} 続報{day}", day)
+    avoid = news_curator.select_avoid_topics(similar_to=REPHRASED, limit=2)
+    assert [item["id"] for item in avoid][0] == related
+    # 類似が足りない分は直近のレポートで埋める
+    assert avoid[1]["summary"].endswith("続報5")
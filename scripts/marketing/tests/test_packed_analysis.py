@@ -0,0 +1,54 @@
+import json
+
+from packed_analysis import parse_packed_response, fake_response, ARTICLE_HEADER
+
+IDS = ["a.html", "b.html", "c.html"]
+
+
+def item(article_id, count=3):
+    return {"id": article_id, "patterns": [f"{article_id} の投稿 {i}" for i in range(1, count + 1)]}
+
+
+def dumps(items):
+    return json.dumps(items, ensure_ascii=False, indent=2)
+
+
+def test_plain_array():
+    result = parse_packed_response(dumps([item(i) for i in IDS]), IDS)
+    assert list(result) == IDS
+    assert result["a.html"] == ["a.html の投稿 1", "a.html の投稿 2", "a.html の投稿 3"]
+
+
+def test_fenced_array():
+    text = "```json\n" + dumps([item(i) for i in IDS]) + "\n```"
+    assert list(parse_packed_response(text, IDS)) == IDS
+
+
+def test_leading_and_trailing_text():
+    text = ("以下が結果です [JSON]:\n```json\n" + dumps([item(i) for i in IDS])
+            + "\n```\n補足: 記事 [b.html] は短めです。")
+    assert list(parse_packed_response(text, IDS)) == IDS
+
+
+def test_truncated_response_keeps_complete_items():
+    text = "```json\n" + dumps([item(i) for i in IDS])
+    # c.html の途中で出力が切れた
+    truncated = text[:text.index('"c.html の投稿 2"')]
+    assert list(parse_packed_response(truncated, IDS)) == ["a.html", "b.html"]
+
+
+def test_invalid_items_are_left_for_retry():
+    items = [item("a.html", count=2), item("unknown.html"), "text", item("b.html"), item("b.html", count=4)]
+    result = parse_packed_response(dumps(items), IDS)
+    assert list(result) == ["b.html"]
+    assert len(result["b.html"]) == 3
+
+
+def test_no_array():
+    assert parse_packed_response("解析できませんでした", IDS) == {}
+    assert parse_packed_response("[", IDS) == {}
+
+
+def test_fake_response_round_trip():
+    prompt = "\n".join(ARTICLE_HEADER.format(i) + "\nタイトル: t" for i in IDS)
+    assert list(parse_packed_response(fake_response(prompt), IDS)) == IDS
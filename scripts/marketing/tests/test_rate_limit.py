@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+import rate_limit
+from rate_limit import TokenBucket, RateLimiter, call_with_backoff
+from fake_model import FakeModel, FakeRateLimitError
+from conftest import FakeClock
+
+
+def test_token_bucket_waits_until_refilled():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock, sleep=clock.sleep)
+    for _ in range(60):
+        assert bucket.reserve() == 0.0
+    # 1秒に1個補充されるので 61 個目は1秒待ち、62 個目は2秒待ち
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.reserve() == pytest.approx(2.0)
+    clock.advance(2.0)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_token_bucket_does_not_exceed_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(60, capacity=5, clock=clock, sleep=clock.sleep)
+    clock.advance(3600)
+    for _ in range(5):
+        assert bucket.reserve() == 0.0
+    assert bucket.reserve() > 0
+
+
+def test_rate_limiter_enforces_rpm():
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=10, tpm=0, clock=clock, sleep=clock.sleep)
+    started = clock()
+    for _ in range(30):
+        limiter.acquire()
+    # 最初の 10 件は即時、残り 20 件は 6 秒に1件
+    assert clock() - started == pytest.approx(120.0)
+    assert limiter.waited == pytest.approx(sum(clock.slept))
+
+
+def test_rate_limiter_enforces_tpm():
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=0, tpm=1000, clock=clock, sleep=clock.sleep)
+    assert limiter.acquire(tokens=1000) == 0.0
+    # 500 トークン分の補充には 30 秒かかる
+    assert limiter.acquire(tokens=500) == pytest.approx(30.0)
+    assert clock.slept == [pytest.approx(30.0)]
+
+
+def test_rate_limiter_waits_for_the_stricter_limit():
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=60, tpm=600, clock=clock, sleep=clock.sleep)
+    assert limiter.acquire(tokens=600) == 0.0
+    # リクエスト数には余裕があるがトークンは 60 秒分足りない
+    assert limiter.acquire(tokens=600) == pytest.approx(60.0)
+
+
+def test_backoff_delays_stay_within_full_jitter_bounds(monkeypatch):
+    monkeypatch.setattr(rate_limit.random, "uniform", random.Random(1).uniform)
+    delays = []
+    model = FakeModel(latency=0, error_rate=1.0)
+    with pytest.raises(FakeRateLimitError):
+        call_with_backoff(lambda: model.generate_content("x"), max_retries=8, base_delay=1.0, max_delay=10.0,
+                          sleep=delays.append)
+    assert model.calls == 9
+    assert len(delays) == 8
+    for attempt, delay in enumerate(delays):
+        assert 0 <= delay <= min(10.0, 1.0 * 2 ** attempt)
+
+
+def test_backoff_retries_until_fake_model_succeeds(monkeypatch):
+    monkeypatch.setattr(rate_limit.random, "uniform", random.Random(2).uniform)
+    retried = []
+    model = FakeModel(latency=0, error_rate=0.5, seed=3)
+    response, retries = call_with_backoff(
+        lambda: model.generate_content("x"), max_retries=20, sleep=lambda _: None,
+        on_retry=lambda attempt, delay, error: retried.append(attempt)
+    )
+    assert response.text == "偽モデルの出力"
+    assert retries == model.calls - 1
+    assert retried == list(range(1, retries + 1))
+
+
+def test_backoff_does_not_retry_other_errors():
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        call_with_backoff(fail, sleep=lambda _: pytest.fail("should not sleep"))
+    assert len(calls) == 1
+
+
+def test_backoff_upper_bound_doubles_up_to_max_delay(monkeypatch):
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda low, high: high)
+    delays = []
+    model = FakeModel(latency=0, error_rate=1.0)
+    with pytest.raises(FakeRateLimitError):
+        call_with_backoff(lambda: model.generate_content("x"), max_retries=6, base_delay=1.0, max_delay=10.0,
+                          sleep=delays.append)
+    assert delays == [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
@@ -0,0 +1,138 @@
+import os
+import re
+import json
+import shutil
+import subprocess
+import importlib.util
+
+import pytest
+
+import utils
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+SEARCH_JS = os.path.join(ROOT_DIR, 'blog', 'js', 'search.js')
+
+ARTICLES = {
+    "gijutsu.html": ("技術の話", "機械学習の技術を紹介します。Python 3.11 と AI。", ["技術", "AI"]),
+    "mochi.html": ("もちスラの日記", "今日は餅を焼いた。ｽﾗｲﾑ も一緒。", ["日記"]),
+    "history.html": ("宇宙の歴史", "ビッグバンから138億年。Cosmic history.", []),
+}
+TOKENIZE_SAMPLES = [
+    "技術の話 Python3.11",
+    "ｽﾗｲﾑとＡＢＣ　全角",
+    "術",
+    "foo_bar-baz ①② ＃タグ",
+    "ガ（か＋濁点）と が",
+    "Émile café 東京2026年",
+]
+
+
+def load_builder():
+    path = os.path.join(ROOT_DIR, 'blog', 'scripts', 'build-search-index.py')
+    spec = importlib.util.spec_from_file_location("build_search_index", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def builder(tmp_path, monkeypatch):
+    module = load_builder()
+    articles_dir = tmp_path / "articles"
+    articles_dir.mkdir()
+    for name, (title, body, tags) in ARTICLES.items():
+        tag_html = "".join(f'<span class="tag">{tag}</span>' for tag in tags)
+        (articles_dir / name).write_text(
+            f'<html><body><h1 class="article-title">{title}</h1>{tag_html}'
+            f'<div class="content"><p>{body}</p></div></body></html>',
+            encoding='utf-8'
+        )
+    monkeypatch.setattr(module, "ARTICLES_DIR", str(articles_dir))
+    monkeypatch.setattr(module, "OUTPUT_DIR", str(tmp_path / "search-index"))
+    monkeypatch.setattr(module, "STATE_FILE", str(tmp_path / "state.json"))
+    # 記事キャッシュ（data/ 配下）を使わない
+    monkeypatch.setattr(module, "get_article_data", lambda path: utils.get_article_data(path, use_cache=False))
+    # 小さなコーパスでも複数のシャードに分かれるようにする
+    monkeypatch.setattr(module, "TERMS_PER_SHARD", 8)
+    return module
+
+
+def read_index(output_dir):
+    with open(os.path.join(output_dir, "manifest.json"), encoding='utf-8') as f:
+        manifest = json.load(f)
+    shards = []
+    for i in range(manifest["termShards"]):
+        with open(os.path.join(output_dir, f"t-{i}.json"), encoding='utf-8') as f:
+            shards.append(json.load(f))
+    return manifest, shards
+
+
+def lookup(builder, manifest, shards, query):
+    """search.js の findDocs と同じ引き方（記事のURLの集合を返す）"""
+    with open(builder.STATE_FILE, encoding='utf-8') as f:
+        urls = {doc["id"]: url for url, doc in json.load(f)["docs"].items()}
+    sets = []
+    for run in builder.WORD_RE.findall(builder.normalize(query)):
+        if run.isascii():
+            shard = shards[builder.shard_of(run, manifest["termShards"])]
+            sets.append({i for term, ids in shard.items() if term.startswith(run) for i in ids})
+            continue
+        terms = [run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)]
+        for term in terms:
+            sets.append(set(shards[builder.shard_of(term, manifest["termShards"])].get(term, [])))
+    return {urls[i] for i in set.intersection(*sets)} if sets else set()
+
+
+def test_terms_land_in_their_shard(builder):
+    manifest = builder.build_search_index()
+    _, shards = read_index(builder.OUTPUT_DIR)
+    assert manifest["docs"] == len(ARTICLES)
+    assert manifest["termShards"] > 1
+    terms = 0
+    for i, shard in enumerate(shards):
+        for term in shard:
+            assert ord(term[0]) % manifest["termShards"] == i
+            terms += 1
+    assert terms == manifest["terms"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("術", {"articles/gijutsu.html"}),
+    ("技術", {"articles/gijutsu.html"}),
+    ("餅", {"articles/mochi.html"}),
+    ("スライム", {"articles/mochi.html"}),
+    ("宙", {"articles/history.html"}),
+    ("pyth", {"articles/gijutsu.html"}),
+    ("ai 技術", {"articles/gijutsu.html"}),
+    ("の", {"articles/gijutsu.html", "articles/mochi.html", "articles/history.html"}),
+    ("存在しない", set()),
+])
+def test_queries_find_documents(builder, query, expected):
+    builder.build_search_index()
+    manifest, shards = read_index(builder.OUTPUT_DIR)
+    assert lookup(builder, manifest, shards, query) == expected
+
+
+def test_rebuild_keeps_unchanged_shards(builder):
+    builder.build_search_index()
+    files, manifest = builder.build_shards(builder.load_state())
+    assert builder.write_index(files, manifest) == 0
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node が無い")
+def test_python_and_js_tokenizers_agree():
+    builder = load_builder()
+    with open(SEARCH_JS, encoding='utf-8') as f:
+        source = f.read()
+    match = re.search(r"\.match\((/.*?/gu)\)", source)
+    assert match, "search.js の tokenize() の正規表現が見つからない"
+    script = (
+        f"const re = {match.group(1)};"
+        "const samples = JSON.parse(process.argv[1]);"
+        "console.log(JSON.stringify(samples.map(s => s.normalize('NFKC').toLowerCase().match(re) || [])));"
+    )
+    result = subprocess.run(
+        ["node", "-e", script, json.dumps(TOKENIZE_SAMPLES)], capture_output=True, text=True, check=True
+    )
+    expected = [builder.WORD_RE.findall(builder.normalize(text)) for text in TOKENIZE_SAMPLES]
+    assert json.loads(result.stdout) == expected
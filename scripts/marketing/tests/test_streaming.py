@@ -0,0 +1,75 @@
+import pytest
+
+from streaming import PatternStreamParser, TagStreamParser, iter_stream_text, sse_event
+
+PATTERN_TEXT = (
+    "パターン1: 一つ目の投稿\n#もちスラ\n"
+    "パターン2：二つ目の投稿\n"
+    "パターン3: 三つ目の投稿\n解析完了。"
+)
+TAG_TEXT = (
+    "前置き<Analysis>分析</Analysis>\n<Summary>要約\n二行目</Summary>"
+    "<source>https://example.com</source><Commentary>解説</Commentary>後書き"
+)
+
+
+def chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7])
+def test_pattern_parser_emits_each_pattern_once(size):
+    parser = PatternStreamParser()
+    emitted = []
+    for chunk in chunks(PATTERN_TEXT, size):
+        emitted.extend(parser.feed(chunk))
+    # 最後のパターンは次の見出しが来ないので finish まで確定しない
+    assert [index for index, _ in emitted] == [1, 2]
+    emitted.extend(parser.finish())
+    assert emitted == [
+        (1, "一つ目の投稿\n#もちスラ"),
+        (2, "二つ目の投稿"),
+        (3, "三つ目の投稿\n解析完了。"),
+    ]
+    assert parser.sections == [text for _, text in emitted]
+    assert parser.finish() == []
+
+
+def test_pattern_parser_finish_without_headers():
+    parser = PatternStreamParser()
+    assert parser.feed("見出しの無い出力") == []
+    assert parser.finish() == []
+
+
+@pytest.mark.parametrize("size", [1, 3, 7])
+def test_tag_parser_emits_each_section_once(size):
+    parser = TagStreamParser()
+    emitted = []
+    for chunk in chunks(TAG_TEXT, size):
+        emitted.extend(parser.feed(chunk))
+    assert emitted == [
+        ("Analysis", "分析"),
+        ("Summary", "要約\n二行目"),
+        ("Source", "https://example.com"),
+        ("Commentary", "解説"),
+    ]
+    assert parser.feed("<Analysis>二回目</Analysis>") == []
+
+
+class Chunk:
+    def __init__(self, text=None):
+        self._text = text
+
+    @property
+    def text(self):
+        if self._text is None:
+            raise ValueError("blocked")
+        return self._text
+
+
+def test_iter_stream_text_skips_chunks_without_text():
+    assert list(iter_stream_text([Chunk("a"), Chunk(), Chunk(""), Chunk("b")])) == ["a", "b"]
+
+
+def test_sse_event_format():
+    assert sse_event("pattern", {"text": "日本語"}) == 'event: pattern\ndata: {"text": "日本語"}\n\n'
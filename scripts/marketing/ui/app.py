@@ -1,28 +1,120 @@
 import sys
 import os
-import re
 import json
+import time
+import mimetypes
 
 # 親ディレクトリ（scripts/marketing）をパスに追加して utils を読み込めるようにする
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context, send_from_directory, url_for, g
 from flask_cors import CORS
-import google.generativeai as genai
-from utils import get_article_data, list_articles
+from article_cache import get_article_cache
+from article_index import ArticleIndex
+from llm_cache import cached_generate, get_llm_cache
+from model_router import get_router
+from news_archive import get_news_archive
+from job_queue import get_job_queue, PRIORITY_INTERACTIVE
+from bot_gen import prepare_analysis_prompt, parse_patterns
+from prompt_builder import get_digest_cache
+from streaming import PatternStreamParser, TagStreamParser, sse_event
+import metrics
 import news_curator
 
 app = Flask(__name__)
 CORS(app)
-# キャッシュ無効化
+# ハッシュの付いていない静的ファイルはキャッシュ無効化（ハッシュ付きは dist_asset で長期キャッシュ）
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 
+# scripts/build_site.py --target flask の出力先
+STATIC_DIR = os.path.join(os.path.dirname(__file__), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+ASSET_MAX_AGE = 365 * 24 * 3600
+_asset_manifest = {"mtime": None, "map": {}, "hashed": set()}
+
 # Configuration
 BLOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../blog/articles"))
-genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
 
-# 使用可能なモデル
-MODELS = ['gemini-2.5-flash', 'gemini-1.5-flash', 'gemini-1.5-pro']
+# 記事一覧は起動時に一度だけ構築し、以降はファイル監視で更新する（start_background_services で開始）
+article_index = ArticleIndex(BLOG_DIR)
+
+# 使用可能なモデルへの振り分け（レイテンシ/エラー率の追跡とサーキットブレーカー）
+router = get_router()
+
+# 時間のかかる生成はバックグラウンドのジョブとして実行し、ジョブIDをすぐに返す
+# （ワーカーは start_background_services で起動する）
+jobs = get_job_queue()
+_services_started = False
+
+# --- リクエストの計測（/api/metrics で参照） ---
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.request_phases = metrics.start_request()
+
+@app.after_request
+def record_request_timing(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    method, status, phases = request.method, response.status_code, g.request_phases
+
+    # ストリーミング応答も最後まで送り終わった時点の時間を記録する
+    def record():
+        metrics.record_request(endpoint, method, status, time.perf_counter() - started, phases)
+    response.call_on_close(record)
+    return response
+
+@app.route('/api/metrics')
+def metrics_api():
+    """Prometheus テキスト形式のメトリクス（?format=json で p50/p95/p99 を JSON で返す）"""
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.registry.snapshot())
+    return Response(metrics.registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def load_asset_manifest():
+    """dist/asset-manifest.json（元のパス → ハッシュ付きのパス）。更新されたら読み直す"""
+    path = os.path.join(DIST_DIR, 'asset-manifest.json')
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    if mtime != _asset_manifest["mtime"]:
+        with open(path, 'r', encoding='utf-8') as f:
+            mapping = json.load(f)
+        _asset_manifest.update(mtime=mtime, map=mapping, hashed=set(mapping.values()))
+    return _asset_manifest["map"]
+
+@app.template_global()
+def asset_url(filename):
+    """ビルド済みならハッシュ付きの URL、未ビルドなら更新時刻をクエリに付けた URL を返す"""
+    hashed = load_asset_manifest().get(filename)
+    if hashed:
+        return url_for('dist_asset', filename=hashed)
+    path = os.path.join(STATIC_DIR, filename)
+    version = int(os.path.getmtime(path)) if os.path.exists(path) else 0
+    return url_for('static', filename=filename, v=version)
+
+@app.route('/static/dist/<path:filename>')
+def dist_asset(filename):
+    """ビルド済みの静的ファイル。ハッシュ付きは内容が変わらないので1年キャッシュ。.br / .gz があればそちらを返す"""
+    load_asset_manifest()
+    max_age = ASSET_MAX_AGE if filename in _asset_manifest["hashed"] else 0
+    mimetype = mimetypes.guess_type(filename)[0]
+    accepted = request.headers.get('Accept-Encoding', '')
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in accepted and os.path.isfile(os.path.join(DIST_DIR, filename + suffix)):
+            response = send_from_directory(DIST_DIR, filename + suffix, max_age=max_age, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(DIST_DIR, filename, max_age=max_age, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    if max_age:
+        response.cache_control.immutable = True
+    return response
 
 @app.route('/')
 def index():
@@ -30,152 +122,335 @@ def index():
 
 @app.route('/api/articles')
 def list_articles_api():
-    # utils を使用してタイトル付き、日付順の記事リストを取得
-    articles = list_articles(BLOG_DIR)
-    return jsonify(articles)
+    # 常駐インデックスのソート済みスナップショットを返す（If-None-Match なら 304）
+    body, etag = article_index.snapshot()
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+@app.route('/api/cache-stats')
+def cache_stats_api():
+    """記事キャッシュのヒット/ミス状況"""
+    return jsonify({
+        "article_cache": get_article_cache().stats(),
+        "llm_cache": get_llm_cache().stats(),
+        "digest_cache": get_digest_cache().stats()
+    })
+
+def generate_job(params, job):
+    """記事を解析して3パターンを返す（/api/generate のジョブ）"""
+    _, prompt, _ = prepare_analysis_prompt(params["path"], model=router)
+    if prompt is None:
+        raise RuntimeError("記事の本文が見つかりませんでした。")
+
+    used = {"model": "cache"}
+    def invoke():
+        # キャッシュに無く、モデルを呼ぶ直前にキャンセルを確認する
+        job.check_cancelled()
+        response = router.generate_content(prompt)
+        used["model"] = response.model_used
+        return response.text
+
+    text = cached_generate(router, prompt, use_cache=params.get("use_cache", True), invoke=invoke)
+    # 生成中にキャンセルされた結果は返さない
+    job.check_cancelled()
+    
+    # 抽出ロジック（柔軟に対応）
+    patterns = parse_patterns(text)
+    
+    if len(patterns) < 3:
+        # 抽出に失敗した場合はそのまま返す
+        return {"raw": text, "patterns": [text], "model_used": used["model"]}
+        
+    return {"patterns": patterns[:3], "model_used": used["model"]}
+
+def _job_accepted(job_id, coalesced):
+    """202 Accepted とジョブの参照先を返す"""
+    response = jsonify({
+        "job_id": job_id,
+        "status": jobs.get(job_id)["status"],
+        "coalesced": coalesced,
+        "status_url": url_for('job_status', job_id=job_id)
+    })
+    response.status_code = 202
+    response.headers['Location'] = url_for('job_status', job_id=job_id)
+    return response
 
 @app.route('/api/generate', methods=['POST'])
 def generate():
-    """（オプション）手動で再解析を行う"""
-    data = request.json
+    """（オプション）手動で再解析を行う。ジョブIDを返し、結果は /api/jobs/<id> で取得する"""
+    data = request.json or {}
     file_path = data.get('path')
+    # 同じ記事の連打・リトライはキャッシュから返す（no_cache: true で強制的に再生成）
+    use_cache = not data.get('no_cache')
     
     if not file_path or not os.path.exists(file_path):
         return jsonify({"error": "File not found"}), 404
-    
-    title, body = get_article_data(file_path)
-    
-    prompt = f"""
-    あなたはMochisura Labの「データ解析官（Data Analyst Slime）」です。
-    提供されたブログ記事（タイトル: {title}）から、読者が「結局何ができるようになるのか」というアウトカム（成果）を蒸留し、情報を欲しがらせる（憧れさせる）メッセージを3パターン生成してください。
-
-    【キャラクター・ミッション】
-    - 専門的な「ラボの研究データ」を、一般ユーザー向けの「憧れの未来」へ論理的に翻訳する。
-    - 煽りや商材言葉は一切使わず、知的で洗練された「凄み」を感じさせること。
-    - 読者が「自分もそうなりたい（勉強したい）」と思う、具体的で達成可能な成果を提示すること。
-
-    【出力パターンの構成】
-    1. 【成果の提示】読者が手に入れる「能力」や「自由」を一言で明示。なぜそれが可能か（ラボのエビデンス）を添える。
-    2. 【期待される未来】その技術を得た後の「サロンの日常」を情景描写。
-    3. 【知的な動機付け】マニアックな知見のどの部分が「安心の根拠」なのかを論理的に解説。
-
-    【重要事項】
-    - 商材屋（「稼げる」「秒で」等）との差別化を徹底。
-    - パターンごとに見出しをつけ、各パターンの末尾に必ず以下を添えること：
-      解析完了。 もちスララボ｜近日公開予定
-
-    【データ元：ラボの研究記事】
-    タイトル: {title}
-    解析対象: {body[:1500]}
-    """
 
-    last_error = ""
-    for model_name in MODELS:
-        try:
-            print(f"Trying model: {model_name}")
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
-            text = response.text
-            
-            # 抽出ロジック（柔軟に対応）
-            patterns = re.split(r'パターン\d[:：]', text)
-            patterns = [p.strip() for p in patterns if p.strip()]
-            
-            if len(patterns) < 3:
-                # 抽出に失敗した場合はそのまま返す
-                return jsonify({"raw": text, "patterns": [text], "model_used": model_name})
-                
-            return jsonify({"patterns": patterns[:3], "model_used": model_name})
-        except Exception as e:
-            last_error = str(e)
-            print(f"Error with {model_name}: {last_error}")
-            if "429" in last_error:
-                continue
-            else:
-                break
-                
-    return jsonify({"error": f"全てのモデルで制限に達しました。 (Last Error: {last_error})"}), 500
+    # 同じ記事の解析が実行中ならそのジョブにまとめる
+    job_id, coalesced = jobs.submit(
+        "generate", {"path": file_path, "use_cache": use_cache},
+        key=f"{file_path}:{use_cache}", priority=PRIORITY_INTERACTIVE
+    )
+    return _job_accepted(job_id, coalesced)
+
+@app.route('/api/model-stats')
+def model_stats_api():
+    """モデルごとのレイテンシ・エラー率・サーキットブレーカーの状態"""
+    return jsonify(router.stats())
+
+def _curation_response(result, model_used="gemini-2.5-flash"):
+    """キュレーション結果をフロントエンドが期待する構造にする"""
+    # dict形式（成功）の場合、フロントエンドが期待する構造にラップする
+    if isinstance(result, dict):
+        return {
+            "structured": True,
+            "analysis": result.get("analysis", ""),
+            "summary": result.get("summary", ""),
+            "source": result.get("source", ""),
+            "commentary": result.get("commentary", ""),
+            "duplicate_of": result.get("duplicate_of"),
+            "model_used": model_used
+        }
+    # 文字列のみが返ってきた場合のフォールバック
+    return {
+        "patterns": [result],
+        "model_used": model_used
+    }
+
+def curate_news_job(params, job):
+    """ニュースを取得・解析する（/api/curate-news のジョブ）"""
+    # news_curator.py から情報を取得
+    result = news_curator.fetch_and_curate_news(custom_topic=params.get("topic"), check_cancelled=job.check_cancelled)
+    if not result:
+        raise RuntimeError("ニュースの取得または解析に失敗しました。")
+    return _curation_response(result)
 
 @app.route('/api/curate-news', methods=['POST'])
 def curate_news():
-    """最新のAIニュースをキュレートする"""
+    """最新のAIニュースをキュレートする。ジョブIDを返し、結果は /api/jobs/<id> で取得する"""
     data = request.json or {}
     topic = data.get('topic')
     
-    # news_curator.py から情報を取得
-    result = news_curator.fetch_and_curate_news(custom_topic=topic)
+    # 同じトピックのキュレーションが実行中ならそのジョブにまとめる
+    job_id, coalesced = jobs.submit(
+        "curate_news", {"topic": topic}, key=(topic or "").strip().lower(), priority=PRIORITY_INTERACTIVE
+    )
+    return _job_accepted(job_id, coalesced)
+
+# --- バックグラウンドジョブ ---
+
+def _job_response(job):
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "result": job["result"],
+        "error": job["error"],
+        "cancel_requested": job["cancel_requested"],
+        "created": job["created"],
+        "started": job["started"],
+        "finished": job["finished"]
+    }
+
+@app.route('/api/jobs')
+def list_jobs_api():
+    """最近のジョブ一覧（?status=queued などで絞り込み）"""
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({"error": "Invalid parameter: limit"}), 400
+    items = jobs.list(status=request.args.get('status'), kind=request.args.get('kind'), limit=min(limit, 500))
+    return jsonify({"jobs": [_job_response(job) for job in items], "counts": jobs.counts()})
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """ジョブの状態と、完了していれば結果"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(_job_response(job))
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """待機中のジョブは取り消し、実行中のジョブにはキャンセルを要求する"""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(_job_response(job))
+
+# --- ストリーミング版 (Server-Sent Events) ---
+# 生成完了を待たず、セクションが書き上がるたびに event を送る
+
+def _sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/generate/stream', methods=['POST'])
+def generate_stream():
+    """/api/generate のストリーミング版。パターンごとに pattern イベントを送る"""
+    data = request.json or {}
+    file_path = data.get('path')
+    use_cache = not data.get('no_cache')
+    
+    if not file_path or not os.path.exists(file_path):
+        return jsonify({"error": "File not found"}), 404
     
-    if result:
-        # dict形式（成功）の場合、フロントエンドが期待する構造にラップする
-        if isinstance(result, dict):
-            return jsonify({
-                "structured": True,
-                "analysis": result.get("analysis", ""),
-                "summary": result.get("summary", ""),
-                "source": result.get("source", ""),
-                "commentary": result.get("commentary", ""),
-                "model_used": "gemini-2.5-flash"
-            })
+    # 長い記事は初回のみダイジェストを作る（以降はキャッシュ）
+    _, prompt, _ = prepare_analysis_prompt(file_path, model=router)
+    if prompt is None:
+        return jsonify({"error": "Article body not found"}), 422
+
+    def events():
+        cached = get_llm_cache().lookup(router.model_name, prompt) if use_cache else None
+        parser = PatternStreamParser()
+        chunks = []
+        model_used = "cache"
+        started = time.monotonic()
+        try:
+            # 最初のチャンクより前の 429 はルーターが次のモデルへ切り替える
+            stream = [("cache", cached)] if cached is not None else router.stream(prompt)
+            for model_used, chunk in stream:
+                chunks.append(chunk)
+                for index, text in parser.feed(chunk):
+                    yield sse_event('pattern', {"index": index, "text": text})
+            for index, text in parser.finish():
+                yield sse_event('pattern', {"index": index, "text": text})
+        except Exception as e:
+            print(f"Error during generation: {e}")
+            yield sse_event('error', {"error": str(e)})
+            return
+
+        text = "".join(chunks)
+        if cached is None and use_cache:
+            get_llm_cache().store(router.model_name, prompt, text, time.monotonic() - started)
+        if len(parser.sections) < 3:
+            # 抽出に失敗した場合はそのまま返す
+            yield sse_event('done', {"raw": text, "patterns": [text], "model_used": model_used})
         else:
-            # 文字列のみが返ってきた場合のフォールバック
-            return jsonify({
-                "patterns": [result],
-                "model_used": "gemini-2.5-flash"
-            })
-    else:
+            yield sse_event('done', {"patterns": parser.sections[:3], "model_used": model_used})
+
+    return _sse_response(events())
+
+@app.route('/api/curate-news/stream', methods=['POST'])
+def curate_news_stream():
+    """
+    /api/curate-news のストリーミング版。タグが閉じるたびに section イベントを送る。
+    過去のレポートと重複したら retry イベントを送って生成し直し、やり直しても重複したものはアーカイブせず
+    done の duplicate_of で知らせる
+    """
+    data = request.json or {}
+    topic = data.get('topic')
+
+    model = news_curator.create_model()
+    if model is None:
         return jsonify({"error": "ニュースの取得または解析に失敗しました。"}), 500
 
+    def events():
+        avoid = news_curator.select_avoid_topics(topic)
+        for attempt in range(news_curator.MAX_DUPLICATE_RETRIES + 1):
+            parser = TagStreamParser()
+            chunks = []
+            model_used = None
+            try:
+                # ニュースは常に最新である必要があるためキャッシュしない
+                for model_used, chunk in model.stream(news_curator.build_curation_prompt(topic, avoid)):
+                    chunks.append(chunk)
+                    for tag, text in parser.feed(chunk):
+                        yield sse_event('section', {"tag": tag.lower(), "text": text})
+            except Exception as e:
+                print(f"Error during news curation: {e}")
+                yield sse_event('error', {"error": "ニュースの取得または解析に失敗しました。"})
+                return
+
+            text = "".join(chunks)
+            results = news_curator.parse_curation(text)
+            if not results["analysis"] and not results["summary"]:
+                yield sse_event('done', _curation_response(text, model_used))
+                return
+            avoid = news_curator.archive_unless_duplicate(results, topic)
+            if avoid is None or attempt == news_curator.MAX_DUPLICATE_RETRIES:
+                break
+            yield sse_event('retry', {"duplicate_of": results["duplicate_of"]})
+        yield sse_event('done', _curation_response(results, model_used))
+
+    return _sse_response(events())
+
 @app.route('/api/save-to-archive', methods=['POST'])
 def save_to_archive():
     """レポートを明示的にアーカイブに保存する"""
     data = request.json
-    # scripts/marketing/news_archive.json
-    archive_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "news_archive.json"))
-    
-    archive = []
-    if os.path.exists(archive_path):
-        try:
-            with open(archive_path, "r", encoding="utf-8") as f:
-                archive = json.load(f)
-        except Exception as e:
-            print(f"Error reading archive: {e}")
-            archive = []
     
-    # 既存の重複チェック（簡易）
-    if not any(item.get("summary", "")[:50] == data.get("summary", "")[:50] for item in archive):
-        from datetime import datetime
-        new_entry = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "analysis": data.get("analysis"),
-            "summary": data.get("summary"),
-            "source": data.get("source"),
-            "commentary": data.get("commentary")
-        }
-        archive.append(new_entry)
-        try:
-            with open(archive_path, "w", encoding="utf-8") as f:
-                json.dump(archive, f, ensure_ascii=False, indent=2)
+    from datetime import datetime
+    new_entry = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "analysis": data.get("analysis"),
+        "summary": data.get("summary"),
+        "source": data.get("source"),
+        "commentary": data.get("commentary")
+    }
+    try:
+        # 重複チェック（summary 先頭50文字のハッシュと MinHash による言い換えの判定）
+        if get_news_archive().add(new_entry):
             print(f"Successfully saved to archive: {data.get('summary', '')[:20]}...")
             return jsonify({"success": True})
-        except Exception as e:
-            print(f"Failed to write to archive: {e}")
-            return jsonify({"success": False, "error": str(e)}), 500
+    except Exception as e:
+        print(f"Failed to write to archive: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
     
     print(f"Archive entry already exists for: {data.get('summary', '')[:20]}...")
     return jsonify({"success": True, "message": "Already exist"})
 
 @app.route('/api/news-archive', methods=['GET'])
-def get_news_archive():
-    """保存されたニュースアーカイブをすべて取得する"""
-    archive_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "news_archive.json")
-    if os.path.exists(archive_path):
-        try:
-            with open(archive_path, "r", encoding="utf-8") as f:
-                archive = json.load(f)
-            return jsonify({"archive": archive})
-        except Exception as e:
-            return jsonify({"error": f"Failed to load archive: {e}"}), 500
-    return jsonify({"archive": []})
+def get_news_archive_api():
+    """
+    保存されたニュースアーカイブを新しい順に取得する
+    q: 全文検索 / from, to: 日付範囲 (YYYY-MM-DD) / source: 情報元 / cursor, limit: ページング
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        items, next_cursor = get_news_archive().search(
+            q=request.args.get('q'),
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+            source=request.args.get('source'),
+            cursor=request.args.get('cursor'),
+            limit=limit
+        )
+        return jsonify({"archive": items, "next_cursor": next_cursor})
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Failed to load archive: {e}"}), 500
+
+jobs.register("generate", generate_job)
+jobs.register("curate_news", curate_news_job)
+
+def start_background_services():
+    """
+    記事一覧のファイル監視とジョブのワーカーを起動する（プロセスで1回だけ）。
+    import しただけでは起動しないので、リローダーの監視用プロセスや他のスクリプトからの import で
+    監視スレッドやワーカーが増えない
+    """
+    global _services_started
+    if not _services_started:
+        _services_started = True
+        article_index.start()
+        jobs.start()
+
+def create_app():
+    """WSGI サーバー用（例: waitress-serve --call app:create_app）。バックグラウンド処理を起動した app を返す"""
+    start_background_services()
+    return app
 
 if __name__ == '__main__':
+    # デバッグ時のリローダーはこのファイルを監視用の親プロセスと応答する子プロセスの両方で実行する。
+    # 親でも起動するとワーカーが2組になり、編集後も古いコードのままジョブを取り出し続けるので子プロセスだけで起動する
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
     app.run(debug=True, port=5001)
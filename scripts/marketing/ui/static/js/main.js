@@ -120,6 +120,74 @@ document.addEventListener('DOMContentLoaded', () => {
         resultsArea.scrollIntoView({ behavior: 'smooth' });
     };
 
+    // --- ストリーミング (Server-Sent Events) ---
+    // EventSource は GET しか送れないため、fetch のストリームを自前で分解する
+    const streamPost = async (url, body, onEvent) => {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        if (!response.ok || !response.body) {
+            const data = await response.json().catch(() => ({}));
+            onEvent('error', { error: data.error || `HTTP ${response.status}` });
+            return;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let sep;
+            while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, sep);
+                buffer = buffer.slice(sep + 2);
+                let event = 'message';
+                let data = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                });
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
+    };
+
+    const beginPatternStream = () => {
+        resultsArea.style.display = 'block';
+        document.getElementById('standard-patterns').style.display = 'grid';
+        document.getElementById('structured-results').style.display = 'none';
+        latestCurationData = null;
+        for (let i = 1; i <= 3; i++) {
+            const card = document.getElementById(`card-p${i}`);
+            if (card) card.style.display = 'none';
+        }
+        resultsArea.scrollIntoView({ behavior: 'smooth' });
+    };
+
+    const showPatternCard = (index, text) => {
+        const card = document.getElementById(`card-p${index}`);
+        const content = document.getElementById(`p${index}`);
+        if (card && content) {
+            card.style.display = 'block';
+            content.textContent = text;
+        }
+    };
+
+    const beginCurationStream = () => {
+        resultsArea.style.display = 'block';
+        document.getElementById('standard-patterns').style.display = 'none';
+        document.getElementById('structured-results').style.display = 'block';
+        ['analysis', 'summary', 'source', 'commentary'].forEach(tag => {
+            document.getElementById(`cur-${tag}`).textContent = '';
+        });
+        resultsArea.scrollIntoView({ behavior: 'smooth' });
+    };
+
     // Start action
     startBtn.addEventListener('click', () => {
         landingArea.style.display = 'none';
@@ -138,25 +206,28 @@ document.addEventListener('DOMContentLoaded', () => {
         loading.style.display = 'flex';
         bubble.innerHTML = getRandomDialog('working');
 
-        fetch('/api/generate', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ path })
-        })
-            .then(res => res.json())
-            .then(data => {
-                loading.style.display = 'none';
-                if (data.error) {
-                    alert('解析エラー: ' + data.error);
-                    return;
+        // パターンが1つ書き上がるたびに表示する（SSE）
+        let started = false;
+        streamPost('/api/generate/stream', { path }, (event, data) => {
+            if (event === 'pattern') {
+                if (!started) {
+                    started = true;
+                    loading.style.display = 'none';
+                    beginPatternStream();
                 }
+                showPatternCard(data.index, data.text);
+            } else if (event === 'done') {
+                loading.style.display = 'none';
                 displayResults(data.patterns);
                 bubble.innerHTML = getRandomDialog('done');
-            })
-            .catch(err => {
+            } else if (event === 'error') {
                 loading.style.display = 'none';
-                alert('通信に失敗しました。');
-            });
+                alert('解析エラー: ' + data.error);
+            }
+        }).catch(err => {
+            loading.style.display = 'none';
+            alert('通信に失敗しました。');
+        });
     });
 
     // Curate News action
@@ -173,26 +244,38 @@ document.addEventListener('DOMContentLoaded', () => {
             updateBubble(slimeDialogs.curator[0]);
         }
 
-        fetch('/api/curate-news', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ topic: topic })
-        })
-            .then(res => res.json())
-            .then(data => {
-                loading.style.display = 'none';
-                if (data.error) {
-                    alert('キュレーションエラー: ' + data.error);
-                    updateBubble('解析中に何らかの「ノイズ」が混入したようだ。もう一度試してくれたまえ。');
-                    return;
+        // セクション（Analysis / Summary / Source / Commentary）が閉じるたびに表示する（SSE）
+        let started = false;
+        streamPost('/api/curate-news/stream', { topic: topic }, (event, data) => {
+            if (event === 'section') {
+                if (!started) {
+                    started = true;
+                    loading.style.display = 'none';
+                    beginCurationStream();
                 }
+                const target = document.getElementById(`cur-${data.tag}`);
+                if (target) target.textContent = data.text;
+            } else if (event === 'retry') {
+                // 過去のレポートと重複したので別の話題で生成し直している
+                beginCurationStream();
+                updateBubble(`記録庫のレポート #${data.duplicate_of} と同じ事件のようだ。別の手がかりを追ってみよう。`);
+            } else if (event === 'done') {
+                loading.style.display = 'none';
                 displayResults(data);
-                updateBubble(getRandomDialog('done'));
-            })
-            .catch(err => {
+                if (data.duplicate_of) {
+                    updateBubble(`これは記録庫のレポート #${data.duplicate_of} と同じ事件だ。重複するので記録庫には保管していないよ。`);
+                } else {
+                    updateBubble(getRandomDialog('done'));
+                }
+            } else if (event === 'error') {
                 loading.style.display = 'none';
-                alert('通信に失敗しました。');
-            });
+                alert('キュレーションエラー: ' + data.error);
+                updateBubble('解析中に何らかの「ノイズ」が混入したようだ。もう一度試してくれたまえ。');
+            }
+        }).catch(err => {
+            loading.style.display = 'none';
+            alert('通信に失敗しました。');
+        });
     });
 
     // --- ストック（保存）機能 ---
@@ -290,30 +373,63 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
-    const loadArchive = async () => {
+    // 記録庫は検索条件付きでページ単位に取得する
+    let archiveCursor = null;
+
+    const loadArchive = async (append = false) => {
         const container = document.getElementById('shelf-container');
-        container.innerHTML = '<p class="loading-text">記録庫からデータを搬出中...</p>';
+        const moreBtn = document.getElementById('archive-more-btn');
+        if (!append) {
+            archiveCursor = null;
+            container.innerHTML = '<p class="loading-text">記録庫からデータを搬出中...</p>';
+        }
+        if (moreBtn) moreBtn.style.display = 'none';
+
+        const params = new URLSearchParams({ limit: 20 });
+        const q = document.getElementById('archive-q');
+        const from = document.getElementById('archive-from');
+        const to = document.getElementById('archive-to');
+        if (q && q.value.trim()) params.set('q', q.value.trim());
+        if (from && from.value) params.set('from', from.value);
+        if (to && to.value) params.set('to', to.value);
+        if (append && archiveCursor) params.set('cursor', archiveCursor);
 
         try {
-            const response = await fetch('/api/news-archive');
+            const response = await fetch(`/api/news-archive?${params}`);
             const data = await response.json();
+            if (data.error) throw new Error(data.error);
 
+            if (!append) container.innerHTML = '';
             if (data.archive && data.archive.length > 0) {
-                container.innerHTML = '';
-                // 新しい順に表示
-                [...data.archive].reverse().forEach(item => {
+                // サーバー側で新しい順に並んでいる
+                data.archive.forEach(item => {
                     const card = createArchiveCard(item);
                     container.appendChild(card);
                 });
-            } else {
+            } else if (!append) {
                 container.innerHTML = '<p class="empty-text">現在、記録されている事件はありません。</p>';
             }
+
+            archiveCursor = data.next_cursor;
+            if (moreBtn && archiveCursor) moreBtn.style.display = 'block';
         } catch (error) {
             console.error('Archive load error:', error);
             container.innerHTML = '<p class="error-text">記録データの読み込みに失敗しました。</p>';
         }
     };
 
+    const archiveSearchForm = document.getElementById('archive-search');
+    if (archiveSearchForm) {
+        archiveSearchForm.addEventListener('submit', (e) => {
+            e.preventDefault();
+            loadArchive();
+        });
+    }
+    const archiveMoreBtn = document.getElementById('archive-more-btn');
+    if (archiveMoreBtn) {
+        archiveMoreBtn.addEventListener('click', () => loadArchive(true));
+    }
+
     const createArchiveCard = (item) => {
         const div = document.createElement('div');
         div.className = 'archive-card';
@@ -1,18 +1,30 @@
 import os
 import re
 import glob
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+from article_cache import get_article_cache
+from metrics import phase
 
-def get_article_data(file_path):
+def get_article_data(file_path, use_cache=True):
     """
     HTMLファイルからタイトルと本文を取得する
+    use_cache=True の場合、変更の無い記事はキャッシュから返す（HTMLのパースを行わない）
     """
     if not os.path.exists(file_path):
         return None, None
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        html = f.read()
-    
+    with phase("article_load"):
+        if use_cache:
+            return get_article_cache().get(file_path, lambda html: _parse_article_html(html, file_path))
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        return _parse_article_html(html, file_path)
+
+def _parse_article_html(html, file_path):
+    """記事HTMLをパースしてタイトルと本文テキストを抽出する"""
+    # キャッシュに当たる場合は読み込まない（起動を軽くする）
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html, 'html.parser')
     
     # 記事タイトルの取得
@@ -32,53 +44,180 @@ def get_article_data(file_path):
     
     return title_text, body_text
 
-import json
+# 一覧用のメタデータを読むときの1回の読み込み量（h1.article-title は通常ファイルの先頭数KB以内にある）
+HEADER_CHUNK = 4 * 1024
+EXCERPT_LENGTH = 150
+
+
+class _ArticleHeaderParser(HTMLParser):
+    """
+    記事HTMLの冒頭から h1.article-title（と指定されれば抜粋・span.tag）だけを拾う逐次パーサ。
+    必要なものが揃うか本文（div.content）の先まで進んだら done になり、以降の入力は読まなくてよい
+    """
+
+    def __init__(self, want_excerpt=False, want_tags=False):
+        super().__init__()
+        self.want_excerpt = want_excerpt
+        self.want_tags = want_tags
+        self.title = None
+        self.description = None
+        self.paragraph = None
+        self.tags = []
+        self.done = False
+        self._title_parts = None
+        self._tag_parts = None
+        self._paragraph_parts = None
+        self._tags_depth = 0
+        self._tags_seen = False
+        self._in_content = False
+
+    def _finished(self):
+        if self.title is None:
+            return False
+        if self.want_tags and not (self._tags_seen and self._tags_depth == 0) and not self._in_content:
+            return False
+        if self.want_excerpt and self.description is None and self.paragraph is None:
+            return False
+        return True
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        if tag == 'meta' and (attrs.get('name') or '').lower() == 'description':
+            self.description = ' '.join((attrs.get('content') or '').split()) or None
+        elif tag == 'h1' and self.title is None and 'article-title' in classes:
+            self._title_parts = []
+        elif tag == 'div':
+            if self._tags_depth:
+                self._tags_depth += 1
+            elif 'tags' in classes:
+                self._tags_depth = 1
+                self._tags_seen = True
+            elif 'content' in classes:
+                # タイトル・タグは本文より前にある
+                self._in_content = True
+        elif tag == 'span' and 'tag' in classes and self.want_tags:
+            self._tag_parts = []
+        elif tag == 'p' and self._in_content and self.want_excerpt and self.paragraph is None:
+            self._paragraph_parts = []
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if tag == 'h1' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts).strip()
+            self._title_parts = None
+        elif tag == 'span' and self._tag_parts is not None:
+            text = ''.join(self._tag_parts).strip()
+            if text:
+                self.tags.append(text)
+            self._tag_parts = None
+        elif tag == 'p' and self._paragraph_parts is not None:
+            self.paragraph = ' '.join(''.join(self._paragraph_parts).split()) or None
+            self._paragraph_parts = None
+        elif tag == 'div' and self._tags_depth:
+            self._tags_depth -= 1
+        self.done = self._finished()
+
+    def handle_data(self, data):
+        if self.done:
+            return
+        for parts in (self._title_parts, self._tag_parts, self._paragraph_parts):
+            if parts is not None:
+                parts.append(data)
+
+
+def get_article_meta(file_path, excerpt=False, tags=False, use_cache=True):
+    """
+    記事一覧用のメタデータ {"title", ("excerpt"), ("tags")} を返す（ファイルが無ければ None）。
+    ファイルの先頭から HEADER_CHUNK ずつ読んで逐次パースし、必要な要素が揃った時点で読むのをやめる。
+    本文は組み立てないので、記事の長さに関係なく読む量・メモリはほぼ一定。
+    title は get_article_data と同じ（h1.article-title が無ければファイル名）。
+    excerpt は meta description、無ければ本文の最初の段落
+    """
+    if not os.path.exists(file_path):
+        return None
+    if use_cache and not excerpt and not tags:
+        # get_article_data で抽出済みならタイトルだけ引く（本文は読み込まない）
+        title = get_article_cache().get_title(file_path)
+        if title is not None:
+            return {"title": title}
+
+    with phase("article_meta"):
+        parser = _ArticleHeaderParser(want_excerpt=excerpt, want_tags=tags)
+        with open(file_path, 'r', encoding='utf-8') as f:
+            while not parser.done:
+                chunk = f.read(HEADER_CHUNK)
+                if not chunk:
+                    parser.close()
+                    break
+                parser.feed(chunk)
+
+    meta = {"title": parser.title if parser.title is not None else os.path.basename(file_path)}
+    if excerpt:
+        text = parser.description or parser.paragraph or ''
+        meta["excerpt"] = text[:EXCERPT_LENGTH] + ('...' if len(text) > EXCERPT_LENGTH else '')
+    if tags:
+        meta["tags"] = parser.tags
+    return meta
+
+from analysis_store import AnalysisStore
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+# 旧形式（初回アクセス時に ANALYSIS_DB へ移行される）
 ANALYSIS_FILE = os.path.join(DATA_DIR, 'analysis_data.json')
+ANALYSIS_MANIFEST_FILE = os.path.join(DATA_DIR, 'analysis_manifest.json')
+ANALYSIS_DB = os.path.join(DATA_DIR, 'analysis.db')
+
+_analysis_store = None
+
+def get_analysis_store():
+    """解析結果ストア（SQLite）を返す"""
+    global _analysis_store
+    if _analysis_store is None:
+        _analysis_store = AnalysisStore(ANALYSIS_DB, legacy_json=ANALYSIS_FILE,
+                                        legacy_manifest=ANALYSIS_MANIFEST_FILE)
+    return _analysis_store
 
 def load_analysis_data():
     """保存された解析結果を読み込む"""
-    if os.path.exists(ANALYSIS_FILE):
-        try:
-            with open(ANALYSIS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_analysis_data(data):
-    """解析結果を保存する"""
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
+    with phase("analysis_store"):
+        return get_analysis_store().all()
+
+def get_analysis(rel_path):
+    """1記事分の解析結果を読み込む（無ければ None）"""
+    with phase("analysis_store"):
+        return get_analysis_store().get(rel_path)
+
+def save_analysis_data(data, content_hashes=None, prompt_version=None):
+    """解析結果を保存する（記事単位で upsert。content_hashes を渡すと解析の版も同時に記録）"""
+    with phase("analysis_store"):
+        get_analysis_store().upsert(data, content_hashes=content_hashes, prompt_version=prompt_version)
+
+def article_entry(file_path, analysis_data):
+    """記事一覧の1件分のデータを作る（本文は使わないので冒頭のタイトルだけ読む）"""
+    title = get_article_meta(file_path)["title"]
+    mtime = os.path.getmtime(file_path)
     
-    current_data = load_analysis_data()
-    current_data.update(data)
+    # 相対パスをキーにする
+    rel_path = os.path.basename(file_path)
     
-    with open(ANALYSIS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(current_data, f, ensure_ascii=False, indent=2)
+    return {
+        "title": title or os.path.basename(file_path),
+        "path": os.path.abspath(file_path),
+        "mtime": mtime,
+        "is_analyzed": rel_path in analysis_data,
+        "patterns": analysis_data.get(rel_path, [])
+    }
 
 def list_articles(articles_dir):
     """ディレクトリ内のHTML記事を一覧取得する（解析済みデータも付与）"""
     html_files = glob.glob(os.path.join(articles_dir, "*.html"))
-    articles = []
     
     analysis_data = load_analysis_data()
-    
-    for file_path in html_files:
-        title, _ = get_article_data(file_path)
-        mtime = os.path.getmtime(file_path)
-        
-        # 相対パスをキーにする
-        rel_path = os.path.basename(file_path)
-        
-        articles.append({
-            "title": title or os.path.basename(file_path),
-            "path": os.path.abspath(file_path),
-            "mtime": mtime,
-            "is_analyzed": rel_path in analysis_data,
-            "patterns": analysis_data.get(rel_path, [])
-        })
+    articles = [article_entry(file_path, analysis_data) for file_path in html_files]
     
     # 更新日時順（降順）
     articles.sort(key=lambda x: x['mtime'], reverse=True)